@@ -0,0 +1,76 @@
+"""
+HTTP API of the local analysis service.
+
+    POST /jobs               Queue an analysis, or join the identical one in flight
+    GET  /jobs               Status of every job
+    GET  /jobs/{id}          Status of one job
+    GET  /jobs/{id}/result   Result of a finished job
+
+Start it with ``python serve.py`` from the ``src`` directory.
+"""
+
+from contextlib import asynccontextmanager
+from typing import Literal
+
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import Response
+from pydantic import BaseModel, Field
+
+from analysis_service.jobs import JobQueue
+
+
+class AnalysisRequest(BaseModel):
+    """One analysis, with the app's defaults."""
+
+    subreddit: str = Field(min_length=1)
+    sort: Literal["hot", "week", "month", "year", "new"] = "month"
+    limit: int = Field(100, ge=1, le=1000)
+    deep_comments: bool = False
+    # Ollama model for the summaries; empty to skip them
+    llm_model: str = "llama3.2:latest"
+    # False scrapes the posts again even if they were scraped recently
+    use_cache: bool = True
+
+
+def create_app(job_queue=None):
+    """
+    Create the service around ``job_queue``, started and stopped with the app.
+
+    Args:
+        job_queue (JobQueue): Queue running the jobs; a default one if None.
+    """
+    job_queue = job_queue or JobQueue()
+
+    @asynccontextmanager
+    async def lifespan(app):
+        job_queue.start()
+        yield
+        job_queue.shutdown()
+
+    app = FastAPI(title="Subreddit Topic Clustering", lifespan=lifespan)
+
+    @app.post("/jobs", status_code=202)
+    def submit_job(request: AnalysisRequest):
+        return job_queue.submit(request.model_dump())
+
+    @app.get("/jobs")
+    def list_jobs():
+        return job_queue.jobs()
+
+    @app.get("/jobs/{job_id}")
+    def job_status(job_id: str):
+        status = job_queue.status(job_id)
+        if status is None:
+            raise HTTPException(status_code=404, detail="Unknown job")
+        return status
+
+    @app.get("/jobs/{job_id}/result")
+    def job_result(job_id: str):
+        result = job_queue.read_result(job_id)
+        if result is None:
+            # 404 for unknown jobs, 409 for unfinished or failed ones
+            status = job_status(job_id)
+            raise HTTPException(status_code=409, detail=f"Job is {status['status']}")
+        return Response(result, media_type="application/json")
+
+    return app
@@ -0,0 +1,64 @@
+"""
+Client of the local analysis service (see ``analysis_service.api``).
+"""
+
+import time
+
+import httpx
+
+from analysis_service.jobs import DONE, FAILED
+
+# Seconds between status requests while waiting for a job
+POLL_INTERVAL = 1.0
+
+
+def submit_analysis(service_url, params, timeout=10):
+    """
+    Queue an analysis on the service.
+
+    Args:
+        service_url (str): Base URL of the service, e.g. "http://127.0.0.1:8000".
+        params (dict): Fields of ``AnalysisRequest``.
+        timeout (float): Seconds to wait for the service to answer.
+
+    Returns:
+        dict: Status of the new job, or of the identical job already running.
+    """
+    response = httpx.post(f"{service_url}/jobs", json=params, timeout=timeout)
+    response.raise_for_status()
+    return response.json()
+
+
+def wait_for_result(
+    service_url, job, poll_interval=POLL_INTERVAL, on_status=None, timeout=10
+):
+    """
+    Poll a job until it finishes and return its result.
+
+    Args:
+        service_url (str): Base URL of the service.
+        job (dict): Status returned by ``submit_analysis``.
+        poll_interval (float): Seconds between status requests.
+        on_status (callable): Called with every status received.
+        timeout (float): Seconds to wait for each answer of the service.
+
+    Returns:
+        dict: The job's result, with its posts and topics.
+
+    Raises:
+        RuntimeError: If the job failed.
+    """
+    with httpx.Client(base_url=service_url, timeout=timeout) as client:
+        while job["status"] not in (DONE, FAILED):
+            time.sleep(poll_interval)
+            response = client.get(f"/jobs/{job['id']}")
+            response.raise_for_status()
+            job = response.json()
+            if on_status is not None:
+                on_status(job)
+
+        if job["status"] == FAILED:
+            raise RuntimeError(f"Analysis failed during {job['stage']}: {job['error']}")
+        response = client.get(f"/jobs/{job['id']}/result")
+        response.raise_for_status()
+        return response.json()
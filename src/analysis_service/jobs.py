@@ -0,0 +1,293 @@
+"""
+Background analysis jobs for the local analysis service.
+
+A ``JobQueue`` runs the pipeline of ``batch.py`` for one subreddit at a time
+per job: the posts are scraped on a thread, then preprocessed, clustered and
+summarized on a process pool. The pool's workers are started with the queue
+and load the sentence encoder once, so jobs never wait for it. A job that is
+submitted while an identical one is queued or running joins that job instead
+of being run again.
+
+Every job gets a folder under ``output_dir`` holding its scraped posts and
+its result, a JSON file with every post and its topic and every topic's
+name, description, size and terms, and whether its summary failed.
+"""
+
+import json
+import multiprocessing
+import os
+import shutil
+import threading
+import time
+import traceback
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from batch import ANALYZE_RETRIES, analyze_posts, init_worker, scrape_job
+from data_retrieval.columnar import load_posts
+from data_retrieval.scrape_cache import DEFAULT_TTL
+
+DEFAULT_OUTPUT_DIR = os.path.join("cache", "service")
+# Finished jobs kept, with their folders, before the oldest are deleted
+MAX_FINISHED_JOBS = 100
+# Columns of the posts in a job's result
+POST_COLUMNS = ["id", "title", "post text", "comments", "topic", "topic_name"]
+
+# Job states, in order
+QUEUED = "queued"
+SCRAPING = "scraping"
+ANALYZING = "analyzing"
+DONE = "done"
+FAILED = "failed"
+
+
+def job_key(params):
+    """Jobs with the same key are identical and share one run."""
+    return tuple(sorted(params.items()))
+
+
+def analyze_to_file(params, posts_path, result_path):
+    """
+    Analyze a job's scraped posts and write its result JSON.
+
+    Returns:
+        dict: Numbers of posts and topics.
+    """
+    df, _, topic_index, topic_summaries = analyze_posts(
+        load_posts(posts_path),
+        params["llm_model"],
+        embeddings_path=os.path.join(os.path.dirname(result_path), "embeddings.npy"),
+    )
+    topics = [
+        {
+            "topic": topic_id,
+            "name": topic_index.name(topic_id),
+            "description": topic_summaries.get(topic_id, {}).get("description", ""),
+            # Failed summaries are not cached, so running the job again retries them
+            "failed": bool(topic_summaries.get(topic_id, {}).get("failed")),
+            "count": topic_index.counts[topic_id],
+            "terms": (
+                [[term, float(weight)] for term, weight in topic_index.terms(topic_id)]
+                if topic_id != -1
+                else []
+            ),
+        }
+        for topic_id in topic_index.topic_ids
+    ]
+    with open(result_path, "w") as f:
+        json.dump(
+            {**params, "topics": topics, "posts": df[POST_COLUMNS].to_dict("records")},
+            f,
+        )
+    return {"posts": len(df), "topics": len(topics)}
+
+
+class JobQueue:
+    """
+    Analysis jobs run on scrape threads and a warm process pool.
+
+    Jobs are described by a dict with the keys ``subreddit``, ``sort``,
+    ``limit``, ``deep_comments``, ``llm_model`` (empty to skip summaries)
+    and ``use_cache`` (False to scrape again even if the posts are cached).
+
+    Args:
+        output_dir (str): Directory receiving one folder per job.
+        processes (int): Analysis worker processes.
+        scrape_threads (int): Jobs scraped at the same time.
+        scrape_workers (int): Comment-fetching threads per scrape.
+        max_finished (int): Finished jobs kept before the oldest are deleted.
+    """
+
+    def __init__(
+        self,
+        output_dir=DEFAULT_OUTPUT_DIR,
+        processes=2,
+        scrape_threads=4,
+        scrape_workers=4,
+        max_finished=MAX_FINISHED_JOBS,
+    ):
+        self.output_dir = output_dir
+        self.processes = processes
+        self.scrape_threads = scrape_threads
+        self.scrape_workers = scrape_workers
+        self.max_finished = max_finished
+        self._jobs = OrderedDict()
+        self._in_flight = {}  # job key -> id of the queued or running job
+        self._lock = threading.Lock()
+        self._scrapers = None
+        self._analyzers = None
+        self._stopped = False
+
+    def start(self):
+        """Start the analysis workers, which load the sentence encoder right away."""
+        self._stopped = False
+        self._scrapers = ThreadPoolExecutor(max_workers=self.scrape_threads)
+        self._analyzers = self._start_analyzers()
+
+    def _start_analyzers(self):
+        analyzers = ProcessPoolExecutor(
+            max_workers=self.processes,
+            # Forking the threaded server process could deadlock the children
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=init_worker,
+        )
+        # Each submit to a pool without idle workers spawns one, so this
+        # starts every worker now rather than when the first jobs arrive
+        for _ in range(self.processes):
+            analyzers.submit(int)
+        return analyzers
+
+    def shutdown(self):
+        """Stop the workers, dropping queued jobs."""
+        with self._lock:
+            self._stopped = True
+        self._scrapers.shutdown(cancel_futures=True)
+        self._analyzers.shutdown(cancel_futures=True)
+
+    def submit(self, params):
+        """
+        Queue a job, or join the queued or running job with the same params.
+
+        Returns:
+            dict: Status of the job (see ``status``).
+        """
+        key = job_key(params)
+        with self._lock:
+            job_id = self._in_flight.get(key)
+            if job_id is None:
+                job_id = uuid.uuid4().hex
+                self._jobs[job_id] = {
+                    "id": job_id,
+                    "status": QUEUED,
+                    "params": params,
+                    "submitted": time.time(),
+                }
+                self._in_flight[key] = job_id
+                self._scrapers.submit(self._run, job_id)
+            return self._status(job_id)
+
+    def status(self, job_id):
+        """
+        Status of a job, or None for unknown (or deleted) jobs.
+
+        The status has the job's ``id``, ``status``, ``params`` and
+        ``submitted`` time; ``started`` and ``finished`` times once reached;
+        ``posts`` and ``topics`` counts when done; and the failed ``stage``
+        and ``error`` when failed.
+        """
+        with self._lock:
+            return self._status(job_id) if job_id in self._jobs else None
+
+    def jobs(self):
+        """Status of every job, oldest first."""
+        with self._lock:
+            return [self._status(job_id) for job_id in self._jobs]
+
+    def read_result(self, job_id):
+        """
+        Result JSON of a finished job, as bytes, or None if it has none.
+
+        The file is read under the lock, so the job cannot be deleted halfway.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job["status"] != DONE:
+                return None
+            with open(job["result_path"], "rb") as f:
+                return f.read()
+
+    def _status(self, job_id):
+        job = self._jobs[job_id]
+        return {name: value for name, value in job.items() if name != "result_path"}
+
+    def _update(self, job_id, **changes):
+        with self._lock:
+            job = self._jobs[job_id]
+            job.update(changes)
+            if job["status"] in (DONE, FAILED):
+                job["finished"] = time.time()
+                self._in_flight.pop(job_key(job["params"]), None)
+                self._delete_old_jobs()
+
+    def _delete_old_jobs(self):
+        finished = [
+            job_id
+            for job_id, job in self._jobs.items()
+            if job["status"] in (DONE, FAILED)
+        ]
+        for job_id in finished[: max(len(finished) - self.max_finished, 0)]:
+            del self._jobs[job_id]
+            shutil.rmtree(os.path.join(self.output_dir, job_id), ignore_errors=True)
+
+    def _fail(self, job_id, stage, error):
+        self._update(
+            job_id,
+            status=FAILED,
+            stage=stage,
+            error="".join(traceback.format_exception_only(type(error), error)).strip(),
+        )
+
+    def _run(self, job_id):
+        """Scrape a job on this thread, then hand it to the analysis workers."""
+        params = self._jobs[job_id]["params"]
+        self._update(job_id, status=SCRAPING, started=time.time())
+        try:
+            posts_path = scrape_job(
+                params,
+                os.path.join(self.output_dir, job_id),
+                self.scrape_workers,
+                params["deep_comments"],
+                ttl=DEFAULT_TTL if params["use_cache"] else 0,
+            )
+        except Exception as e:
+            self._fail(job_id, "scrape", e)
+            return
+
+        result_path = os.path.join(os.path.dirname(posts_path), "result.json")
+        self._update(job_id, status=ANALYZING, result_path=result_path)
+        self._analyze(job_id, (params, posts_path, result_path), ANALYZE_RETRIES)
+
+    def _analyze(self, job_id, args, retries):
+        """Hand a job to the analysis workers."""
+        analyzers = self._analyzers
+        try:
+            future = analyzers.submit(analyze_to_file, *args)
+        except BrokenProcessPool as e:
+            self._retry_on_new_pool(job_id, args, retries, analyzers, e)
+            return
+        except RuntimeError as e:
+            # The queue is shutting down
+            self._fail(job_id, "analyze", e)
+            return
+        future.add_done_callback(
+            lambda future: self._finish(job_id, future, args, retries, analyzers)
+        )
+
+    def _finish(self, job_id, future, args, retries, analyzers):
+        try:
+            counts = future.result()
+        except BrokenProcessPool as e:
+            self._retry_on_new_pool(job_id, args, retries, analyzers, e)
+        except Exception as e:
+            self._fail(job_id, "analyze", e)
+        else:
+            self._update(job_id, status=DONE, **counts)
+
+    def _retry_on_new_pool(self, job_id, args, retries, broken, error):
+        """
+        Replace a pool broken by a dead worker and run the job again on it.
+
+        A worker that dies (e.g. killed for memory) breaks its whole pool and
+        fails every job on it, so each of them is retried on the new pool.
+        """
+        with self._lock:
+            # Only the first job to notice replaces the pool
+            if self._analyzers is broken and not self._stopped:
+                self._analyzers = self._start_analyzers()
+        broken.shutdown(wait=False)
+        if retries > 0:
+            self._analyze(job_id, args, retries - 1)
+        else:
+            self._fail(job_id, "analyze", error)
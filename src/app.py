@@ -1,12 +1,21 @@
-import matplotlib.pyplot as plt
-import plotly.express as px
+import json
+import os
+
 import streamlit as st
-from wordcloud import WordCloud
 
 import modeling.clustering as model
-from data_prep.transform import create_corpus, preprocess
-from data_retrieval.subreddit_scraper import scrape_subreddit_posts
-from summarization.topic_summarizer import generate_topic_summaries
+from analysis_service.client import submit_analysis, wait_for_result
+from data_prep.dedup import collapse_near_duplicates
+from data_prep.streaming import stream_preprocess
+from data_retrieval.comment_crawl import CommentCrawler
+from data_retrieval.scrape_cache import DEFAULT_TTL, cached_iter_subreddit_posts
+from instrumentation import Tracer, trace
+from modeling.embedding_cache import EmbeddingCache
+from modeling.registry import EMBEDDING_CACHE_NAME, get_sentence_model
+from modeling.topic_index import TopicIndex
+from summarization.response_cache import SummaryCache
+from summarization.topic_summarizer import iter_topic_summaries
+from visualization.word_clouds import WordCloudRenderer
 
 # Set page config
 st.set_page_config(
@@ -30,21 +39,6 @@ st.markdown(
         color: #666;
         margin-bottom: 2rem;
     }
-    .stTabs [data-baseweb="tab-list"] {
-        gap: 8px;
-    }
-    .stTabs [data-baseweb="tab"] {
-        height: 50px;
-        white-space: pre-wrap;
-        background-color: #676363;
-        border-radius: 4px;
-        padding: 10px 16px;
-        font-weight: 600;
-    }
-    .stTabs [aria-selected="true"] {
-        background-color: #FF4500 !important;
-        color: white !important;
-    }
     .topic-card {
         background-color: #676363;
         border-radius: 10px;
@@ -91,62 +85,241 @@ with st.sidebar:
     llm_options = ["llama3.2:latest", "deepseek-r1:1.5b"]
     llm_model = st.selectbox("LLM for topic summarization", llm_options)
 
+    use_cache = st.checkbox(
+        "Reuse recently scraped data",
+        value=True,
+        help="Serve posts scraped within the last hour from the local cache and "
+        "only fetch new posts or posts with new comments.",
+    )
+
+    deep_comments = st.checkbox(
+        "Crawl comment threads in depth",
+        value=False,
+        help="Expand collapsed comment threads and keep each post's highest "
+        "scored comments, instead of only its first 10 top-level comments. "
+        "Extra requests are capped per analysis, so this adds at most about a "
+        "minute of scraping.",
+    )
+
     analyze_button = st.button("Analyze Subreddit", use_container_width=True)
 
-# Main app functionality
+
+@st.cache_resource
+def load_sentence_model():
+    """Load the sentence encoder once per server process."""
+    return get_sentence_model(model.EMBEDDING_MODEL_NAME)
+
+
+@st.cache_resource
+def get_word_cloud_renderer():
+    """Word-cloud rendering pool and image cache shared by every session."""
+    return WordCloudRenderer()
+
+
+# Results of each pipeline stage kept per session, for this many inputs
+STAGE_CACHE_SIZE = 4
+# When set, analyses run on this analysis service (see serve.py) and the app
+# only polls it for the result
+SERVICE_URL = os.environ.get("ANALYSIS_SERVICE_URL")
+# Progress shown for each state of a service job
+SERVICE_PROGRESS = {
+    "queued": 0,
+    "scraping": 10,
+    "analyzing": 50,
+    "done": 75,
+    "failed": 75,
+}
+
+
+def stage_results(stage):
+    """Results of one pipeline stage kept in the session, keyed by its inputs."""
+    return st.session_state.setdefault("stage_results", {}).setdefault(stage, {})
+
+
+def remember(stage, key, result):
+    """Keep ``result`` for ``key``, evicting the oldest entry of the stage if full."""
+    results = stage_results(stage)
+    results.pop(key, None)
+    if len(results) >= STAGE_CACHE_SIZE:
+        results.pop(next(iter(results)))
+    results[key] = result
+    return result
+
+
+def cached_stage(stage, key, compute):
+    """Return the stored result of ``stage`` for ``key``, or compute and store it."""
+    results = stage_results(stage)
+    if key in results:
+        return results[key]
+    return remember(stage, key, compute())
+
+
+# Clicking the button starts an analysis; every other widget interaction
+# reruns this script, which then redraws the last analysis from the stage
+# results instead of running the pipeline again
 if analyze_button:
+    st.session_state["analysis"] = {
+        "subreddit": subreddit,
+        "sort": sort_options[sort_option],
+        "limit": post_limit,
+        "deep_comments": deep_comments,
+        "llm_model": llm_model,
+    }
+    # The pipeline stages record their timings into this trace
+    st.session_state["tracer"] = Tracer()
+    if not use_cache:
+        posts_key = (subreddit, sort_options[sort_option], post_limit, deep_comments)
+        stage_results("posts").pop(posts_key, None)
+        stage_results("service").pop(posts_key + (llm_model,), None)
+
+# Main app functionality
+analysis = st.session_state.get("analysis")
+if analysis is not None:
+    # Plotting libraries are only needed once there are results to show
+    import pandas as pd
+    import plotly.express as px
+
+    subreddit = analysis["subreddit"]
+    tracer = st.session_state["tracer"]
+
     try:
         # Show progress
         progress_bar = st.progress(0)
 
-        with st.spinner(f"Scraping data from r/{subreddit}..."):
-            df = scrape_subreddit_posts(
-                subreddit, sort_options[sort_option], post_limit
+        posts_key = (
+            subreddit,
+            analysis["sort"],
+            analysis["limit"],
+            analysis["deep_comments"],
+        )
+
+        # Scrape and process data; text is cleaned while posts are still arriving
+        def scrape():
+            with st.spinner(f"Scraping and processing data from r/{subreddit}..."):
+                with trace(tracer):
+                    records = cached_iter_subreddit_posts(
+                        subreddit,
+                        analysis["sort"],
+                        analysis["limit"],
+                        workers=8,
+                        ttl=DEFAULT_TTL if use_cache else 0,
+                        crawler=CommentCrawler() if analysis["deep_comments"] else None,
+                    )
+                    return stream_preprocess(records)
+
+        # Create model and analyze topics; the result depends only on the posts
+        def analyze_topics():
+            with st.spinner("Analyzing topics..."):
+                load_sentence_model()
+                embedding_cache = EmbeddingCache(model_name=EMBEDDING_CACHE_NAME)
+                with trace(tracer):
+                    # Only one post per group of near-duplicates is modeled
+                    docs, groups = collapse_near_duplicates(posts["text"])
+                    topic_model, topics = model.fit_or_load_topics(
+                        docs, embedding_cache=embedding_cache
+                    )
+                    # Served from the cache filled while fitting; picks the
+                    # example posts nearest each topic's centroid
+                    embeddings = model.embed_documents(
+                        topic_model, docs, embedding_cache
+                    )
+                df = model.assign_topics_to_dataframe(posts.copy(), topics, groups)
+                # Row positions, names and terms per topic, shared by everything below
+                topic_index = TopicIndex.from_dataframe(
+                    df, topic_model, embeddings[groups]
+                )
+                return df, topic_model, topic_index
+
+        # Or have the analysis service do all of it, summaries included
+        def analyze_on_service():
+            with st.spinner(f"Analyzing r/{subreddit} on the analysis service..."):
+                job = submit_analysis(SERVICE_URL, {**analysis, "use_cache": use_cache})
+                result = wait_for_result(
+                    SERVICE_URL,
+                    job,
+                    on_status=lambda job: progress_bar.progress(
+                        SERVICE_PROGRESS[job["status"]]
+                    ),
+                )
+            df = pd.DataFrame(result["posts"])
+            topics = {topic["topic"]: topic for topic in result["topics"]}
+            topic_index = TopicIndex(
+                df["topic"].to_numpy(),
+                terms={
+                    topic_id: [tuple(pair) for pair in topic["terms"]]
+                    for topic_id, topic in topics.items()
+                },
             )
-            st.success(f"Successfully scraped {len(df)} posts from r/{subreddit}")
-            progress_bar.progress(25)
-
-        # Process data
-        with st.spinner("Processing text data..."):
-            df["text"] = df.apply(create_corpus, axis=1)
-            df["text"] = df["text"].apply(preprocess)
-            progress_bar.progress(50)
-
-        # Create model and analyze topics
-        with st.spinner("Analyzing topics..."):
-            topic_model = model.create_models()
-            topics, probs = model.fit_transform_topics(topic_model, df["text"])
-            df = model.assign_topics_to_dataframe(df, topics)
-            progress_bar.progress(75)
-
-        # Generate topic summaries
-        with st.spinner("Generating topic summaries with LLM..."):
-            topic_summaries = generate_topic_summaries(
-                topic_model, df, llm_model=llm_model
+            topic_summaries = {
+                topic_id: {
+                    "name": topic["name"],
+                    "description": topic["description"],
+                    "failed": topic.get("failed", False),
+                }
+                for topic_id, topic in topics.items()
+                if topic_id != -1
+            }
+            return df, topic_index, topic_summaries
+
+        if SERVICE_URL:
+            service_key = posts_key + (analysis["llm_model"],)
+            stored_result = stage_results("service").get(service_key)
+            # Topics whose summary failed are summarized again by running the
+            # job again on the service, only when Analyze is clicked
+            if (
+                analyze_button
+                and stored_result is not None
+                and any(summary.get("failed") for summary in stored_result[2].values())
+            ):
+                stage_results("service").pop(service_key)
+            df, topic_index, service_summaries = cached_stage(
+                "service", service_key, analyze_on_service
+            )
+            st.success(
+                f"Analyzed {len(df)} posts from r/{subreddit} on the analysis service"
             )
+            topic_model = None
+            corpus_key = posts_key
+            remember(
+                "summaries", (corpus_key, analysis["llm_model"]), service_summaries
+            )
+        else:
+            posts = cached_stage("posts", posts_key, scrape)
+            st.success(f"Successfully scraped {len(posts)} posts from r/{subreddit}")
+            progress_bar.progress(50)
 
-            # Add topic names to dataframe
-            topic_id_to_name = {
-                topic_id: summary["name"]
-                for topic_id, summary in topic_summaries.items()
-            }
-            df["topic_name"] = df["topic"].map(
-                lambda x: topic_id_to_name.get(x, "Outlier") if x != -1 else "Outlier"
+            corpus_key = model.corpus_key(posts["text"])
+            df, topic_model, topic_index = cached_stage(
+                "topics", corpus_key, analyze_topics
             )
-            progress_bar.progress(100)
+        progress_bar.progress(75)
+
+        # Summaries of these topics by this LLM are only generated once; until
+        # they arrive the topics are shown under keyword labels
+        summary_key = (corpus_key, analysis["llm_model"])
+        stored_summaries = stage_results("summaries").get(summary_key)
+        topic_summaries = dict(stored_summaries or {})
+        topic_index.set_names(topic_summaries)
+        # Topics whose summary failed are requested again only when Analyze is
+        # clicked, not on every rerun; the service retries its own
+        retry_summaries = (
+            not SERVICE_URL
+            and analyze_button
+            and any(summary.get("failed") for summary in topic_summaries.values())
+        )
 
         # Display results
         st.markdown("## 📊 Analysis Results")
 
         # Topic overview
         st.markdown("### 🔍 Topic Overview")
-        topic_counts = df["topic_name"].value_counts()
-
         col1, col2 = st.columns(2)
+        bar_chart = col1.empty()
+        pie_chart = col2.empty()
 
-        with col1:
+        def overview_figures(topic_counts):
             # Display topic counts as a bar chart using Plotly
-            fig = px.bar(
+            bar = px.bar(
                 x=topic_counts.index,
                 y=topic_counts.values,
                 labels={"x": "Topic", "y": "Number of Posts"},
@@ -154,120 +327,228 @@ if analyze_button:
                 color=topic_counts.values,
                 color_continuous_scale="Viridis",
             )
-            fig.update_layout(
+            bar.update_layout(
                 xaxis_title="Topic",
                 yaxis_title="Count",
                 coloraxis_showscale=False,
                 height=400,
             )
-            st.plotly_chart(fig, use_container_width=True)
 
-        with col2:
             # Display topic distribution as a pie chart using Plotly
-            fig = px.pie(
+            pie = px.pie(
                 values=topic_counts.values,
                 names=topic_counts.index,
                 title="Topic Distribution",
                 color_discrete_sequence=px.colors.qualitative.Bold,
             )
-            fig.update_traces(textposition="inside", textinfo="percent+label")
-            fig.update_layout(height=400)
-            st.plotly_chart(fig, use_container_width=True)
+            pie.update_traces(textposition="inside", textinfo="percent+label")
+            pie.update_layout(height=400)
+            return bar, pie
+
+        def render_overview(revision):
+            topic_counts = df["topic"].map(topic_index.names).value_counts()
+            # Built once per set of topic names and counts
+            bar, pie = cached_stage(
+                "overview",
+                tuple(topic_counts.items()),
+                lambda: overview_figures(topic_counts),
+            )
+            bar_chart.plotly_chart(
+                bar, use_container_width=True, key=f"topic_bar_{revision}"
+            )
+            pie_chart.plotly_chart(
+                pie, use_container_width=True, key=f"topic_pie_{revision}"
+            )
+
+        render_overview(0)
+
+        # Terms of the topics that get a word cloud
+        topic_terms = {
+            topic_id: topic_index.terms(topic_id)
+            for topic_id in topic_index.topic_ids
+            if topic_id != -1 and topic_index.terms(topic_id)
+        }
 
-        # Topic details
+        # Topic details, largest topics first; only the selected topic is drawn
         st.markdown("### 📑 Topic Details")
-        tabs = st.tabs([f"{name} ({count})" for name, count in topic_counts.items()])
-
-        for i, (topic_name, count) in enumerate(topic_counts.items()):
-            with tabs[i]:
-                col1, col2 = st.columns([1, 2])
-
-                with col1:
-                    # Get the topic ID for this topic name
-                    topic_id = next(
-                        (
-                            tid
-                            for tid, name in topic_id_to_name.items()
-                            if name == topic_name
-                        ),
-                        -1,
-                    )
+        detail_topics = sorted(
+            topic_index.topic_ids, key=lambda tid: -topic_index.counts[tid]
+        )
+        selected_topic = st.segmented_control(
+            "Topic",
+            detail_topics,
+            default=detail_topics[0],
+            format_func=lambda tid: (
+                f"{topic_index.name(tid)} ({topic_index.counts[tid]})"
+            ),
+            label_visibility="collapsed",
+        )
+        if selected_topic is None:
+            selected_topic = detail_topics[0]
+
+        col1, col2 = st.columns([1, 2])
 
-                    if topic_id != -1:
-                        st.markdown(f"#### {topic_name}")
-                        st.markdown(
-                            f"**Summary:** {topic_summaries[topic_id]['description']}"
-                        )
-                        st.markdown("</div>", unsafe_allow_html=True)
-
-                        # Get topic words and create word cloud
-                        if topic_id in topic_model.get_topics():
-                            words = dict(topic_model.get_topics()[topic_id])
-
-                            # Create and display word cloud with better styling
-                            wordcloud = WordCloud(
-                                width=400,
-                                height=300,
-                                background_color="white",
-                                colormap="viridis",
-                                max_words=100,
-                                contour_width=1,
-                                contour_color="steelblue",
-                                prefer_horizontal=1,
-                            ).generate_from_frequencies(words)
-
-                            fig, ax = plt.subplots(figsize=(10, 6))
-                            ax.imshow(wordcloud, interpolation="bilinear")
-                            ax.axis("off")
-                            ax.set_title(
-                                f"Key Terms in '{topic_name}'", fontsize=14, pad=20
-                            )
-                            plt.tight_layout()
-                            st.pyplot(fig)
+        with col1:
+            # Placeholder for the topic's LLM name and description
+            summary_slot = st.empty()
+            if selected_topic in topic_summaries:
+                summary = topic_summaries[selected_topic]
+                summary_slot.markdown(
+                    f"#### {topic_index.name(selected_topic)}\n\n"
+                    f"**Summary:** {summary['description']}"
+                )
+            elif selected_topic != -1:
+                summary_slot.markdown(
+                    f"#### {topic_index.name(selected_topic)}\n\n"
+                    "*Generating summary...*"
+                )
+
+            # The selected topic's word cloud is rendered first; the others
+            # are rendered in the background for when they are selected
+            renderer = get_word_cloud_renderer()
+            renderer.prefetch(
+                topic_terms[topic_id]
+                for topic_id in sorted(
+                    topic_terms, key=lambda topic_id: topic_id != selected_topic
+                )
+            )
+            if selected_topic in topic_terms:
+                st.image(
+                    renderer.render(topic_terms[selected_topic]),
+                    caption=f"Key Terms in '{topic_index.name(selected_topic)}'",
+                    use_container_width=True,
+                )
 
-                with col2:
-                    # Display posts for this topic
-                    topic_posts = df[df["topic_name"] == topic_name].reset_index(
-                        drop=True
-                    )
+        with col2:
+            # Display posts for this topic
+            sample_posts = topic_index.rows(df, selected_topic, limit=5)
+
+            if not sample_posts.empty:
+                st.markdown(
+                    f"#### Sample Posts ({topic_index.counts[selected_topic]} total)"
+                )
 
-                    if not topic_posts.empty:
-                        st.markdown(f"#### Sample Posts ({len(topic_posts)} total)")
+                # Create a more visually appealing post display
+                for idx, row in sample_posts.iterrows():
+                    with st.expander(f"📝 {row['title']}"):
+                        st.markdown(
+                            f"""
+                            <div style="padding: 10px; border-radius: 5px; background-color: #f8f9fa;">
+                                {row['post text'] if row['post text'] and row['post text'] != 'nan' else '<em>No post text</em>'}
+                            </div>
+                            """,
+                            unsafe_allow_html=True,
+                        )
 
-                        # Create a more visually appealing post display
-                        for idx, row in topic_posts.head(5).iterrows():
-                            with st.expander(f"📝 {row['title']}"):
+                        if len(row["comments"]) > 0:
+                            st.markdown("##### 💬 Sample Comments:")
+                            for c_idx, comment in enumerate(row["comments"][:3], 1):
                                 st.markdown(
                                     f"""
-                                    <div style="padding: 10px; border-radius: 5px; background-color: #f8f9fa;">
-                                        {row['post text'] if row['post text'] and row['post text'] != 'nan' else '<em>No post text</em>'}
+                                    <div style="padding: 8px; border-left: 3px solid #FF4500; margin-bottom: 8px; background-color: #fafafa;">
+                                        {comment}
                                     </div>
                                     """,
                                     unsafe_allow_html=True,
                                 )
 
-                                if row["comments"]:
-                                    st.markdown("##### 💬 Sample Comments:")
-                                    for c_idx, comment in enumerate(
-                                        row["comments"][:3], 1
-                                    ):
-                                        st.markdown(
-                                            f"""
-                                            <div style="padding: 8px; border-left: 3px solid #FF4500; margin-bottom: 8px; background-color: #fafafa;">
-                                                {comment}
-                                            </div>
-                                            """,
-                                            unsafe_allow_html=True,
-                                        )
+        # Generate topic summaries, filling in each topic as it completes;
+        # summaries in the response cache are not requested again
+        if stored_summaries is None or retry_summaries:
+            summary_events = iter_topic_summaries(
+                topic_model,
+                df,
+                llm_model=analysis["llm_model"],
+                max_concurrency=4,
+                timeout=120,
+                retries=2,
+                response_cache=SummaryCache(),
+                batch_size=5,
+                topic_index=topic_index,
+                stream=True,
+            )
+            num_topics = len(topic_terms)
+            completed = 0
+            with st.spinner("Generating topic summaries with LLM..."):
+                with trace(tracer):
+                    for topic_id, summary, done in summary_events:
+                        if not done:
+                            # Tokens streamed so far for this topic
+                            if topic_id == selected_topic:
+                                summary_slot.markdown(
+                                    f"#### {topic_index.name(topic_id)}\n\n"
+                                    f"*{summary['description']}*"
+                                )
+                            continue
+                        topic_summaries[topic_id] = summary
+                        topic_index.set_names(topic_summaries)
+                        if topic_id == selected_topic:
+                            summary_slot.markdown(
+                                f"#### {topic_index.name(topic_id)}\n\n"
+                                f"**Summary:** {summary['description']}"
+                            )
+                        completed += 1
+                        render_overview(completed)
+                        progress_bar.progress(75 + 25 * completed // max(num_topics, 1))
+
+            # Kept even if some failed (they are marked), so reruns never wait
+            # for the LLM
+            remember("summaries", summary_key, topic_summaries)
+
+        # Add topic names to dataframe
+        named_df = df.assign(topic_name=df["topic"].map(topic_index.names))
+        progress_bar.progress(100)
+
+        # Where the time went, stage by stage
+        with st.expander("⏱️ Timing Breakdown"):
+            timings = pd.DataFrame(tracer.breakdown())
+            if timings.empty:
+                st.caption(
+                    "The analysis service ran every stage."
+                    if SERVICE_URL
+                    else "Every stage was reused from earlier in this session."
+                )
+            else:
+                stages = timings[timings["depth"] == 0]
+                fig = px.bar(
+                    stages,
+                    x="name",
+                    y=["wall_s", "cpu_s"],
+                    barmode="group",
+                    labels={"name": "Stage", "value": "Seconds", "variable": ""},
+                    title="Time per Stage",
+                )
+                fig.update_layout(height=350)
+                st.plotly_chart(fig, use_container_width=True)
+
+                timings["name"] = [
+                    "\u2003" * depth + name
+                    for depth, name in zip(timings["depth"], timings["name"])
+                ]
+                st.dataframe(
+                    timings[
+                        ["name", "calls", "wall_s", "cpu_s", "rss_delta_mb", "items"]
+                    ],
+                    use_container_width=True,
+                    hide_index=True,
+                )
+                st.download_button(
+                    "Download trace (JSON)",
+                    json.dumps(tracer.to_otlp(), indent=2),
+                    file_name=f"trace_{subreddit}.json",
+                    mime="application/json",
+                )
 
         # Raw data section with improved styling
         with st.expander("View Raw Data"):
             # Add a search filter
             search_term = st.text_input("Search in titles", "")
 
-            filtered_df = df
+            filtered_df = named_df
             if search_term:
-                filtered_df = df[df["title"].str.contains(search_term, case=False)]
+                filtered_df = named_df[
+                    named_df["title"].str.contains(search_term, case=False)
+                ]
 
             # Add styling to the dataframe
             st.dataframe(
@@ -0,0 +1,342 @@
+"""
+Analyze many subreddits in one run.
+
+Subreddits are scraped concurrently on threads; preprocessing, topic
+fitting and summarization then run on a process pool with one worker per
+core, each worker loading the sentence encoder once. Results for every
+subreddit are written to their own folder under the output directory, and a
+subreddit that fails, or whose spec is invalid, is recorded in
+``manifest.json`` without stopping the rest of the batch. If a worker dies
+(e.g. killed for memory), the pool is replaced and the analyses it was
+running are run again. A subreddit given twice with the same sort and limit
+is analyzed once.
+
+Usage (from the ``src`` directory):
+
+    python batch.py politics:month:200 television:week askscience
+    python batch.py --file subreddits.txt --output-dir results/2025-03-16
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import time
+import traceback
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    as_completed,
+    wait,
+)
+from concurrent.futures.process import BrokenProcessPool
+
+import modeling.clustering as model
+from data_prep.dedup import collapse_near_duplicates
+from data_prep.transform import build_corpus, preprocess_many
+from data_retrieval.comment_crawl import CommentCrawler
+from data_retrieval.columnar import load_posts, save_posts
+from data_retrieval.scrape_cache import DEFAULT_TTL, cached_scrape_subreddit_posts
+from modeling.registry import get_sentence_model
+from modeling.topic_index import TopicIndex
+from summarization.response_cache import SummaryCache
+from summarization.topic_summarizer import generate_topic_summaries
+
+DEFAULT_SORT = "month"
+DEFAULT_LIMIT = 100
+# Times an analysis is run again on a new pool after a worker died
+ANALYZE_RETRIES = 1
+
+
+def parse_job(spec):
+    """Parse ``subreddit[:sort[:limit]]`` into a job dict."""
+    parts = spec.strip().split(":")
+    if not parts[0] or len(parts) > 3:
+        raise ValueError(f"Invalid subreddit spec: {spec!r}")
+    limit = parts[2] if len(parts) > 2 else str(DEFAULT_LIMIT)
+    if not limit.isdigit() or int(limit) < 1:
+        raise ValueError(f"Invalid post limit in subreddit spec: {spec!r}")
+    return {
+        "subreddit": parts[0],
+        "sort": parts[1] if len(parts) > 1 and parts[1] else DEFAULT_SORT,
+        "limit": int(limit),
+    }
+
+
+def job_name(job):
+    return f"{job['subreddit']}_{job['sort']}_{job['limit']}"
+
+
+def scrape_job(job, output_dir, scrape_workers, deep_comments=False, ttl=DEFAULT_TTL):
+    """
+    Scrape one subreddit into ``<job dir>/posts.arrow`` and return its path.
+
+    With ``deep_comments`` each subreddit's comment threads are crawled in
+    depth, within a request budget of its own. Cached posts older than
+    ``ttl`` seconds are scraped again.
+    """
+    df = cached_scrape_subreddit_posts(
+        job["subreddit"],
+        job["sort"],
+        job["limit"],
+        workers=scrape_workers,
+        ttl=ttl,
+        crawler=CommentCrawler() if deep_comments else None,
+    )
+    path = os.path.join(output_dir, job_name(job), "posts.arrow")
+    save_posts(df, path)
+    return path
+
+
+def init_worker():
+    """Load the sentence encoder once per worker process."""
+    get_sentence_model(model.EMBEDDING_MODEL_NAME)
+
+
+def start_analyzers(processes=None):
+    """Process pool for ``analyze_job``, one worker per core by default."""
+    return ProcessPoolExecutor(
+        max_workers=processes or os.cpu_count(),
+        # Workers start while the scrape threads run, and forking a threaded
+        # process can deadlock the children
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=init_worker,
+    )
+
+
+def analyze_posts(df, llm_model, embeddings_path=None):
+    """
+    Preprocess, fit topics and summarize scraped posts.
+
+    Args:
+        df (pd.DataFrame): Scraped posts.
+        llm_model (str): Ollama model for summaries; empty to skip them.
+        embeddings_path (str): Optional ``.npy`` file receiving the document
+            embeddings, memory-mapped rather than held in the worker's memory.
+
+    Returns:
+        tuple: (``df`` with text, topic and topic_name columns, the topic
+        model, its TopicIndex and the topic summaries)
+    """
+    df["text"] = preprocess_many(build_corpus(df))
+
+    # The memory-mapped embedding cache is not safe to share between
+    # processes, and subreddits rarely share documents, so it is not used here
+    docs, groups = collapse_near_duplicates(df["text"])
+    topic_model, topics = model.fit_or_load_topics(
+        docs, embeddings_path=embeddings_path
+    )
+    df = model.assign_topics_to_dataframe(df, topics, groups)
+    topic_index = TopicIndex.from_dataframe(df, topic_model)
+
+    topic_summaries = {}
+    if llm_model:
+        topic_summaries = generate_topic_summaries(
+            topic_model,
+            df,
+            llm_model=llm_model,
+            max_concurrency=4,
+            timeout=120,
+            retries=2,
+            response_cache=SummaryCache(),
+            batch_size=5,
+            topic_index=topic_index,
+        )
+    topic_index.set_names(topic_summaries)
+    df["topic_name"] = df["topic"].map(topic_index.names)
+    return df, topic_model, topic_index, topic_summaries
+
+
+def analyze_job(job, posts_path, output_dir, llm_model):
+    """Preprocess, fit topics, summarize and write results for one subreddit."""
+    started = time.time()
+    job_dir = os.path.join(output_dir, job_name(job))
+    # Posts are memory-mapped from the scrape's Arrow file rather than pickled
+    # across to this process
+    df, topic_model, _, topic_summaries = analyze_posts(
+        load_posts(posts_path),
+        llm_model,
+        embeddings_path=os.path.join(job_dir, "embeddings.npy"),
+    )
+
+    topic_model.get_topic_info().to_csv(
+        os.path.join(job_dir, "topics.csv"), index=False
+    )
+    df[["id", "title", "topic", "topic_name"]].to_csv(
+        os.path.join(job_dir, "assignments.csv"), index=False
+    )
+    with open(os.path.join(job_dir, "summaries.json"), "w") as f:
+        json.dump({int(k): v for k, v in topic_summaries.items()}, f, indent=2)
+
+    return {
+        "posts": len(df),
+        "topics": len(topic_summaries),
+        "seconds": round(time.time() - started, 2),
+        "output": job_dir,
+    }
+
+
+def run_batch(
+    jobs,
+    output_dir,
+    llm_model="llama3.2:latest",
+    processes=None,
+    scrape_threads=4,
+    scrape_workers=4,
+    deep_comments=False,
+):
+    """
+    Run every job and return a manifest entry per job, in input order.
+
+    Args:
+        jobs (list[dict | str]): Jobs with subreddit, sort and limit keys, or
+            ``subreddit[:sort[:limit]]`` specs. Invalid specs are recorded as
+            failed; a job given more than once is run once.
+        output_dir (str): Directory receiving one result folder per job.
+        llm_model (str): Ollama model for summaries; empty to skip them.
+        processes (int): Analysis worker processes, defaults to the core count.
+        scrape_threads (int): Subreddits scraped at the same time.
+        scrape_workers (int): Comment-fetching threads per subreddit.
+        deep_comments (bool): Crawl comment threads in depth (see
+            ``data_retrieval.comment_crawl``).
+    """
+    os.makedirs(output_dir, exist_ok=True)
+
+    def fail(entry, stage, error):
+        entry.update(
+            status="failed",
+            stage=stage,
+            error="".join(traceback.format_exception_only(type(error), error)).strip(),
+        )
+
+    entries = []  # the manifest, in input order
+    manifest = {}  # job name -> entry; each job writes to its name's folder
+    unique_jobs = []
+    for job in jobs:
+        if isinstance(job, str):
+            try:
+                job = parse_job(job)
+            except ValueError as e:
+                entries.append({"spec": job.strip()})
+                fail(entries[-1], "parse", e)
+                continue
+        if job_name(job) not in manifest:
+            manifest[job_name(job)] = {**job, "status": "pending"}
+            entries.append(manifest[job_name(job)])
+            unique_jobs.append(job)
+
+    analyzers = start_analyzers(processes)
+    analyses = {}  # future -> (job, posts path, retries left, its pool)
+
+    def analyze(job, posts_path, retries):
+        pool = analyzers
+        try:
+            future = pool.submit(analyze_job, job, posts_path, output_dir, llm_model)
+        except BrokenProcessPool as e:
+            retry_on_new_pool(job, posts_path, retries, pool, e)
+        except RuntimeError as e:
+            fail(manifest[job_name(job)], "analyze", e)
+        else:
+            analyses[future] = (job, posts_path, retries, pool)
+
+    def retry_on_new_pool(job, posts_path, retries, broken, error):
+        # A worker that dies breaks its whole pool and fails every analysis
+        # on it, so each of them is run again on the new pool
+        nonlocal analyzers
+        if analyzers is broken:
+            broken.shutdown(wait=False)
+            analyzers = start_analyzers(processes)
+        if retries > 0:
+            analyze(job, posts_path, retries - 1)
+        else:
+            fail(manifest[job_name(job)], "analyze", error)
+
+    try:
+        with ThreadPoolExecutor(max_workers=scrape_threads) as scrapers:
+            scrapes = {
+                scrapers.submit(
+                    scrape_job, job, output_dir, scrape_workers, deep_comments
+                ): job
+                for job in unique_jobs
+            }
+            # Hand each subreddit to the process pool as soon as its scrape lands
+            for future in as_completed(scrapes):
+                job = scrapes[future]
+                try:
+                    posts_path = future.result()
+                except Exception as e:
+                    fail(manifest[job_name(job)], "scrape", e)
+                    continue
+                analyze(job, posts_path, ANALYZE_RETRIES)
+
+        while analyses:
+            done, _ = wait(analyses, return_when=FIRST_COMPLETED)
+            for future in done:
+                job, posts_path, retries, pool = analyses.pop(future)
+                try:
+                    manifest[job_name(job)].update(status="ok", **future.result())
+                except BrokenProcessPool as e:
+                    retry_on_new_pool(job, posts_path, retries, pool, e)
+                except Exception as e:
+                    fail(manifest[job_name(job)], "analyze", e)
+    finally:
+        analyzers.shutdown()
+
+    with open(os.path.join(output_dir, "manifest.json"), "w") as f:
+        json.dump(entries, f, indent=2)
+    return entries
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Analyze many subreddits in one run.",
+        epilog="Subreddits are given as subreddit[:sort[:limit]], "
+        f"defaulting to sort={DEFAULT_SORT} and limit={DEFAULT_LIMIT}.",
+    )
+    parser.add_argument("subreddits", nargs="*", help="subreddit[:sort[:limit]]")
+    parser.add_argument("--file", help="File with one subreddit spec per line")
+    parser.add_argument("--output-dir", default="results")
+    parser.add_argument("--llm-model", default="llama3.2:latest")
+    parser.add_argument("--no-summaries", action="store_true")
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--scrape-threads", type=int, default=4)
+    parser.add_argument(
+        "--deep-comments",
+        action="store_true",
+        help="Crawl comment threads in depth within a request budget",
+    )
+    args = parser.parse_args()
+
+    specs = list(args.subreddits)
+    if args.file:
+        with open(args.file) as f:
+            specs.extend(
+                line for line in f if line.strip() and not line.startswith("#")
+            )
+    if not specs:
+        parser.error("no subreddits given")
+
+    manifest = run_batch(
+        specs,
+        args.output_dir,
+        llm_model="" if args.no_summaries else args.llm_model,
+        processes=args.processes,
+        scrape_threads=args.scrape_threads,
+        deep_comments=args.deep_comments,
+    )
+
+    for entry in manifest:
+        detail = (
+            entry.get("error") or f"{entry['posts']} posts, {entry['topics']} topics"
+        )
+        label = (
+            f"r/{entry['subreddit']} ({entry['sort']})"
+            if "subreddit" in entry
+            else repr(entry["spec"])
+        )
+        print(f"{entry['status']:>6}  {label}: {detail}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Benchmark the clustering backends across corpus sizes to find the crossover.
+
+Fits the reducer and clusterer of each backend ("exact", "ann", "kmeans";
+see ``modeling.scalable``) on synthetic sentence-embedding-like vectors
+drawn around a fixed number of topic centers, and reports the time of each
+stage together with how well the clusters recover the true topics
+(adjusted Rand index over the documents not marked as outliers). The
+fastest backend per size shows where ``select_backend`` should switch.
+
+Run from the ``src`` directory:
+
+    python -m benchmarks.clustering --sizes 5000 20000 50000 100000
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from modeling.clustering import create_clustering_models
+from modeling.scalable import ANN_MIN_DOCS, KMEANS_MIN_DOCS, select_backend
+
+
+def synthetic_embeddings(num_docs, num_topics=30, dim=384, spread=0.8, seed=0):
+    """
+    Unit vectors scattered around ``num_topics`` random centers.
+
+    Returns:
+        tuple: (float32 embeddings of shape (num_docs, dim), true topic labels)
+    """
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(num_topics, dim))
+    centers /= np.linalg.norm(centers, axis=1, keepdims=True)
+    labels = rng.integers(num_topics, size=num_docs)
+    noise = rng.normal(scale=spread / np.sqrt(dim), size=(num_docs, dim))
+    embeddings = centers[labels] + noise
+    embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+    return embeddings.astype(np.float32), labels
+
+
+def run_backend(backend, embeddings, labels):
+    from sklearn.metrics import adjusted_rand_score
+
+    reducer, clusterer = create_clustering_models(backend, len(embeddings))
+
+    start = time.perf_counter()
+    reducer.fit(embeddings)
+    reduced = reducer.transform(embeddings)
+    reduce_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    clusterer.fit(reduced)
+    cluster_seconds = time.perf_counter() - start
+
+    predicted = np.asarray(clusterer.labels_)
+    assigned = predicted != -1
+    return {
+        "reduce_s": reduce_seconds,
+        "cluster_s": cluster_seconds,
+        "total_s": reduce_seconds + cluster_seconds,
+        "clusters": int(predicted.max() + 1),
+        "outliers": float(1 - assigned.mean()),
+        "ari": float(adjusted_rand_score(labels[assigned], predicted[assigned])),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[5000, 20000, 50000, 100000]
+    )
+    parser.add_argument("--backends", nargs="+", default=["exact", "ann", "kmeans"])
+    parser.add_argument(
+        "--max-exact",
+        type=int,
+        default=100_000,
+        help="Skip the exact backend above this many documents",
+    )
+    parser.add_argument("--topics", type=int, default=30)
+    parser.add_argument(
+        "--no-warmup",
+        action="store_true",
+        help="Skip the untimed warm-up run that triggers numba JIT compilation",
+    )
+    args = parser.parse_args()
+
+    if not args.no_warmup:
+        embeddings, labels = synthetic_embeddings(2000, args.topics)
+        for backend in args.backends:
+            run_backend(backend, embeddings, labels)
+
+    print(
+        f"{'docs':>8} {'backend':<8} {'reduce s':>9} {'cluster s':>10} "
+        f"{'total s':>9} {'clusters':>8} {'outliers':>8} {'ARI':>6}"
+    )
+    for num_docs in args.sizes:
+        embeddings, labels = synthetic_embeddings(num_docs, args.topics)
+        totals = {}
+        for backend in args.backends:
+            if backend == "exact" and num_docs > args.max_exact:
+                continue
+            result = run_backend(backend, embeddings, labels)
+            totals[backend] = result["total_s"]
+            print(
+                f"{num_docs:>8} {backend:<8} {result['reduce_s']:>9.2f} "
+                f"{result['cluster_s']:>10.2f} {result['total_s']:>9.2f} "
+                f"{result['clusters']:>8} {result['outliers']:>8.1%} "
+                f"{result['ari']:>6.3f}"
+            )
+        print(
+            f"{'':>8} fastest: {min(totals, key=totals.get)}, "
+            f"selected: {select_backend(num_docs)}"
+        )
+
+    print(
+        f"\nselect_backend switches to ann at {ANN_MIN_DOCS} and to kmeans at "
+        f"{KMEANS_MIN_DOCS} documents"
+    )
+
+
+if __name__ == "__main__":
+    main()
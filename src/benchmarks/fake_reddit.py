@@ -0,0 +1,232 @@
+"""
+Local fake-Reddit HTTP stub for offline benchmarks.
+
+Serves just enough of the Reddit OAuth API for praw to authenticate, page
+through a subreddit listing, load a submission's comments and expand the
+"load more comments" placeholders hiding the rest of them. Every response
+is delayed by a fixed latency and carries X-Ratelimit-* headers, so scraper
+concurrency and rate limiting can be measured without network access.
+
+Point a praw client at it with ``api_connect(**server.praw_config())``.
+"""
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# Comments Reddit returns per "load more comments" request
+MORE_CHILDREN_LIMIT = 100
+
+
+def make_post(index, subreddit):
+    post_id = f"p{index:05d}"
+    return {
+        "id": post_id,
+        "name": f"t3_{post_id}",
+        "title": f"Synthetic post {index}",
+        "selftext": f"Body of synthetic post {index}.",
+        "subreddit": subreddit,
+        "stickied": index == 0,
+        "num_comments": 12,
+        "score": 1000 - index,
+        "created_utc": 1700000000 + index,
+        "permalink": f"/r/{subreddit}/comments/{post_id}/",
+    }
+
+
+def make_comment(post_id, index):
+    comment_id = f"{post_id}c{index:02d}"
+    return {
+        "id": comment_id,
+        "name": f"t1_{comment_id}",
+        "body": f"Comment {index} on {post_id}.",
+        "stickied": False,
+        "score": 100 - index,
+        "parent_id": f"t3_{post_id}",
+        "link_id": f"t3_{post_id}",
+        "replies": "",
+    }
+
+
+def make_more(post_id, children):
+    """A "load more comments" placeholder for top-level comments of a post."""
+    return {
+        "kind": "more",
+        "data": {
+            "count": len(children),
+            "children": children,
+            "id": children[0] if children else "_",
+            "name": f"t1_{children[0]}" if children else "t1__",
+            "parent_id": f"t3_{post_id}",
+            "depth": 0,
+        },
+    }
+
+
+def listing(children, after=None):
+    return {
+        "kind": "Listing",
+        "data": {"children": children, "after": after, "before": None},
+    }
+
+
+class FakeRedditHandler(BaseHTTPRequestHandler):
+    server_version = "FakeReddit/1.0"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, payload):
+        server = self.server
+        with server.lock:
+            server.requests += 1
+            remaining = max(server.quota - server.requests, 0)
+            elapsed = time.monotonic() - server.started
+            reset = max(int(server.window - elapsed), 0)
+
+        time.sleep(server.latency)
+        body = json.dumps(payload).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("X-Ratelimit-Remaining", str(float(remaining)))
+        self.send_header("X-Ratelimit-Used", str(server.requests))
+        self.send_header("X-Ratelimit-Reset", str(reset))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        form = parse_qs(self.rfile.read(length).decode())
+        path = urlparse(self.path).path.rstrip("/")
+        if path == "/api/morechildren":
+            self._send_more_children(form)
+        elif path == "/api/v1/access_token":
+            self._send_json(
+                {
+                    "access_token": "fake-token",
+                    "token_type": "bearer",
+                    "expires_in": 86400,
+                    "scope": "*",
+                }
+            )
+        else:
+            self.send_error(404)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = parse_qs(url.query)
+        parts = [part for part in url.path.split("/") if part]
+
+        if len(parts) == 3 and parts[0] == "r":
+            self._send_listing(parts[1], params)
+        elif len(parts) >= 2 and parts[0] == "comments":
+            self._send_submission(parts[1])
+        else:
+            self.send_error(404)
+
+    def _send_listing(self, subreddit, params):
+        limit = int(params.get("limit", ["100"])[0])
+        after = params.get("after", [None])[0]
+        start = int(after[len("t3_p") :]) + 1 if after else 0
+        stop = min(start + min(limit, 100), self.server.num_posts)
+
+        children = [
+            {"kind": "t3", "data": make_post(index, subreddit)}
+            for index in range(start, stop)
+        ]
+        next_after = (
+            children[-1]["data"]["name"] if stop < self.server.num_posts else None
+        )
+        self._send_json(listing(children, next_after))
+
+    def _send_submission(self, post_id):
+        index = int(post_id[1:])
+        post = {"kind": "t3", "data": make_post(index, "fake")}
+        comments = [
+            {"kind": "t1", "data": make_comment(post_id, position)}
+            for position in range(self.server.comments_per_post)
+        ]
+        if self.server.hidden_comments:
+            first = self.server.comments_per_post
+            hidden = range(first, first + self.server.hidden_comments)
+            comments.append(make_more(post_id, [f"{post_id}c{i:02d}" for i in hidden]))
+        self._send_json([listing([post]), listing(comments)])
+
+    def _send_more_children(self, form):
+        """Answer ``/api/morechildren`` with up to 100 of the requested comments."""
+        post_id = form["link_id"][0][len("t3_") :]
+        children = form["children"][0].split(",")
+        things = [
+            {"kind": "t1", "data": make_comment(post_id, int(child.split("c")[-1]))}
+            for child in children[:MORE_CHILDREN_LIMIT]
+        ]
+        if len(children) > MORE_CHILDREN_LIMIT:
+            things.append(make_more(post_id, children[MORE_CHILDREN_LIMIT:]))
+        self._send_json({"json": {"errors": [], "data": {"things": things}}})
+
+
+class FakeRedditServer(ThreadingHTTPServer):
+    """
+    Threaded fake-Reddit server.
+
+    Args:
+        latency (float): Seconds each response is delayed by.
+        num_posts (int): Number of posts in every subreddit listing.
+        comments_per_post (int): Top-level comments returned per post.
+        hidden_comments (int): Further comments per post, behind a "load
+            more comments" placeholder.
+        quota (int): Requests allowed per window, reported via headers.
+        window (int): Seconds until the reported rate-limit window resets.
+    """
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        address=("127.0.0.1", 0),
+        latency=0.05,
+        num_posts=1000,
+        comments_per_post=12,
+        hidden_comments=0,
+        quota=100000,
+        window=600,
+    ):
+        super().__init__(address, FakeRedditHandler)
+        self.latency = latency
+        self.num_posts = num_posts
+        self.comments_per_post = comments_per_post
+        self.hidden_comments = hidden_comments
+        self.quota = quota
+        self.window = window
+        self.requests = 0
+        self.started = time.monotonic()
+        self.lock = threading.Lock()
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def praw_config(self):
+        """Settings for ``api_connect`` that route praw to this server."""
+        return {
+            "client_id": "fake-client",
+            "client_secret": "fake-secret",
+            "oauth_url": self.url,
+            "reddit_url": self.url,
+            "check_for_updates": False,
+        }
+
+    def start(self):
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return self
+
+
+if __name__ == "__main__":
+    server = FakeRedditServer(("127.0.0.1", 8765))
+    print(f"Fake Reddit listening on {server.url}")
+    server.serve_forever()
@@ -0,0 +1,188 @@
+"""
+Local mock Ollama server for offline summarization benchmarks.
+
+Implements ``POST /api/chat`` with a fixed per-request latency and a
+configurable number of parallel inference slots (like ``OLLAMA_NUM_PARALLEL``),
+answering every prompt in the ``Name:`` / ``Description:`` format that
+``generate_topic_summaries`` parses. Requests with a ``format`` schema (the
+batched mode) get a JSON reply with an entry for every ``Topic <id>:``
+heading in the prompt. Requests with ``stream`` set get the reply as
+newline-delimited JSON chunks, one word at a time, like Ollama does. A
+fraction of requests can be made to fail, and a fraction of batched entries
+to go missing, to exercise retries.
+
+Point the summarizer at it with ``generate_topic_summaries(..., host=server.url)``.
+"""
+
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def mock_reply(prompt):
+    digest = hashlib.sha256(prompt.encode()).hexdigest()[:8]
+    return f"Name: Mock Topic {digest}\nDescription: Mock description for {digest}."
+
+
+def mock_batch_reply(prompt, keep):
+    """JSON entries for the topics headed ``Topic <id>:`` for which ``keep(id)``."""
+    entries = []
+    for topic_id in re.findall(r"^Topic (-?\d+):$", prompt, flags=re.MULTILINE):
+        if keep(topic_id):
+            digest = hashlib.sha256(f"{topic_id}{prompt}".encode()).hexdigest()[:8]
+            entries.append(
+                {
+                    "topic_id": int(topic_id),
+                    "name": f"Mock Topic {digest}",
+                    "description": f"Mock description for {digest}.",
+                }
+            )
+    return json.dumps({"topics": entries})
+
+
+class MockOllamaHandler(BaseHTTPRequestHandler):
+    server_version = "MockOllama/1.0"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, payload, status=200):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        if self.path.rstrip("/") != "/api/chat":
+            self.send_error(404)
+            return
+
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length))
+        server = self.server
+
+        with server.lock:
+            server.requests += 1
+            fail = server.rng.random() < server.failure_rate
+
+        with server.slots:
+            time.sleep(server.latency)
+
+        if fail:
+            self._send_json({"error": "mock failure"}, status=500)
+            return
+
+        prompt = request["messages"][-1]["content"]
+        if request.get("format"):
+
+            def keep(topic_id):
+                with server.lock:
+                    return server.rng.random() >= server.drop_rate
+
+            content = mock_batch_reply(prompt, keep)
+        else:
+            content = mock_reply(prompt)
+        with server.lock:
+            server.prompt_tokens += len(prompt.split())
+        if request.get("stream"):
+            self._send_stream(request["model"], prompt, content)
+            return
+        self._send_json(
+            {
+                "model": request["model"],
+                "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                "message": {"role": "assistant", "content": content},
+                "done": True,
+                "done_reason": "stop",
+                "prompt_eval_count": len(prompt.split()),
+                "eval_count": 16,
+            }
+        )
+
+    def _send_stream(self, model, prompt, content):
+        """Send ``content`` as NDJSON chunks of one word each, then a final done chunk."""
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.end_headers()
+        created_at = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+        pieces = re.findall(r"\s*\S+\s*", content)
+        for piece in pieces:
+            time.sleep(self.server.token_latency)
+            chunk = {
+                "model": model,
+                "created_at": created_at,
+                "message": {"role": "assistant", "content": piece},
+                "done": False,
+            }
+            self.wfile.write(json.dumps(chunk).encode() + b"\n")
+            self.wfile.flush()
+        final = {
+            "model": model,
+            "created_at": created_at,
+            "message": {"role": "assistant", "content": ""},
+            "done": True,
+            "done_reason": "stop",
+            "prompt_eval_count": len(prompt.split()),
+            "eval_count": len(pieces),
+        }
+        self.wfile.write(json.dumps(final).encode() + b"\n")
+
+
+class MockOllamaServer(ThreadingHTTPServer):
+    """
+    Threaded mock Ollama server.
+
+    Args:
+        latency (float): Seconds of simulated inference per request.
+        parallel (int): Requests served at the same time; others queue.
+        failure_rate (float): Probability that a request returns HTTP 500.
+        drop_rate (float): Probability that a topic is left out of a batched
+            reply.
+        token_latency (float): Seconds between streamed chunks.
+        seed (int): Seed for the failure sampling.
+    """
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        address=("127.0.0.1", 0),
+        latency=0.5,
+        parallel=4,
+        failure_rate=0.0,
+        drop_rate=0.0,
+        token_latency=0.0,
+        seed=0,
+    ):
+        super().__init__(address, MockOllamaHandler)
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.drop_rate = drop_rate
+        self.token_latency = token_latency
+        self.slots = threading.Semaphore(parallel)
+        self.rng = random.Random(seed)
+        self.requests = 0
+        self.prompt_tokens = 0
+        self.lock = threading.Lock()
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return self
+
+
+if __name__ == "__main__":
+    server = MockOllamaServer(("127.0.0.1", 11435))
+    print(f"Mock Ollama listening on {server.url}")
+    server.serve_forever()
@@ -0,0 +1,187 @@
+"""
+End-to-end pipeline benchmark on synthetic subreddit corpora.
+
+Times every stage of the pipeline (corpus build, preprocess, near-duplicate
+collapsing, topic fitting and summarization against a mock Ollama server)
+for each corpus size, records the change in resident memory per stage and
+the process's peak resident memory after it, and writes the results as JSON
+so runs can be compared across commits. Memory is read from the operating
+system rather than traced, which would slow the pure-Python stages far more
+than the native ones and skew the timings.
+
+Topics are fitted by ``fit_or_load_topics``, the code path of the app and
+the CLIs, into an empty artifact directory. Its embedding, UMAP, HDBSCAN,
+c-TF-IDF and topic reduction steps are reported from the spans recorded by
+``InstrumentedBERTopic``, so changes to ``create_models`` or the clustering
+backends show up here.
+
+Run from the ``src`` directory:
+
+    python -m benchmarks.pipeline --sizes 100 1000 10000 --output bench.json
+"""
+
+import argparse
+import json
+import platform
+import subprocess
+import tempfile
+import time
+
+from benchmarks.mock_ollama import MockOllamaServer
+from benchmarks.synthetic import synthetic_subreddit_frame
+from data_prep.dedup import collapse_near_duplicates
+from data_prep.transform import build_corpus, preprocess_many
+from instrumentation import current_rss_mb, trace
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+STAGES = ["corpus", "preprocess", "dedup", "topics", "summarize"]
+# Spans recorded while fitting topics, reported as steps of the topics stage
+TOPIC_STEPS = ["embed", "umap", "hdbscan", "ctfidf", "reduce_topics"]
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def max_rss_mb():
+    if resource is None:
+        return None
+    # ru_maxrss is reported in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def timed_stage(results, name, func, *args, **kwargs):
+    rss_before = current_rss_mb()
+    start = time.perf_counter()
+    value = func(*args, **kwargs)
+    seconds = time.perf_counter() - start
+    rss_after = current_rss_mb()
+
+    rss_delta = None
+    if rss_before is not None and rss_after is not None:
+        rss_delta = round(rss_after - rss_before, 2)
+    results[name] = {
+        "seconds": round(seconds, 4),
+        "rss_delta_mb": rss_delta,
+        "max_rss_mb": max_rss_mb(),
+    }
+    print(f"  {name:<11} {seconds:9.3f}s  rss {rss_delta or 0:+9.1f} MB")
+    return value
+
+
+def topic_steps(tracer):
+    """Wall time of each fitting step recorded in ``tracer``."""
+    steps = {row["name"]: row for row in tracer.breakdown()}
+    return {
+        name: {
+            "seconds": round(steps[name]["wall_s"], 4),
+            "rss_delta_mb": round(steps[name]["rss_delta_mb"], 2),
+        }
+        for name in TOPIC_STEPS
+        if name in steps
+    }
+
+
+def benchmark_size(num_posts, stages, llm_server):
+    import modeling.clustering as model
+    from summarization.topic_summarizer import generate_topic_summaries
+
+    results = {}
+    df = synthetic_subreddit_frame(num_posts)
+    corpus = timed_stage(results, "corpus", build_corpus, df)
+    df["text"] = timed_stage(results, "preprocess", preprocess_many, corpus)
+    if "dedup" not in stages:
+        return results
+
+    docs, groups = timed_stage(results, "dedup", collapse_near_duplicates, df["text"])
+    results["dedup"]["unique"] = len(docs)
+    if "topics" not in stages:
+        return results
+
+    # An empty artifact directory, so the model is always fitted (and saved)
+    with tempfile.TemporaryDirectory() as artifact_dir, trace() as tracer:
+        topic_model, topics = timed_stage(
+            results,
+            "topics",
+            model.fit_or_load_topics,
+            docs,
+            artifact_dir=artifact_dir,
+        )
+    results["topics"]["steps"] = topic_steps(tracer)
+    results["topics"]["topics"] = len(set(topics) - {-1})
+    for name, step in results["topics"]["steps"].items():
+        print(f"    {name:<13} {step['seconds']:9.3f}s")
+    if "summarize" not in stages:
+        return results
+
+    df = model.assign_topics_to_dataframe(df, topics, groups)
+    timed_stage(
+        results,
+        "summarize",
+        generate_topic_summaries,
+        topic_model,
+        df,
+        llm_model="mock",
+        max_concurrency=4,
+        host=llm_server.url,
+    )
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument(
+        "--stages",
+        nargs="+",
+        choices=STAGES,
+        default=STAGES,
+        help="Stages to run; the pipeline stops after the first one left out",
+    )
+    parser.add_argument("--llm-latency", type=float, default=0.2)
+    parser.add_argument(
+        "--no-warmup",
+        action="store_true",
+        help="Skip the untimed warm-up run that triggers numba JIT compilation",
+    )
+    parser.add_argument("--output", default="benchmark_results.json")
+    args = parser.parse_args()
+
+    server = MockOllamaServer(latency=args.llm_latency).start()
+    report = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "runs": [],
+    }
+    try:
+        if not args.no_warmup:
+            print("warm-up (not recorded)")
+            benchmark_size(200, args.stages, server)
+        for num_posts in args.sizes:
+            print(f"{num_posts} posts")
+            stages = benchmark_size(num_posts, args.stages, server)
+            report["runs"].append({"posts": num_posts, "stages": stages})
+    finally:
+        server.shutdown()
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
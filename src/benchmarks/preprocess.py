@@ -0,0 +1,77 @@
+"""
+Benchmark corpus building and preprocessing throughput in docs/sec.
+
+Compares the original row-wise path (``df.apply(create_corpus, axis=1)``
+followed by an uncached per-document ``preprocess``) with ``build_corpus``
+plus ``preprocess_many``, in-process and on a multiprocessing pool.
+
+Run from the ``src`` directory:
+
+    python -m benchmarks.preprocess --posts 1000 5000 --processes 4
+"""
+
+import argparse
+import re
+import time
+
+from benchmarks.synthetic import synthetic_subreddit_frame
+from data_prep import transform
+from data_prep.transform import build_corpus, create_corpus, preprocess_many
+
+
+def legacy_preprocess(text):
+    """The preprocessing path before precompiled regexes and lemma caching."""
+    text = re.sub(r"\*{1,3}|_{1,3}|~{2}", "", text)
+    text = re.sub(r"\[(.*?)\]\(.*?\)", r"\1", text)
+    text = transform.emoji.demojize(text, delimiters=(" ", " "))
+    text = transform.contractions.fix(text)
+    text = re.sub(r"\W", " ", text.lower())
+    tokens = [
+        transform.lemmatizer.lemmatize(word)
+        for word in text.split()
+        if word not in transform.custom_stopwords and len(word) > 2
+    ]
+    return " ".join(tokens)
+
+
+def run_legacy(df):
+    return df.apply(create_corpus, axis=1).apply(legacy_preprocess).tolist()
+
+
+def run_batch(df, processes=1):
+    transform.lemmatize.cache_clear()
+    return preprocess_many(build_corpus(df), processes=processes)
+
+
+def timed(label, num_docs, func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    elapsed = time.perf_counter() - start
+    print(f"  {label:<22} {elapsed:8.2f}s  {num_docs / elapsed:10.1f} docs/s")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--posts", type=int, nargs="+", default=[1000, 5000])
+    parser.add_argument("--processes", type=int, default=4)
+    args = parser.parse_args()
+
+    for num_posts in args.posts:
+        df = synthetic_subreddit_frame(num_posts)
+        print(f"{num_posts} posts")
+        expected = timed("apply (legacy)", num_posts, run_legacy, df)
+        batch = timed("preprocess_many", num_posts, run_batch, df)
+        pooled = timed(
+            f"preprocess_many x{args.processes}",
+            num_posts,
+            run_batch,
+            df,
+            processes=args.processes,
+        )
+        if batch != expected or pooled != expected:
+            raise AssertionError("Batch preprocessing output differs from legacy path")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Benchmark serial vs concurrent comment fetching against the fake-Reddit stub.
+
+Run from the ``src`` directory:
+
+    python -m benchmarks.scrape --posts 300 --latency 0.05 --workers 1 4 8 16
+    python -m benchmarks.scrape --posts 100 --hidden-comments 300 --deep-budget 200
+"""
+
+import argparse
+import time
+
+from benchmarks.fake_reddit import FakeRedditServer
+from data_retrieval.comment_crawl import CommentCrawler, CrawlBudget
+from data_retrieval.rate_limit import TokenBucket
+from data_retrieval.subreddit_scraper import api_connect, scrape_subreddit_posts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--posts", type=int, default=300)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8, 16])
+    parser.add_argument(
+        "--hidden-comments",
+        type=int,
+        default=0,
+        help="Comments per post behind a 'load more comments' placeholder",
+    )
+    parser.add_argument(
+        "--deep-budget",
+        type=int,
+        default=0,
+        help="Crawl comments in depth with this many expansion requests",
+    )
+    args = parser.parse_args()
+
+    server = FakeRedditServer(
+        latency=args.latency,
+        num_posts=args.posts * 2,
+        hidden_comments=args.hidden_comments,
+    ).start()
+    try:
+        baseline = None
+        for workers in args.workers:
+            reddit_conn = api_connect(**server.praw_config())
+            rate_limiter = TokenBucket(rate=1000, capacity=workers)
+            crawler = None
+            if args.deep_budget:
+                crawler = CommentCrawler(
+                    CrawlBudget(max_requests=args.deep_budget),
+                    rate_limiter=rate_limiter,
+                )
+            start = time.perf_counter()
+            df = scrape_subreddit_posts(
+                "benchmark",
+                "month",
+                args.posts,
+                workers=workers,
+                reddit_conn=reddit_conn,
+                rate_limiter=rate_limiter,
+                crawler=crawler,
+            )
+            elapsed = time.perf_counter() - start
+
+            if baseline is None:
+                baseline = df
+            elif not df["id"].equals(baseline["id"]):
+                raise AssertionError("Concurrent scrape changed post order")
+
+            comment_chars = sum(
+                len(comment) for comments in df["comments"] for comment in comments
+            )
+            print(
+                f"workers={workers:3d}  posts={len(df):4d}  "
+                f"{elapsed:7.2f}s  {len(df) / elapsed:8.1f} posts/s  "
+                f"{comment_chars / len(df):8.0f} comment chars/post"
+            )
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
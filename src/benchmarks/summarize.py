@@ -0,0 +1,103 @@
+"""
+Benchmark serial vs concurrent topic summarization against a mock Ollama server.
+
+Each concurrency level is run once per batch size (topics per request; 1
+sends one request per topic). Prompt tokens are counted as words by the
+mock server.
+
+Run from the ``src`` directory:
+
+    python -m benchmarks.summarize --topics 20 --latency 0.5 --concurrency 1 4 8 \\
+        --batch-sizes 1 5 10
+"""
+
+import argparse
+import time
+
+import pandas as pd
+
+from benchmarks.mock_ollama import MockOllamaServer
+from summarization.topic_summarizer import generate_topic_summaries
+
+
+class StaticTopicModel:
+    """Minimal stand-in exposing the ``get_topic`` lookup the summarizer uses."""
+
+    def __init__(self, num_topics):
+        self.topics = {
+            topic_id: [
+                (f"term{topic_id}_{rank}", 1.0 / (rank + 1)) for rank in range(6)
+            ]
+            for topic_id in range(num_topics)
+        }
+
+    def get_topic(self, topic_id):
+        return self.topics[topic_id]
+
+
+def synthetic_topic_frame(num_topics, docs_per_topic=20):
+    rows = [
+        {"topic": topic_id, "text": f"document {doc} about topic {topic_id}"}
+        for topic_id in range(num_topics)
+        for doc in range(docs_per_topic)
+    ]
+    return pd.DataFrame(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--topics", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.5)
+    parser.add_argument("--parallel", type=int, default=8)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument(
+        "--drop-rate",
+        type=float,
+        default=0.0,
+        help="Probability that a topic is missing from a batched reply",
+    )
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8])
+    args = parser.parse_args()
+
+    server = MockOllamaServer(
+        latency=args.latency,
+        parallel=args.parallel,
+        failure_rate=args.failure_rate,
+        drop_rate=args.drop_rate,
+    ).start()
+    topic_model = StaticTopicModel(args.topics)
+    df = synthetic_topic_frame(args.topics)
+
+    try:
+        for batch_size in args.batch_sizes:
+            for concurrency in args.concurrency:
+                requests, prompt_tokens = server.requests, server.prompt_tokens
+                start = time.perf_counter()
+                summaries = generate_topic_summaries(
+                    topic_model,
+                    df,
+                    llm_model="mock",
+                    max_concurrency=concurrency,
+                    timeout=30,
+                    retries=2,
+                    host=server.url,
+                    batch_size=batch_size,
+                )
+                elapsed = time.perf_counter() - start
+                failed = sum(
+                    bool(summary.get("failed")) for summary in summaries.values()
+                )
+                print(
+                    f"batch={batch_size:3d}  concurrency={concurrency:3d}  "
+                    f"topics={len(summaries):3d}  failed={failed:3d}  "
+                    f"requests={server.requests - requests:4d}  "
+                    f"prompt tokens={server.prompt_tokens - prompt_tokens:6d}  "
+                    f"{elapsed:7.2f}s  {len(summaries) / elapsed:6.2f} topics/s"
+                )
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Synthetic subreddit corpora for offline benchmarks.
+
+``synthetic_subreddit_frame`` returns DataFrames with the same columns and
+Arrow-backed layout as scraped posts loaded with ``load_posts`` (title,
+post text, id, and comments as ``list<string>``). Posts are drawn
+from a handful of latent themes and sprinkled with the markdown, links,
+emoji and contractions the preprocessing pipeline has to handle.
+"""
+
+import random
+
+from data_retrieval.columnar import records_to_table, table_to_dataframe
+
+THEMES = {
+    "elections": "vote ballot senate governor campaign poll district turnout candidate",
+    "economy": "inflation market price wage interest rate job growth recession tariff",
+    "sports": "team season coach playoff game score trade draft injury league",
+    "television": "episode season finale character actor writer show network streaming",
+    "technology": "phone software update battery chip release privacy app developer",
+    "gaming": "patch console multiplayer quest boss level studio launch review",
+}
+FILLER = "the a this that really just think people would could about what when".split()
+DECORATIONS = [
+    "**{word}**",
+    "_{word}_",
+    "~~{word}~~",
+    "[{word}](https://example.com/{word})",
+    "{word} \U0001f525",
+    "don't {word}",
+    "they're {word}",
+]
+
+
+def _sentence(rng, theme_words, length):
+    words = []
+    for _ in range(length):
+        word = rng.choice(theme_words) if rng.random() < 0.6 else rng.choice(FILLER)
+        if rng.random() < 0.08:
+            word = rng.choice(DECORATIONS).format(word=word)
+        words.append(word)
+    return " ".join(words)
+
+
+def synthetic_subreddit_frame(num_posts, comments_per_post=10, seed=0):
+    """
+    Generate a scraped-subreddit DataFrame with ``num_posts`` rows.
+
+    Args:
+        num_posts (int): Number of posts to generate.
+        comments_per_post (int): Maximum number of comments per post.
+        seed (int): Random seed; the same seed yields the same frame.
+
+    Returns:
+        pd.DataFrame: Arrow-backed columns title, post text, id and comments.
+    """
+    rng = random.Random(seed)
+    themes = [words.split() for words in THEMES.values()]
+
+    rows = []
+    for index in range(num_posts):
+        theme_words = rng.choice(themes)
+        rows.append(
+            {
+                "title": _sentence(rng, theme_words, rng.randint(5, 14)).capitalize(),
+                "post text": (
+                    _sentence(rng, theme_words, rng.randint(10, 80))
+                    if rng.random() < 0.5
+                    else ""
+                ),
+                "id": f"s{index:07d}",
+                "comments": [
+                    _sentence(rng, theme_words, rng.randint(3, 40))
+                    for _ in range(rng.randint(0, comments_per_post))
+                ],
+            }
+        )
+
+    return table_to_dataframe(records_to_table(rows))
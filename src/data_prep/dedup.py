@@ -0,0 +1,174 @@
+"""
+Near-duplicate detection for preprocessed documents.
+
+Crossposts and reposted headlines produce documents that are nearly
+identical. Embedding them all costs time, and their tight clusters pull
+HDBSCAN towards junk topics. ``collapse_near_duplicates`` groups them so that
+only one representative per group is embedded and clustered.
+
+Documents are compared by the Jaccard similarity of their word 3-grams,
+estimated with MinHash signatures. An LSH index over bands of the
+signatures only compares documents that share a band, so the cost grows
+linearly with the corpus instead of with every pair of documents.
+"""
+
+import zlib
+from functools import lru_cache
+
+import numpy as np
+
+from instrumentation import span
+
+# Words per shingle
+SHINGLE_WORDS = 3
+# MinHash permutations, split into LSH_BANDS bands of NUM_PERM // LSH_BANDS
+# rows. Pairs at the threshold share a band with probability > 0.999
+NUM_PERM = 64
+LSH_BANDS = 16
+# Estimated Jaccard similarity from which documents count as duplicates
+DUPLICATE_THRESHOLD = 0.8
+# Words hashed per block, bounding the temporary arrays
+BLOCK_WORDS = 1_000_000
+
+# 64-bit FNV-1 multiplier, used to combine the words of a shingle
+_FNV_PRIME = np.uint64(0x100000001B3)
+
+
+def mix64(values):
+    """splitmix64 finalizer: a bijective 64-bit hash with good avalanche."""
+    values = (values ^ (values >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    values = (values ^ (values >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return values ^ (values >> np.uint64(31))
+
+
+@lru_cache(maxsize=1 << 20)
+def word_hash(word):
+    return zlib.crc32(word.encode())
+
+
+def shingle_hashes(docs, k=SHINGLE_WORDS):
+    """
+    Hashes of the word ``k``-grams of several documents.
+
+    Documents shorter than ``k`` words count as a single shingle.
+
+    Returns:
+        tuple: (hashes of every document's shingles, concatenated, and the
+        offset where each document's shingles start)
+    """
+    words = []
+    for doc in docs:
+        hashes = np.fromiter(map(word_hash, doc.split()), dtype=np.uint64)
+        if len(hashes) < k:
+            hashes = np.concatenate([hashes, np.zeros(k - len(hashes), np.uint64)])
+        words.append(hashes)
+    lengths = np.array([len(hashes) for hashes in words])
+    flat = np.concatenate(words)
+
+    # Combine each word with the k - 1 words after it, order-sensitively
+    combined = np.zeros(len(flat) - k + 1, dtype=np.uint64)
+    for i in range(k):
+        combined = (combined ^ flat[i : len(flat) - k + 1 + i]) * _FNV_PRIME
+
+    # Keep the k-grams that start and end inside the same document
+    counts = lengths - k + 1
+    offsets = np.cumsum(counts) - counts
+    starts = np.cumsum(lengths) - lengths
+    valid = np.repeat(starts - offsets, counts) + np.arange(counts.sum())
+    return mix64(combined[valid]), offsets
+
+
+def minhash_signatures(docs, num_perm=NUM_PERM, seed=1):
+    """
+    MinHash signature of every document.
+
+    The ``num_perm`` hash functions are ``a * h + b`` modulo 2**64 over the
+    shingle hashes ``h``, with random odd ``a``; a signature holds the
+    minimum of each one. Two signatures agree in a position with
+    probability close to the Jaccard similarity of the documents' shingle
+    sets.
+
+    Returns:
+        np.ndarray: A (documents, num_perm) uint64 matrix.
+    """
+    rng = np.random.default_rng(seed)
+    a = rng.integers(0, 1 << 63, size=num_perm, dtype=np.uint64) * 2 + 1
+    b = rng.integers(0, 1 << 63, size=num_perm, dtype=np.uint64)
+
+    signatures = np.empty((len(docs), num_perm), dtype=np.uint64)
+    start = 0
+    while start < len(docs):
+        # Documents up to BLOCK_WORDS words at a time, at least one
+        stop, words = start, 0
+        while stop < len(docs) and (stop == start or words < BLOCK_WORDS):
+            words += docs[stop].count(" ") + 1
+            stop += 1
+        hashes, offsets = shingle_hashes(docs[start:stop])
+        for j in range(num_perm):
+            signatures[start:stop, j] = np.minimum.reduceat(
+                hashes * a[j] + b[j], offsets
+            )
+        start = stop
+    return signatures
+
+
+def duplicate_leaders(signatures, threshold=DUPLICATE_THRESHOLD, bands=LSH_BANDS):
+    """
+    Position of the first document in each document's near-duplicate group.
+
+    Documents whose signatures are identical in some band are candidates;
+    each is checked against the first document of that band's bucket, and
+    pairs whose signatures agree in at least ``threshold`` of the positions
+    are joined. Groups are the connected components of those pairs.
+    """
+    from scipy.sparse import coo_matrix
+    from scipy.sparse.csgraph import connected_components
+
+    num_docs, num_perm = signatures.shape
+    rows = num_perm // bands
+    positions = np.arange(num_docs)
+    pairs = []
+    for band in range(bands):
+        block = np.ascontiguousarray(signatures[:, band * rows : (band + 1) * rows])
+        keys = block.view(np.dtype((np.void, block.itemsize * rows))).ravel()
+        _, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+        leader = first[inverse]
+        members = positions[leader != positions]
+        pairs.append(np.stack([members, leader[members]]))
+    pairs = np.unique(np.concatenate(pairs, axis=1), axis=1)
+
+    agreement = (signatures[pairs[0]] == signatures[pairs[1]]).mean(axis=1)
+    pairs = pairs[:, agreement >= threshold]
+    graph = coo_matrix(
+        (np.ones(pairs.shape[1], dtype=np.int8), (pairs[0], pairs[1])),
+        shape=(num_docs, num_docs),
+    )
+    _, labels = connected_components(graph, directed=False)
+    first_of_group = np.full(labels.max() + 1, num_docs)
+    np.minimum.at(first_of_group, labels, positions)
+    return first_of_group[labels]
+
+
+def collapse_near_duplicates(docs, threshold=DUPLICATE_THRESHOLD):
+    """
+    Keep one representative of every group of near-identical documents.
+
+    Args:
+        docs (Iterable[str]): Preprocessed documents.
+        threshold (float): Estimated Jaccard similarity of word 3-grams from
+            which two documents are duplicates.
+
+    Returns:
+        tuple: (the first document of every group, in corpus order, and an
+        array giving the position of each document's representative among
+        them). Index per-representative results with the array to get
+        per-document ones, e.g. ``topics[groups]``.
+    """
+    docs = list(docs)
+    if not docs:
+        return [], np.empty(0, dtype=np.intp)
+    with span("dedup", items=len(docs)) as current:
+        leaders = duplicate_leaders(minhash_signatures(docs), threshold)
+        representatives, groups = np.unique(leaders, return_inverse=True)
+        current.attributes["unique"] = len(representatives)
+    return [docs[i] for i in representatives], groups
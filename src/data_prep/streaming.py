@@ -0,0 +1,108 @@
+import queue
+import threading
+
+import pandas as pd
+
+from data_prep.transform import create_corpus, preprocess_many
+from data_retrieval.columnar import STRING
+from data_retrieval.subreddit_scraper import records_to_dataframe
+from instrumentation import in_context, span
+
+_DONE = object()
+
+
+class _StageError:
+    def __init__(self, error):
+        self.error = error
+
+
+def _put(out_queue, item, stop):
+    """
+    Queue ``item`` unless the consumer stops first; returns whether it was queued.
+
+    Puts wait in short steps rather than blocking, so a producer facing a full
+    queue that will never be read again still exits.
+    """
+    while not stop.is_set():
+        try:
+            out_queue.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _produce(records, out_queue, stop):
+    try:
+        # Wall time includes waits on a full queue; CPU time is the scrape's own
+        with span("scrape", items=0) as current:
+            for record in records:
+                if not _put(out_queue, record, stop):
+                    return
+                current.items += 1
+    except Exception as e:
+        _put(out_queue, _StageError(e), stop)
+    finally:
+        # Stops a scraping generator early, closing its session
+        close = getattr(records, "close", None)
+        if close is not None:
+            close()
+        _put(out_queue, _DONE, stop)
+
+
+def stream_preprocess(records, queue_size=64):
+    """
+    Preprocess post records while they are still being scraped.
+
+    ``records`` (e.g. ``iter_subreddit_posts``) is consumed on a background
+    thread and handed to the preprocessing stage through a bounded queue, so
+    text cleaning overlaps with network waits. When preprocessing falls
+    behind, the full queue pauses the scraper instead of buffering the whole
+    subreddit in memory. Records that queue up while a batch is being
+    cleaned are preprocessed together on the next pass. Errors raised by the
+    scraper are re-raised here.
+
+    Args:
+        records (Iterable[dict]): Post records with title, post text, id and
+            comments keys.
+        queue_size (int): Maximum number of scraped records waiting to be
+            preprocessed.
+
+    Returns:
+        pd.DataFrame: The scraped posts in arrival order plus the
+        preprocessed "text" column ready for ``fit_transform_topics``.
+    """
+    record_queue = queue.Queue(maxsize=queue_size)
+    stop = threading.Event()
+    producer = threading.Thread(
+        target=in_context(_produce), args=(records, record_queue, stop), daemon=True
+    )
+    producer.start()
+
+    rows, texts = [], []
+    try:
+        done = False
+        while not done:
+            batch = [record_queue.get()]
+            while len(batch) < queue_size:
+                try:
+                    batch.append(record_queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            records = []
+            for item in batch:
+                if item is _DONE:
+                    done = True
+                    break
+                if isinstance(item, _StageError):
+                    raise item.error
+                records.append(item)
+            rows.extend(records)
+            texts.extend(preprocess_many(create_corpus(record) for record in records))
+    finally:
+        stop.set()
+
+    df = records_to_dataframe(rows)
+    df["text"] = pd.array(texts, dtype=STRING)
+    return df
@@ -1,11 +1,17 @@
 import re
+from functools import lru_cache
+from multiprocessing import Pool
 
 import contractions
 import emoji
 import pandas as pd
+import pyarrow as pa
 from nltk.corpus import stopwords
 from nltk.stem import WordNetLemmatizer
 
+from data_retrieval.columnar import table_to_dataframe
+from instrumentation import span
+
 
 def create_corpus(row):
     """
@@ -15,7 +21,8 @@ def create_corpus(row):
     into a single string, filtering out any None values.
 
     Args:
-        row (dict): A dictionary containing 'title', 'post text', and 'comments' keys.
+        row (dict): A dictionary containing 'title', 'post text', and 'comments' keys,
+            or a row of a posts DataFrame (comments may then be a NumPy array).
 
     Returns:
         str: A single string representing the corpus for the given row.
@@ -24,16 +31,57 @@ def create_corpus(row):
     return " ".join(filter(None, components))
 
 
+def build_corpus(df):
+    """
+    Build the corpus for every row of a scraped DataFrame at once.
+
+    Produces the same strings as ``df.apply(create_corpus, axis=1)`` but
+    iterates the columns directly instead of materializing a Series per row.
+
+    Args:
+        df (pd.DataFrame | pa.Table): Posts with 'title', 'post text' and
+            'comments' columns, e.g. from ``scrape_subreddit_posts`` or
+            ``columnar.load_posts``.
+
+    Returns:
+        pd.Series: One corpus string per row, aligned with ``df.index``.
+    """
+    if isinstance(df, pa.Table):
+        df = table_to_dataframe(df)
+    # tolist() converts Arrow-backed columns in one pass instead of per element
+    corpus = [
+        " ".join(filter(None, [title, str(post_text), *comments]))
+        for title, post_text, comments in zip(
+            df["title"].tolist(), df["post text"].tolist(), df["comments"].tolist()
+        )
+    ]
+    return pd.Series(corpus, index=df.index, dtype="object")
+
+
+MARKDOWN_EMPHASIS = re.compile(r"\*{1,3}|_{1,3}|~{2}")
+MARKDOWN_LINK = re.compile(r"\[(.*?)\]\(.*?\)")
+NON_ASCII_SPAN = re.compile(r"[0-9#*]?[^\x00-\x7f]+")
+WORD = re.compile(r"\w+")
+
+
 def clean_markdown(text):
     # Remove bold/italic/strikethrough
-    text = re.sub(r"\*{1,3}|_{1,3}|~{2}", "", text)
+    text = MARKDOWN_EMPHASIS.sub("", text)
     # Convert markdown links to plain text
-    text = re.sub(r"\[(.*?)\]\(.*?\)", r"\1", text)
+    text = MARKDOWN_LINK.sub(r"\1", text)
     return text
 
 
+def _demojize_span(match):
+    return emoji.demojize(match.group(), delimiters=(" ", " "))
+
+
 def remove_emoji(text):
-    return emoji.demojize(text, delimiters=(" ", " "))
+    # Emoji are never plain ASCII (keycaps start with one ASCII character), so
+    # only the non-ASCII spans need the comparatively slow emoji scan
+    if text.isascii():
+        return text
+    return NON_ASCII_SPAN.sub(_demojize_span, text)
 
 
 def expand_contractions(text):
@@ -46,14 +94,65 @@ custom_stopwords = set(stopwords.words("english")).union(
 )
 
 
-def preprocess(text):
-    text = clean_markdown(text)
-    text = remove_emoji(text)
-    text = expand_contractions(text)
-    text = re.sub(r"\W", " ", text.lower())
+@lru_cache(maxsize=100_000)
+def lemmatize(word):
+    return lemmatizer.lemmatize(word)
+
+
+def tokenize(text):
+    # Lowercase, drop stopwords and short words, and lemmatize the rest
     tokens = [
-        lemmatizer.lemmatize(word)
-        for word in text.split()
+        lemmatize(word)
+        for word in WORD.findall(text.lower())
         if word not in custom_stopwords and len(word) > 2
     ]
     return " ".join(tokens)
+
+
+PREPROCESS_STEPS = [
+    ("markdown", clean_markdown),
+    ("emoji", remove_emoji),
+    ("contractions", expand_contractions),
+    ("tokenize", tokenize),
+]
+
+
+def preprocess(text):
+    for _, step in PREPROCESS_STEPS:
+        text = step(text)
+    return text
+
+
+def preprocess_many(texts, processes=1, chunksize=64):
+    """
+    Preprocess a batch of documents.
+
+    Identical documents are only processed once. In-process, each step of
+    ``PREPROCESS_STEPS`` runs over the whole batch in turn and is traced as
+    its own span. With ``processes`` > 1 the unique documents are spread over
+    a multiprocessing pool, which pays off for corpora of several thousand
+    documents; each worker keeps its own lemma cache.
+
+    Args:
+        texts (Iterable[str]): Raw documents, e.g. the output of ``build_corpus``.
+        processes (int): Number of worker processes. 1 runs in-process.
+        chunksize (int): Documents handed to a worker at a time.
+
+    Returns:
+        list[str]: Preprocessed documents in input order.
+    """
+    texts = list(texts)
+    unique_texts = list(dict.fromkeys(texts))
+
+    if processes > 1 and len(unique_texts) > chunksize:
+        with span("preprocess", items=len(unique_texts), processes=processes):
+            with Pool(processes) as pool:
+                cleaned = pool.map(preprocess, unique_texts, chunksize=chunksize)
+    else:
+        cleaned = unique_texts
+        for name, step in PREPROCESS_STEPS:
+            with span(f"preprocess.{name}", items=len(cleaned)):
+                cleaned = [step(text) for text in cleaned]
+
+    lookup = dict(zip(unique_texts, cleaned))
+    return [lookup[text] for text in texts]
@@ -0,0 +1,76 @@
+"""
+Arrow-backed storage for scraped posts.
+
+Posts are held as an Arrow table with a ``list<string>`` comments column
+instead of Python lists in an object column. ``table_to_dataframe`` wraps
+the table in a DataFrame without copying (every column uses
+``pd.ArrowDtype``), so the rest of the pipeline keeps its pandas API while
+the data stays in compact contiguous buffers.
+
+Tables can be written as Arrow IPC files, which ``load_posts`` memory-maps
+back without reading them into memory, or as Parquet for smaller files.
+"""
+
+import os
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+POSTS_SCHEMA = pa.schema(
+    [
+        ("title", pa.string()),
+        ("post text", pa.string()),
+        ("id", pa.string()),
+        ("comments", pa.list_(pa.string())),
+    ]
+)
+STRING = pd.ArrowDtype(pa.string())
+
+
+def records_to_table(records):
+    """Convert post records (title, post text, id, comments) to an Arrow table."""
+    return pa.Table.from_pylist(list(records), schema=POSTS_SCHEMA)
+
+
+def table_to_dataframe(table):
+    """Wrap an Arrow table in a DataFrame without copying its buffers."""
+    return table.to_pandas(types_mapper=pd.ArrowDtype)
+
+
+def dataframe_to_table(df):
+    """Convert a posts DataFrame (Arrow-backed or not) back to an Arrow table."""
+    return pa.Table.from_pandas(df, preserve_index=False)
+
+
+def save_posts(df, path):
+    """
+    Write posts to ``path``.
+
+    ``.parquet`` files are compressed; any other extension is written as an
+    uncompressed Arrow IPC file that ``load_posts`` can memory-map.
+    """
+    table = df if isinstance(df, pa.Table) else dataframe_to_table(df)
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    if path.endswith(".parquet"):
+        pq.write_table(table, path)
+        return
+    with pa.OSFile(path, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+
+
+def load_posts(path, memory_map=True):
+    """
+    Load posts written by ``save_posts`` as an Arrow-backed DataFrame.
+
+    Arrow IPC files are memory-mapped, so their columns are paged in from
+    disk on access instead of being copied into memory.
+    """
+    if path.endswith(".parquet"):
+        table = pq.read_table(path, memory_map=memory_map)
+    else:
+        source = pa.memory_map(path) if memory_map else pa.OSFile(path)
+        table = pa.ipc.open_file(source).read_all()
+    return table_to_dataframe(table)
@@ -0,0 +1,153 @@
+import heapq
+import itertools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from praw.exceptions import APIException, ClientException
+from praw.models import MoreComments
+from prawcore.exceptions import PrawcoreException
+
+from data_retrieval.rate_limit import TokenBucket
+from instrumentation import span
+
+# Comment bodies left behind by deleted comments
+DELETED_BODIES = {"[deleted]", "[removed]"}
+# Errors of one expansion request, which only skip that branch of the tree
+EXPANSION_ERRORS = (
+    PrawcoreException,
+    ClientException,
+    APIException,
+    requests.RequestException,
+)
+
+
+class CrawlBudget:
+    """
+    Thread-safe request and time budget shared by every post of one scrape.
+
+    Args:
+        max_requests (int): Comment-expansion requests allowed in total.
+        max_seconds (float): Seconds after creation when expansion stops.
+    """
+
+    def __init__(self, max_requests=300, max_seconds=60.0):
+        self.max_requests = max_requests
+        self.deadline = time.monotonic() + max_seconds
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def take(self):
+        """Reserve one request; False once the requests or the time are used up."""
+        with self._lock:
+            if self.requests >= self.max_requests or time.monotonic() >= self.deadline:
+                return False
+            self.requests += 1
+            return True
+
+
+class CommentCrawler:
+    """
+    Deep comment crawl that expands "load more comments" links within a budget.
+
+    The normal scrape keeps the first top-level comments of every post. The
+    crawler instead walks the whole comment tree Reddit returns with the
+    post and expands its ``MoreComments`` placeholders breadth-first:
+    shallow placeholders before deep ones and, within a level, those hiding
+    the most comments first. Up to ``concurrency`` expansions run at a time
+    across all posts, paced by ``rate_limiter``, and all posts draw on one
+    ``CrawlBudget``. A post stops expanding once it has ``max_chars`` of
+    comment text, since placeholders hide lower-ranked comments.
+
+    The comments are then ranked by score and kept, best first, as long as
+    they fit in ``max_chars`` characters per post.
+
+    Args:
+        budget (CrawlBudget): Budget for the scrape; a new one per crawler
+            by default, so create one crawler per run.
+        concurrency (int): Expansion requests in flight at once.
+        max_chars (int): Comment characters kept per post.
+        rate_limiter (TokenBucket): Limiter for the expansion requests. The
+            scrape shares it when not given its own.
+    """
+
+    def __init__(self, budget=None, concurrency=4, max_chars=10_000, rate_limiter=None):
+        self.budget = budget or CrawlBudget()
+        self.concurrency = concurrency
+        self.max_chars = max_chars
+        self.rate_limiter = rate_limiter or TokenBucket()
+        self._slots = threading.Semaphore(concurrency)
+
+    def _expand(self, more, auth):
+        """Fetch the comments behind one placeholder; [] if the request fails."""
+        with self._slots:
+            self.rate_limiter.acquire()
+            try:
+                items = more.comments()
+            except EXPANSION_ERRORS:
+                return []
+            finally:
+                self.rate_limiter.sync(auth.limits)
+        return items
+
+    def crawl(self, post, reddit_conn):
+        """
+        Return the bodies of ``post``'s top comments, highest score first.
+
+        ``reddit_conn`` is the ``praw.Reddit`` connection ``post`` was loaded
+        with; the rate limiter follows its rate-limit headers.
+        """
+        with span("scrape.crawl") as current:
+            post.comment_sort = "top"
+            comments = {}
+            chars = 0
+            pending = []  # heap of (depth, -hidden comments, order, placeholder)
+            order = itertools.count()
+
+            def collect(items, depth):
+                nonlocal chars
+                stack = [(item, depth) for item in items]
+                while stack:
+                    item, depth = stack.pop()
+                    if isinstance(item, MoreComments):
+                        heapq.heappush(
+                            pending, (depth, -(item.count or 0), next(order), item)
+                        )
+                    elif not item.stickied and item.body not in DELETED_BODIES:
+                        if item.id not in comments:
+                            comments[item.id] = item
+                            chars += len(item.body)
+                        stack.extend((reply, depth + 1) for reply in item.replies)
+
+            collect(post.comments, 0)
+            requests = 0
+            with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+                while pending and chars < self.max_chars:
+                    level = []
+                    while pending and len(level) < self.concurrency:
+                        if not self.budget.take():
+                            pending.clear()
+                            break
+                        level.append(heapq.heappop(pending))
+                    results = executor.map(
+                        self._expand,
+                        [entry[-1] for entry in level],
+                        itertools.repeat(reddit_conn.auth),
+                    )
+                    # A placeholder stands in for comments at its own depth
+                    for (depth, *_), items in zip(level, results):
+                        collect(items, depth)
+                    requests += len(level)
+
+            ranked = sorted(
+                comments.values(), key=lambda comment: comment.score, reverse=True
+            )
+            kept, chars = [], 0
+            for comment in ranked:
+                if chars + len(comment.body) <= self.max_chars:
+                    kept.append(comment.body)
+                    chars += len(comment.body)
+            current.items = len(kept)
+            current.attributes.update(requests=requests, found=len(comments))
+        return kept
@@ -0,0 +1,64 @@
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket used to pace concurrent Reddit API requests.
+
+    Tokens refill continuously at ``rate`` tokens per second up to ``capacity``.
+    Every request takes one token, blocking until one is available. Calling
+    ``sync`` with the rate-limit state reported by Reddit (the X-Ratelimit-*
+    headers, exposed by praw as ``reddit.auth.limits``) re-targets the refill
+    rate so the remaining quota is spread evenly over the current window.
+
+    Args:
+        rate (float): Initial refill rate in requests per second. Reddit's
+            documented OAuth limit is 100 requests per minute.
+        capacity (int): Maximum burst size.
+    """
+
+    def __init__(self, rate=100 / 60, capacity=10):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(
+            self.capacity, self._tokens + (now - self._updated) * self.rate
+        )
+        self._updated = now
+
+    def acquire(self, tokens=1):
+        """Block until ``tokens`` tokens are available, then consume them."""
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def sync(self, limits):
+        """
+        Align the bucket with the rate-limit state reported by Reddit.
+
+        Args:
+            limits (dict): Mapping with ``remaining`` (requests left in the
+                window) and ``reset_timestamp`` (epoch seconds when the window
+                resets). Missing or ``None`` values leave the bucket unchanged.
+        """
+        remaining = limits.get("remaining")
+        reset_timestamp = limits.get("reset_timestamp")
+        if remaining is None or reset_timestamp is None:
+            return
+
+        seconds_to_reset = max(reset_timestamp - time.time(), 1.0)
+        with self._lock:
+            self._refill()
+            self.rate = max(remaining, 1) / seconds_to_reset
+            self._tokens = min(self._tokens, remaining)
@@ -0,0 +1,318 @@
+import json
+import os
+import sqlite3
+import time
+from contextlib import closing
+
+import pandas as pd
+
+from data_retrieval.subreddit_scraper import (
+    SORT_CONFIG,
+    api_connect,
+    fetch_posts,
+    iter_comments,
+    post_record,
+    records_to_dataframe,
+)
+
+DEFAULT_CACHE_PATH = os.getenv(
+    "SCRAPE_CACHE_PATH", os.path.join("cache", "scrapes.sqlite")
+)
+DEFAULT_TTL = 60 * 60  # seconds
+# Appended to the subreddit key of listings and posts scraped with a deep
+# crawl; ":" cannot occur in subreddit names (unlike "+", for multireddits)
+DEEP_SUFFIX = ":deep"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS listings (
+    subreddit TEXT NOT NULL,
+    sort TEXT NOT NULL,
+    time_filter TEXT NOT NULL,
+    post_ids TEXT NOT NULL,
+    -- Posts asked for; more than the listing holds if the subreddit ran out
+    requested_limit INTEGER NOT NULL DEFAULT 0,
+    fetched_at REAL NOT NULL,
+    PRIMARY KEY (subreddit, sort, time_filter)
+);
+CREATE TABLE IF NOT EXISTS posts (
+    subreddit TEXT NOT NULL,
+    id TEXT NOT NULL,
+    title TEXT,
+    post_text TEXT,
+    num_comments INTEGER,
+    comments TEXT NOT NULL,
+    fetched_at REAL NOT NULL,
+    PRIMARY KEY (subreddit, id)
+);
+"""
+
+
+class ScrapeCache:
+    """
+    SQLite-backed cache of scraped subreddit listings, posts and comments.
+
+    Listings are keyed by (subreddit, sort, time_filter) and expire after
+    ``ttl`` seconds. Posts are stored once per subreddit so that overlapping
+    listings (e.g. "week" and "month") share their comments. Deep-crawled
+    comments (see ``data_retrieval.comment_crawl``) are kept apart from the
+    normal ones, under the subreddit name with a ``DEEP_SUFFIX``.
+
+    Args:
+        path (str): Location of the SQLite database file.
+        ttl (float): Seconds before a cached listing is considered stale.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, ttl=DEFAULT_TTL):
+        self.path = path
+        self.ttl = ttl
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with closing(self._connect()) as conn, conn:
+            conn.executescript(SCHEMA)
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(listings)")}
+            if "requested_limit" not in columns:
+                # Caches created before the requested limit was stored
+                conn.execute(
+                    "ALTER TABLE listings "
+                    "ADD COLUMN requested_limit INTEGER NOT NULL DEFAULT 0"
+                )
+
+    def _connect(self):
+        return sqlite3.connect(self.path)
+
+    @staticmethod
+    def _listing_key(subreddit, sort, deep=False):
+        if sort not in SORT_CONFIG:
+            raise ValueError(
+                f"Invalid sort option. Choose from: {', '.join(SORT_CONFIG.keys())}"
+            )
+        config = SORT_CONFIG[sort]
+        subreddit = subreddit.lower() + (DEEP_SUFFIX if deep else "")
+        return subreddit, config["method"], config.get("time_filter", "")
+
+    def load_records(
+        self, subreddit: str, sort: str = "month", limit: int = 100, deep=False
+    ):
+        """
+        Return the cached post records for a listing, or None if missing or expired.
+
+        A listing cached with fewer than ``limit`` posts counts as missing,
+        unless it was scraped with a limit of at least ``limit`` and the
+        subreddit simply had no more posts. ``deep`` selects the listing
+        scraped with a deep comment crawl.
+        """
+        key = self._listing_key(subreddit, sort, deep)
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT post_ids, requested_limit, fetched_at FROM listings "
+                "WHERE subreddit = ? AND sort = ? AND time_filter = ?",
+                key,
+            ).fetchone()
+            if row is None:
+                return None
+
+            post_ids, requested_limit, fetched_at = row
+            post_ids = json.loads(post_ids)
+            if time.time() - fetched_at > self.ttl:
+                return None
+            if len(post_ids) < limit and requested_limit < limit:
+                return None
+
+            records = self._read_records(conn, key[0], post_ids[:limit])
+            return [records[post_id] for post_id in post_ids[:limit]]
+
+    def load(self, subreddit: str, sort: str = "month", limit: int = 100, deep=False):
+        """Return the cached posts for a listing as a DataFrame, or None."""
+        records = self.load_records(subreddit, sort, limit, deep)
+        return None if records is None else records_to_dataframe(records)
+
+    def _read_records(self, conn, subreddit, post_ids):
+        if not post_ids:
+            return {}
+        placeholders = ", ".join("?" * len(post_ids))
+        rows = conn.execute(
+            "SELECT id, title, post_text, comments FROM posts "
+            f"WHERE subreddit = ? AND id IN ({placeholders})",
+            (subreddit, *post_ids),
+        ).fetchall()
+        return {
+            post_id: {
+                "title": title,
+                "post text": post_text,
+                "id": post_id,
+                "comments": json.loads(comments),
+            }
+            for post_id, title, post_text, comments in rows
+        }
+
+    def _known_comment_counts(self, conn, subreddit, post_ids):
+        if not post_ids:
+            return {}
+        placeholders = ", ".join("?" * len(post_ids))
+        rows = conn.execute(
+            "SELECT id, num_comments FROM posts "
+            f"WHERE subreddit = ? AND id IN ({placeholders})",
+            (subreddit, *post_ids),
+        ).fetchall()
+        return dict(rows)
+
+    def iter_refresh(
+        self,
+        subreddit: str,
+        sort: str = "month",
+        limit: int = 100,
+        workers: int = 1,
+        reddit_conn=None,
+        crawler=None,
+    ):
+        """
+        Re-fetch a listing, updating the cache incrementally, and yield its records.
+
+        The listing itself is always re-fetched (one request per 100 posts).
+        Comments are only pulled for posts that are not cached yet or whose
+        ``num_comments`` changed since they were cached. Records are yielded
+        in listing order as soon as they are available and each fetched post
+        is written to the cache right away. Comments are crawled in depth
+        with ``crawler`` if given.
+        """
+        key = self._listing_key(subreddit, sort, deep=crawler is not None)
+        reddit_conn = reddit_conn or api_connect()
+        posts = fetch_posts(reddit_conn, subreddit, sort, limit)
+        post_ids = [post.id for post in posts]
+
+        with closing(self._connect()) as conn:
+            known = self._known_comment_counts(conn, key[0], post_ids)
+            stale = [
+                post
+                for post in posts
+                if post.id not in known or known[post.id] != post.num_comments
+            ]
+            stale_ids = {post.id for post in stale}
+            cached = self._read_records(
+                conn,
+                key[0],
+                [post_id for post_id in post_ids if post_id not in stale_ids],
+            )
+
+            fetched = iter_comments(
+                reddit_conn, stale, workers=workers, crawler=crawler
+            )
+            for post in posts:
+                if post.id not in stale_ids:
+                    yield cached[post.id]
+                    continue
+
+                _, comments = next(fetched)
+                with conn:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO posts (subreddit, id, title, "
+                        "post_text, num_comments, comments, fetched_at) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        (
+                            key[0],
+                            post.id,
+                            post.title,
+                            post.selftext,
+                            post.num_comments,
+                            json.dumps(comments),
+                            time.time(),
+                        ),
+                    )
+                yield post_record(post, comments)
+
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO listings (subreddit, sort, "
+                    "time_filter, post_ids, requested_limit, fetched_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (*key, json.dumps(post_ids), limit, time.time()),
+                )
+
+    def refresh(
+        self,
+        subreddit: str,
+        sort: str = "month",
+        limit: int = 100,
+        workers: int = 1,
+        reddit_conn=None,
+        crawler=None,
+    ) -> pd.DataFrame:
+        """Re-fetch a listing incrementally (see ``iter_refresh``) as a DataFrame."""
+        records = self.iter_refresh(
+            subreddit,
+            sort,
+            limit,
+            workers=workers,
+            reddit_conn=reddit_conn,
+            crawler=crawler,
+        )
+        return records_to_dataframe(list(records))
+
+    def clear(self):
+        """Remove every cached listing and post."""
+        with closing(self._connect()) as conn, conn:
+            conn.execute("DELETE FROM listings")
+            conn.execute("DELETE FROM posts")
+
+
+def cached_iter_subreddit_posts(
+    subreddit: str,
+    sort: str = "month",
+    limit: int = 100,
+    workers: int = 1,
+    ttl: float = DEFAULT_TTL,
+    cache_path: str = DEFAULT_CACHE_PATH,
+    reddit_conn=None,
+    crawler=None,
+):
+    """
+    Streaming counterpart of ``cached_scrape_subreddit_posts``.
+
+    Yields post records from the cache when the listing is younger than
+    ``ttl`` seconds, otherwise yields them as the incremental refresh
+    fetches them.
+    """
+    cache = ScrapeCache(cache_path, ttl=ttl)
+    records = cache.load_records(subreddit, sort, limit, deep=crawler is not None)
+    if records is None:
+        records = cache.iter_refresh(
+            subreddit,
+            sort,
+            limit,
+            workers=workers,
+            reddit_conn=reddit_conn,
+            crawler=crawler,
+        )
+    yield from records
+
+
+def cached_scrape_subreddit_posts(
+    subreddit: str,
+    sort: str = "month",
+    limit: int = 100,
+    workers: int = 1,
+    ttl: float = DEFAULT_TTL,
+    cache_path: str = DEFAULT_CACHE_PATH,
+    reddit_conn=None,
+    crawler=None,
+) -> pd.DataFrame:
+    """
+    Drop-in replacement for ``scrape_subreddit_posts`` backed by a ScrapeCache.
+
+    Returns the cached posts when the listing is younger than ``ttl``
+    seconds, otherwise refreshes it incrementally. Pass ``ttl=0`` to force
+    a refresh, and a ``CommentCrawler`` as ``crawler`` for a deep comment
+    crawl.
+    """
+    records = cached_iter_subreddit_posts(
+        subreddit,
+        sort,
+        limit,
+        workers=workers,
+        ttl=ttl,
+        cache_path=cache_path,
+        reddit_conn=reddit_conn,
+        crawler=crawler,
+    )
+    return records_to_dataframe(list(records))
@@ -1,15 +1,25 @@
 import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
 import pandas as pd
 import praw
 from dotenv import load_dotenv
 from praw.models import MoreComments
 
+from data_retrieval.columnar import records_to_table, table_to_dataframe
+from data_retrieval.rate_limit import TokenBucket
+from instrumentation import in_context, span
 
-def api_connect():
+
+def api_connect(**config):
     """
     Establishes a connection to the Reddit API using credentials stored in environment variables.
 
+    Args:
+        **config: Extra settings forwarded to ``praw.Reddit``, e.g. ``oauth_url``
+            and ``reddit_url`` to point the client at a local fake-Reddit stub.
+
     Returns:
         praw.Reddit: A Reddit API connection object.
 
@@ -22,11 +32,13 @@ def api_connect():
     api_key = os.getenv("API_KEY")
     client_id = os.getenv("CLIENT_ID")
 
-    reddit_conn = praw.Reddit(
-        client_id=client_id,
-        client_secret=api_key,
-        user_agent="SubTopicClustering:V1.0",
-    )
+    settings = {
+        "client_id": client_id,
+        "client_secret": api_key,
+        "user_agent": "SubTopicClustering:V1.0",
+    }
+    settings.update(config)
+    reddit_conn = praw.Reddit(**settings)
 
     return reddit_conn
 
@@ -35,76 +47,201 @@ def get_comments(post, limit=10):
     return [comment.body for comment in post.comments[:limit] if not comment.stickied]
 
 
-def scrape_subreddit_posts(
-    subreddit: str, sort: str = "month", limit: int = 100
-) -> pd.DataFrame:
-    """
-    Optimized Reddit post scraper with enhanced performance through:
-    - Batch comment processing
-    - Reduced API calls
-    - Efficient memory management
-    - Connection reuse
-    """
-    reddit_conn = api_connect()
-    subreddit_obj = reddit_conn.subreddit(subreddit)
+# Configure sort parameters; listings request a safety buffer for stickied posts
+SORT_CONFIG = {
+    "hot": {"method": "hot"},
+    "month": {"method": "top", "time_filter": "month"},
+    "year": {"method": "top", "time_filter": "year"},
+    "week": {"method": "top", "time_filter": "week"},
+    "new": {"method": "new"},
+}
 
-    # Configure sort parameters with safety buffer for stickied posts
-    sort_config = {
-        "hot": {"method": "hot", "limit": limit * 2},
-        "month": {"method": "top", "time_filter": "month", "limit": limit * 2},
-        "year": {"method": "top", "time_filter": "year", "limit": limit * 2},
-        "week": {"method": "top", "time_filter": "week", "limit": limit * 2},
-        "new": {"method": "new", "limit": limit * 2},
-    }
 
-    if sort not in sort_config:
+def iter_listing(reddit_conn, subreddit: str, sort: str = "month", limit: int = 100):
+    """
+    Lazily yield up to ``limit`` non-stickied submissions from a subreddit listing.
+
+    Listing pages carry the post metadata, so this costs one request per 100
+    posts; comments are fetched separately by ``fetch_comments``.
+    """
+    if sort not in SORT_CONFIG:
         raise ValueError(
-            f"Invalid sort option. Choose from: {', '.join(sort_config.keys())}"
+            f"Invalid sort option. Choose from: {', '.join(SORT_CONFIG.keys())}"
         )
 
-    # Batch fetch posts with optimized limit
-    posts = getattr(subreddit_obj, sort_config[sort]["method"])(
-        limit=sort_config[sort].get("limit"),
-        **{k: v for k, v in sort_config[sort].items() if k not in ["method", "limit"]},
+    subreddit_obj = reddit_conn.subreddit(subreddit)
+    config = SORT_CONFIG[sort]
+    listing = getattr(subreddit_obj, config["method"])(
+        limit=limit * 2,
+        **{k: v for k, v in config.items() if k != "method"},
     )
 
-    posts_data = []
-    for idx, post in enumerate(posts, 1):
+    count = 0
+    for post in listing:
         if post.stickied:
             continue
+        yield post
+        count += 1
+        if count >= limit:
+            break
+
 
+def fetch_posts(reddit_conn, subreddit: str, sort: str = "month", limit: int = 100):
+    """Fetch up to ``limit`` non-stickied submissions from a subreddit listing."""
+    with span("scrape.listing", subreddit=subreddit, sort=sort) as current:
+        posts = list(iter_listing(reddit_conn, subreddit, sort, limit))
+        current.items = len(posts)
+    return posts
+
+
+def fetch_comments(post, limit: int = 10, crawler=None, reddit_conn=None):
+    """
+    Fetch up to ``limit`` top-level, non-stickied comment bodies for a post.
+
+    With a ``crawler`` (see ``data_retrieval.comment_crawl``) the comment
+    tree is crawled in depth instead and ``limit`` does not apply; the crawl
+    needs ``reddit_conn``, the connection ``post`` was loaded with.
+    """
+    if crawler is not None:
+        return crawler.crawl(post, reddit_conn)
+    with span("scrape.comments") as current:
         # Configure comment parameters before retrieval
         post.comment_limit = 15  # Get slightly more than needed for filtering
         post.comments.replace_more(limit=0)  # Prevent deep comment traversal
 
-        # Batch process comments with generator
         comments = [
             comment.body
             for comment in post.comments
             if not comment.stickied and not isinstance(comment, MoreComments)
-        ][
-            :10
-        ]  # Take up to 10 comments
-
-        posts_data.append(
-            {
-                "Title": post.title,
-                "Post Text": post.selftext,
-                "ID": post.id,
-                "Comments": comments,
-            }
-        )
+        ][:limit]
+        current.items = len(comments)
+    return comments
 
-        if len(posts_data) >= limit:
-            break
 
-    # Convert to DataFrame with specific dtype for Comments column
-    df = pd.DataFrame(posts_data).astype({"Comments": "object"})
+def iter_comments(
+    reddit_conn, posts, workers: int = 1, rate_limiter=None, crawler=None
+):
+    """
+    Yield ``(post, comments)`` pairs in the order of ``posts``.
+
+    With ``workers`` > 1 comments are fetched on a bounded thread pool. All
+    threads share the single authenticated ``reddit_conn`` and pace
+    themselves through a token bucket that follows Reddit's rate-limit
+    headers. At most ``2 * workers`` posts are in flight, so ``posts`` may be
+    a lazy listing and results are yielded while later posts still load.
+    ``crawler`` switches to the deep comment crawl (see ``fetch_comments``).
+    """
+    if workers <= 1:
+        for post in posts:
+            yield post, fetch_comments(post, crawler=crawler, reddit_conn=reddit_conn)
+        return
+
+    if rate_limiter is None:
+        # A deep crawl paces its expansion requests with the same bucket
+        rate_limiter = crawler.rate_limiter if crawler is not None else TokenBucket()
+    rate_limiter.sync(reddit_conn.auth.limits)
+
+    def fetch(post):
+        rate_limiter.acquire()
+        comments = fetch_comments(post, crawler=crawler, reddit_conn=reddit_conn)
+        rate_limiter.sync(reddit_conn.auth.limits)
+        return comments
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for post in posts:
+            pending.append((post, executor.submit(in_context(fetch), post)))
+            if len(pending) >= 2 * workers:
+                done_post, future = pending.popleft()
+                yield done_post, future.result()
+        while pending:
+            done_post, future = pending.popleft()
+            yield done_post, future.result()
+
+
+def post_record(post, comments):
+    """Build the record stored for one scraped post."""
+    return {
+        "title": post.title,
+        "post text": post.selftext,
+        "id": post.id,
+        "comments": comments,
+    }
+
+
+def records_to_dataframe(posts_data) -> pd.DataFrame:
+    """
+    Convert scraped post records into the scraper's DataFrame layout.
+
+    The columns are Arrow-backed, with comments stored as ``list<string>``
+    rather than Python lists (see ``data_retrieval.columnar``).
+    """
+    return table_to_dataframe(records_to_table(posts_data))
+
+
+def iter_subreddit_posts(
+    subreddit: str,
+    sort: str = "month",
+    limit: int = 100,
+    workers: int = 1,
+    reddit_conn=None,
+    rate_limiter=None,
+    crawler=None,
+):
+    """
+    Yield post records as they are scraped, in listing order.
+
+    Takes the same arguments as ``scrape_subreddit_posts``. Each record is a
+    dict with the keys title, post text, id and comments, so downstream
+    stages can start on the first posts while later ones are still loading.
+    """
+    reddit_conn = reddit_conn or api_connect()
+    posts = iter_listing(reddit_conn, subreddit, sort, limit)
+    for post, comments in iter_comments(
+        reddit_conn, posts, workers=workers, rate_limiter=rate_limiter, crawler=crawler
+    ):
+        yield post_record(post, comments)
 
-    # Standardize column names to lowercase
-    df.columns = df.columns.str.lower()
 
-    return df
+def scrape_subreddit_posts(
+    subreddit: str,
+    sort: str = "month",
+    limit: int = 100,
+    workers: int = 1,
+    reddit_conn=None,
+    rate_limiter=None,
+    crawler=None,
+) -> pd.DataFrame:
+    """
+    Scrape posts and their top comments from a subreddit.
+
+    Args:
+        subreddit (str): Name of the subreddit to scrape.
+        sort (str): One of "hot", "month", "year", "week" or "new".
+        limit (int): Maximum number of non-stickied posts to return.
+        workers (int): Number of threads fetching comments. 1 fetches them
+            serially; higher values share one connection across a thread pool.
+        reddit_conn (praw.Reddit): Connection to reuse. Defaults to a new
+            connection from ``api_connect``.
+        rate_limiter (TokenBucket): Limiter shared by concurrent fetches.
+        crawler (CommentCrawler): Crawl every post's comment tree within
+            the crawler's budget instead of keeping the first 10 top-level
+            comments.
+
+    Returns:
+        pd.DataFrame: One row per post, in listing order, with the columns
+        title, post text, id and comments.
+    """
+    records = iter_subreddit_posts(
+        subreddit,
+        sort,
+        limit,
+        workers=workers,
+        reddit_conn=reddit_conn,
+        rate_limiter=rate_limiter,
+        crawler=crawler,
+    )
+    return records_to_dataframe(list(records))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,279 @@
+"""
+Lightweight tracing for the analysis pipeline.
+
+Code marks units of work with the ``span`` context manager. Spans are only
+recorded while a ``trace`` block is active in the current context, so
+instrumented library code costs next to nothing when nobody is tracing.
+Each span records wall time, CPU time of its thread, the change in resident
+memory and an optional item count.
+
+    with trace() as tracer:
+        with span("preprocess", items=len(docs)):
+            ...
+    tracer.export("trace.json")
+
+Work handed to other threads only joins the trace if it runs in a copy of
+the caller's context; see ``in_context``.
+"""
+
+import contextvars
+import functools
+import itertools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+DEFAULT_TRACE_DIR = os.getenv("TRACE_DIR", "traces")
+
+_active_tracer = contextvars.ContextVar("active_tracer", default=None)
+_current_span = contextvars.ContextVar("current_span", default=None)
+_span_ids = itertools.count(1)
+
+
+def current_rss_mb():
+    """Resident set size of this process in MB, or None if unavailable."""
+    if psutil is not None:
+        return psutil.Process().memory_info().rss / 2**20
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+class Span:
+    """A timed unit of work. Set ``items`` or ``attributes`` while it runs."""
+
+    def __init__(self, name, parent_id=None, items=None, **attributes):
+        self.name = name
+        self.span_id = next(_span_ids)
+        self.parent_id = parent_id
+        self.items = items
+        self.attributes = attributes
+        self.thread = threading.current_thread().name
+        self.start = None
+        self.wall_s = None
+        self.cpu_s = None
+        self.rss_delta_mb = None
+        self.error = None
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "thread": self.thread,
+            "start": self.start,
+            "wall_s": self.wall_s,
+            "cpu_s": self.cpu_s,
+            "rss_delta_mb": self.rss_delta_mb,
+            "items": self.items,
+            "error": self.error,
+            "attributes": self.attributes,
+        }
+
+
+class Tracer:
+    """Collects the spans recorded while it is active."""
+
+    def __init__(self):
+        self.trace_id = os.urandom(16).hex()
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def record(self, span):
+        with self._lock:
+            self.spans.append(span)
+
+    def breakdown(self):
+        """
+        Aggregate finished spans by name, in order of first appearance.
+
+        Returns:
+            list[dict]: name, parent name, nesting depth, calls, wall_s, cpu_s,
+            rss_delta_mb and items per span name.
+        """
+        by_id = {span.span_id: span for span in self.spans}
+
+        def depth(span):
+            level = 0
+            while span.parent_id in by_id:
+                span = by_id[span.parent_id]
+                level += 1
+            return level
+
+        rows = {}
+        for span in sorted(self.spans, key=lambda s: s.start):
+            row = rows.setdefault(
+                span.name,
+                {
+                    "name": span.name,
+                    "parent": getattr(by_id.get(span.parent_id), "name", None),
+                    "depth": depth(span),
+                    "calls": 0,
+                    "wall_s": 0.0,
+                    "cpu_s": 0.0,
+                    "rss_delta_mb": 0.0,
+                    "items": 0,
+                },
+            )
+            row["calls"] += 1
+            row["wall_s"] += span.wall_s
+            row["cpu_s"] += span.cpu_s
+            row["rss_delta_mb"] += span.rss_delta_mb or 0.0
+            row["items"] += span.items or 0
+        return list(rows.values())
+
+    def to_otlp(self):
+        """Return the spans as an OpenTelemetry (OTLP/JSON) style document."""
+
+        def attribute(key, value):
+            if isinstance(value, bool):
+                return {"key": key, "value": {"boolValue": value}}
+            if isinstance(value, int):
+                return {"key": key, "value": {"intValue": str(value)}}
+            if isinstance(value, float):
+                return {"key": key, "value": {"doubleValue": value}}
+            return {"key": key, "value": {"stringValue": str(value)}}
+
+        spans = []
+        for span in self.spans:
+            values = {
+                "thread.name": span.thread,
+                "cpu_s": span.cpu_s,
+                "rss_delta_mb": span.rss_delta_mb,
+                "items": span.items,
+                **span.attributes,
+            }
+            start_ns = int(span.start * 1e9)
+            spans.append(
+                {
+                    "traceId": self.trace_id,
+                    "spanId": f"{span.span_id:016x}",
+                    "parentSpanId": (
+                        f"{span.parent_id:016x}" if span.parent_id else ""
+                    ),
+                    "name": span.name,
+                    "startTimeUnixNano": str(start_ns),
+                    "endTimeUnixNano": str(start_ns + int(span.wall_s * 1e9)),
+                    "attributes": [
+                        attribute(key, value)
+                        for key, value in values.items()
+                        if value is not None
+                    ],
+                    "status": (
+                        {"code": 2, "message": span.error} if span.error else {}
+                    ),
+                }
+            )
+        return {
+            "resourceSpans": [
+                {
+                    "resource": {
+                        "attributes": [attribute("service.name", "subreddit-topics")]
+                    },
+                    "scopeSpans": [
+                        {"scope": {"name": "instrumentation"}, "spans": spans}
+                    ],
+                }
+            ]
+        }
+
+    def export(self, path=None):
+        """
+        Write the trace as OTLP-style JSON.
+
+        Args:
+            path (str): Output file. Defaults to a timestamped file under
+                ``DEFAULT_TRACE_DIR``.
+
+        Returns:
+            str: The path written.
+        """
+        path = path or os.path.join(
+            DEFAULT_TRACE_DIR, f"trace_{time.strftime('%Y%m%d_%H%M%S')}.json"
+        )
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(self.to_otlp(), f, indent=2)
+        return path
+
+
+def print_breakdown(tracer):
+    """Print the per-stage timing breakdown of a trace."""
+    print(
+        f"{'stage':<28} {'calls':>5} {'wall s':>9} {'cpu s':>9} "
+        f"{'rss MB':>8} {'items':>7}"
+    )
+    for row in tracer.breakdown():
+        name = "  " * row["depth"] + row["name"]
+        print(
+            f"{name:<28} {row['calls']:>5} {row['wall_s']:>9.3f} "
+            f"{row['cpu_s']:>9.3f} {row['rss_delta_mb']:>8.1f} {row['items']:>7}"
+        )
+
+
+@contextmanager
+def trace(tracer=None):
+    """Activate a tracer for the current context; yields the tracer."""
+    tracer = tracer or Tracer()
+    token = _active_tracer.set(tracer)
+    try:
+        yield tracer
+    finally:
+        _active_tracer.reset(token)
+
+
+@contextmanager
+def span(name, items=None, **attributes):
+    """
+    Time a block of work as a span of the active trace.
+
+    Yields the Span so callers can fill in ``items`` or ``attributes`` once
+    they are known. Without an active trace the span is not recorded.
+    """
+    tracer = _active_tracer.get()
+    if tracer is None:
+        yield Span(name, items=items, **attributes)
+        return
+
+    parent = _current_span.get()
+    current = Span(name, parent.span_id if parent else None, items, **attributes)
+    token = _current_span.set(current)
+    rss_before = current_rss_mb()
+    current.start = time.time()
+    wall_start = time.perf_counter()
+    cpu_start = time.thread_time()
+    try:
+        yield current
+    except BaseException as e:
+        current.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        current.wall_s = time.perf_counter() - wall_start
+        current.cpu_s = time.thread_time() - cpu_start
+        rss_after = current_rss_mb()
+        if rss_before is not None and rss_after is not None:
+            current.rss_delta_mb = rss_after - rss_before
+        _current_span.reset(token)
+        tracer.record(current)
+
+
+def in_context(func):
+    """
+    Bind ``func`` to a copy of the caller's context.
+
+    Use it when submitting work to a thread pool so spans recorded in the
+    worker join the caller's trace: ``executor.submit(in_context(func), ...)``.
+    """
+    return functools.partial(contextvars.copy_context().run, func)
@@ -1,44 +1,68 @@
 import modeling.clustering as model
-from data_prep.transform import create_corpus, preprocess
-from data_retrieval.subreddit_scraper import scrape_subreddit_posts
+from data_prep.dedup import collapse_near_duplicates
+from data_prep.streaming import stream_preprocess
+from data_retrieval.scrape_cache import cached_iter_subreddit_posts
+from instrumentation import print_breakdown, span, trace
+from modeling.embedding_cache import EmbeddingCache
+from modeling.registry import EMBEDDING_CACHE_NAME
+from modeling.topic_index import TopicIndex
+from summarization.response_cache import SummaryCache
 from summarization.topic_summarizer import (
     generate_topic_summaries,
     print_topic_summaries,
 )
 
 if __name__ == "__main__":
-    # Scrape the data
-    df = scrape_subreddit_posts("politics", "month")
+    with trace() as tracer:
+        # Scrape the data, preprocessing the corpus while posts are still arriving
+        with span("scrape+preprocess") as stage:
+            records = cached_iter_subreddit_posts("politics", "month", workers=8)
+            df = stream_preprocess(records)
+            stage.items = len(df)
 
-    # Create and preprocess the corpus
-    df["text"] = df.apply(create_corpus, axis=1)
-    df["text"] = df["text"].apply(preprocess)
+        # Fit the topic model on one post per group of near-duplicates, or
+        # load the one saved for an identical corpus
+        with span("topics", items=len(df)):
+            docs, groups = collapse_near_duplicates(df["text"])
+            embedding_cache = EmbeddingCache(model_name=EMBEDDING_CACHE_NAME)
+            topic_model, topics = model.fit_or_load_topics(
+                docs, embedding_cache=embedding_cache
+            )
+            # Served from the cache filled while fitting; picks the example
+            # posts nearest each topic's centroid
+            embeddings = model.embed_documents(topic_model, docs, embedding_cache)
 
-    # Create the topic model
-    topic_model = model.create_models()
+            # Assign topics to the DataFrame; near-duplicates get the topic of
+            # their group's representative
+            df = model.assign_topics_to_dataframe(df, topics, groups)
+            topic_index = TopicIndex.from_dataframe(df, topic_model, embeddings[groups])
 
-    # Fit and transform the data
-    topics, probs = model.fit_transform_topics(topic_model, df["text"])
-
-    # Assign topics to the DataFrame
-    df = model.assign_topics_to_dataframe(df, topics)
-
-    print("\nGenerating LLM Summaries for Topics:")
-    topic_summaries = generate_topic_summaries(
-        topic_model, df, llm_model="llama3.2:latest"
-    )
+        print("\nGenerating LLM Summaries for Topics:")
+        with span("summaries") as stage:
+            topic_summaries = generate_topic_summaries(
+                topic_model,
+                df,
+                llm_model="llama3.2:latest",
+                max_concurrency=4,
+                timeout=120,
+                retries=2,
+                response_cache=SummaryCache(),
+                batch_size=5,
+                topic_index=topic_index,
+            )
+            stage.items = len(topic_summaries)
     print_topic_summaries(topic_summaries)
 
     # Add the topic names to your dataframe
-    topic_id_to_name = {
-        topic_id: summary["name"] for topic_id, summary in topic_summaries.items()
-    }
-    df["topic_name"] = df["topic"].map(
-        lambda x: topic_id_to_name.get(x, "Outlier") if x != -1 else "Outlier"
-    )
+    topic_index.set_names(topic_summaries)
+    df["topic_name"] = df["topic"].map(topic_index.names)
 
     # Example: Print posts by topic name
     print("\nSample Posts by Topic:")
-    for name in df["topic_name"].unique():
-        sample = df[df["topic_name"] == name].iloc[0]
-        print(f"{name}: {sample['title']}")
+    for topic_id in topic_index.topic_ids:
+        sample = topic_index.rows(df, topic_id, limit=1).iloc[0]
+        print(f"{topic_index.name(topic_id)}: {sample['title']}")
+
+    print("\nTiming Breakdown:")
+    print_breakdown(tracer)
+    print(f"Trace written to {tracer.export()}")
@@ -0,0 +1,123 @@
+import numpy as np
+
+from instrumentation import span
+
+# Documents chunked and encoded together; bounds the chunk texts and vectors
+# held in memory at any time
+DEFAULT_BLOCK_SIZE = 2048
+
+
+def chunk_texts(tokenizer, texts, max_tokens):
+    """
+    Split each text into pieces of at most ``max_tokens`` tokens.
+
+    Pieces are cut at token boundaries using the tokenizer's character
+    offsets, so each one is a verbatim slice of the original text.
+
+    Args:
+        tokenizer: A Hugging Face fast tokenizer (``SentenceTransformer.tokenizer``).
+        texts (list[str]): Documents to split.
+        max_tokens (int): Token budget per piece, excluding special tokens.
+
+    Returns:
+        list[list[tuple[str, int]]]: For every text, its (chunk, token count)
+        pairs. Empty texts yield a single empty chunk.
+    """
+    encoded = tokenizer(
+        texts,
+        add_special_tokens=False,
+        return_offsets_mapping=True,
+        truncation=False,
+        verbose=False,
+    )
+    chunks = []
+    for text, offsets in zip(texts, encoded["offset_mapping"]):
+        if not offsets:
+            chunks.append([(text, 0)])
+            continue
+        pieces = []
+        for start in range(0, len(offsets), max_tokens):
+            window = offsets[start : start + max_tokens]
+            pieces.append((text[window[0][0] : window[-1][1]], len(window)))
+        chunks.append(pieces)
+    return chunks
+
+
+def embed_chunked(
+    encoder,
+    docs,
+    batch_size=64,
+    max_tokens=None,
+    path=None,
+    dtype=np.float32,
+    block_size=DEFAULT_BLOCK_SIZE,
+):
+    """
+    Encode documents of any length with bounded memory.
+
+    Documents are processed ``block_size`` at a time. Within a block every
+    document is split into chunks that fit the encoder's maximum sequence
+    length (instead of being silently truncated), the chunks are sorted by
+    token count and encoded in batches of ``batch_size`` so each batch pads
+    to similar lengths, and the chunk vectors of each document are averaged,
+    weighted by their token counts, into one vector per document. Finished
+    rows are written straight into the output array.
+
+    Args:
+        encoder (SentenceTransformer): The sentence encoder.
+        docs (Sequence[str]): Documents to embed.
+        batch_size (int): Chunks per forward pass.
+        max_tokens (int): Tokens per chunk. Defaults to the encoder's
+            ``max_seq_length`` minus the two special tokens it adds.
+        path (str): Optional ``.npy`` file to stream the vectors into. The
+            result is then a memory map of that file, so peak memory does
+            not grow with the corpus.
+        dtype: float32, or float16 to halve the size of the output.
+        block_size (int): Documents chunked and encoded together.
+
+    Returns:
+        np.ndarray: One row per document, in input order.
+    """
+    docs = list(docs)
+    max_tokens = max_tokens or encoder.max_seq_length - 2
+    shape = (len(docs), encoder.get_sentence_embedding_dimension())
+    if path is None:
+        out = np.empty(shape, dtype=dtype)
+    else:
+        out = np.lib.format.open_memmap(path, mode="w+", dtype=dtype, shape=shape)
+
+    for block_start in range(0, len(docs), block_size):
+        block = docs[block_start : block_start + block_size]
+        with span("embed.chunk", items=len(block)) as current:
+            chunks = chunk_texts(encoder.tokenizer, block, max_tokens)
+            owners, texts, weights = [], [], []
+            for doc_index, pieces in enumerate(chunks):
+                for text, tokens in pieces:
+                    owners.append(doc_index)
+                    texts.append(text)
+                    weights.append(max(tokens, 1))
+            current.attributes["chunks"] = len(texts)
+
+        with span("embed.encode", items=len(texts)):
+            order = np.argsort(weights, kind="stable")
+            vectors = np.empty((len(texts), shape[1]), dtype=np.float32)
+            for batch_start in range(0, len(order), batch_size):
+                batch = order[batch_start : batch_start + batch_size]
+                vectors[batch] = encoder.encode(
+                    [texts[i] for i in batch],
+                    batch_size=len(batch),
+                    convert_to_numpy=True,
+                    show_progress_bar=False,
+                )
+
+        # Token-weighted mean of each document's chunk vectors
+        owners = np.asarray(owners)
+        weights = np.asarray(weights, dtype=np.float32)
+        pooled = np.zeros((len(block), shape[1]), dtype=np.float32)
+        np.add.at(pooled, owners, vectors * weights[:, None])
+        pooled /= np.bincount(owners, weights=weights, minlength=len(block))[:, None]
+        out[block_start : block_start + len(block)] = pooled
+
+    if path is not None:
+        out.flush()
+    return out
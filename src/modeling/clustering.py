@@ -1,33 +1,93 @@
-from bertopic import BERTopic
-from hdbscan import HDBSCAN
-from sentence_transformers import SentenceTransformer
-from sklearn.feature_extraction.text import CountVectorizer
-from umap import UMAP
-
-
-def create_models():
-    sentence_model = SentenceTransformer("all-MiniLM-L6-v2")
-
-    hdbscan_model = HDBSCAN(
-        min_cluster_size=10,
-        min_samples=3,
-        metric="euclidean",
-        cluster_selection_method="eom",
-        prediction_data=True,
-    )
-
-    vectorizer = CountVectorizer(
-        stop_words="english", ngram_range=(1, 1), max_features=2000
-    )
-
-    umap_model = UMAP(n_neighbors=5, min_dist=0.05, n_components=5, metric="cosine")
-
-    topic_model = BERTopic(
+import os
+
+import numpy as np
+import pyarrow as pa
+
+from instrumentation import span
+from modeling.chunking import embed_chunked
+from modeling.registry import (
+    DEFAULT_ARTIFACT_DIR,
+    EMBEDDING_MODEL_NAME,
+    corpus_key,
+    get_sentence_model,
+    has_topic_model,
+    load_topic_model,
+    save_topic_model,
+)
+from modeling.scalable import BACKENDS, ann_models, kmeans_models, select_backend
+
+
+def create_clustering_models(backend="exact", num_docs=None):
+    """
+    Build the dimensionality reduction and clustering models for a backend.
+
+    Args:
+        backend (str): "exact", "ann", "kmeans", or "auto" to choose by
+            ``num_docs`` (see ``modeling.scalable``).
+        num_docs (int): Size of the corpus that will be fitted.
+
+    Returns:
+        tuple: (reducer, clusterer) to pass to BERTopic as ``umap_model`` and
+        ``hdbscan_model``.
+    """
+    if backend == "auto":
+        backend = select_backend(num_docs)
+
+    if backend == "exact":
+        from hdbscan import HDBSCAN
+        from umap import UMAP
+
+        hdbscan_model = HDBSCAN(
+            min_cluster_size=10,
+            min_samples=3,
+            metric="euclidean",
+            cluster_selection_method="eom",
+            prediction_data=True,
+        )
+        umap_model = UMAP(n_neighbors=5, min_dist=0.05, n_components=5, metric="cosine")
+        return umap_model, hdbscan_model
+    if backend == "ann":
+        return ann_models(num_docs)
+    if backend == "kmeans":
+        return kmeans_models()
+    raise ValueError(f"Invalid clustering backend. Choose from: {', '.join(BACKENDS)}")
+
+
+def create_vectorizer():
+    """Bag-of-words model behind the c-TF-IDF topic representations."""
+    from sklearn.feature_extraction.text import CountVectorizer
+
+    return CountVectorizer(stop_words="english", ngram_range=(1, 1), max_features=2000)
+
+
+def create_models(
+    num_docs=None, backend="auto", umap_model=None, hdbscan_model=None, nr_topics=10
+):
+    """
+    Build an unfitted topic model.
+
+    ``umap_model`` and ``hdbscan_model`` replace the reducer and clusterer
+    of ``backend`` (see ``create_clustering_models``), e.g. with settings
+    found by ``modeling.sweep``.
+    """
+    # Heavy modeling libraries are imported on first use to keep startup fast
+    from modeling.instrumented import InstrumentedBERTopic
+
+    sentence_model = get_sentence_model(EMBEDDING_MODEL_NAME)
+
+    if umap_model is None or hdbscan_model is None:
+        default_umap, default_hdbscan = create_clustering_models(backend, num_docs)
+        if umap_model is None:
+            umap_model = default_umap
+        if hdbscan_model is None:
+            hdbscan_model = default_hdbscan
+
+    topic_model = InstrumentedBERTopic(
         embedding_model=sentence_model,
         hdbscan_model=hdbscan_model,
-        vectorizer_model=vectorizer,
+        vectorizer_model=create_vectorizer(),
         umap_model=umap_model,
-        nr_topics=10,
+        nr_topics=nr_topics,
         min_topic_size=8,
         top_n_words=6,
         verbose=False,
@@ -36,12 +96,136 @@ def create_models():
     return topic_model
 
 
-def fit_transform_topics(topic_model, clean_data):
-    topics, probs = topic_model.fit_transform(clean_data)
+def embed_documents(
+    topic_model, docs, embedding_cache=None, batch_size=64, path=None, dtype=np.float32
+):
+    """
+    Encode documents with the topic model's sentence encoder.
+
+    Long documents are split into chunks the encoder can see in full and
+    their chunk vectors pooled (see ``modeling.chunking.embed_chunked``).
+    With an ``embedding_cache`` only documents whose text hash is not cached
+    yet are encoded (each unique text once); the new vectors are written
+    back to the cache.
+
+    Args:
+        path (str): Without a cache, stream the vectors into this ``.npy``
+            memory map instead of holding them in memory.
+        dtype: Output dtype without a cache, float32 or float16.
+
+    Returns:
+        np.ndarray: A matrix with one row per document.
+    """
+    docs = list(docs)
+    encoder = topic_model.embedding_model
+    # A fitted BERTopic wraps the SentenceTransformer in a backend object
+    encoder = getattr(encoder, "embedding_model", encoder)
+    if embedding_cache is None:
+        with span("embed", items=len(docs)):
+            return embed_chunked(
+                encoder, docs, batch_size=batch_size, path=path, dtype=dtype
+            )
+
+    if not docs:
+        # As from embed_chunked, which sizes even an empty matrix for the encoder
+        return np.empty((0, encoder.get_sentence_embedding_dimension()), np.float32)
+
+    keys = [embedding_cache.key(doc) for doc in docs]
+    cached = embedding_cache.get_many(keys)
+
+    misses = {}
+    for key, doc, vector in zip(keys, docs, cached):
+        if vector is None:
+            misses.setdefault(key, doc)
+
+    if misses:
+        with span("embed", items=len(misses), cached=len(docs) - len(misses)):
+            new_vectors = embed_chunked(
+                encoder, list(misses.values()), batch_size=batch_size
+            )
+        embedding_cache.put_many(list(misses.keys()), new_vectors)
+        embedding_cache.save()
+        computed = dict(zip(misses.keys(), new_vectors))
+        cached = [
+            computed[key] if vector is None else vector
+            for key, vector in zip(keys, cached)
+        ]
+
+    return np.vstack(cached).astype(np.float32)
+
+
+def fit_transform_topics(
+    topic_model, clean_data, embedding_cache=None, embeddings_path=None
+):
+    clean_data = list(clean_data)
+    embeddings = embed_documents(
+        topic_model, clean_data, embedding_cache, path=embeddings_path
+    )
+    topics, probs = topic_model.fit_transform(clean_data, embeddings=embeddings)
     return topics, probs
 
 
-def assign_topics_to_dataframe(df, topics):
+def topic_model_path(clean_data, backend="auto", artifact_dir=DEFAULT_ARTIFACT_DIR):
+    """Where the topic model of ``clean_data`` fitted with ``backend`` is saved."""
+    clean_data = list(clean_data)
+    if backend == "auto":
+        backend = select_backend(len(clean_data))
+    key = corpus_key(clean_data)
+    if backend != "exact":
+        key = f"{key}-{backend}"
+    return os.path.join(artifact_dir, key)
+
+
+def fit_or_load_topics(
+    clean_data,
+    embedding_cache=None,
+    artifact_dir=DEFAULT_ARTIFACT_DIR,
+    backend="auto",
+    embeddings_path=None,
+):
+    """
+    Fit a topic model on ``clean_data``, or load the one saved for the same corpus.
+
+    Fitted models are saved under ``artifact_dir`` keyed by a hash of the
+    documents, so re-viewing an analysis of unchanged posts skips fitting.
+    ``backend`` selects the clustering backend (see ``create_clustering_models``);
+    "auto" picks one by corpus size. Without an ``embedding_cache``, the
+    embeddings can be streamed into the ``.npy`` file ``embeddings_path``
+    (see ``embed_documents``) rather than held in memory.
+
+    Returns:
+        tuple: (topic_model, topics)
+    """
+    clean_data = list(clean_data)
+    if backend == "auto":
+        backend = select_backend(len(clean_data))
+    path = topic_model_path(clean_data, backend, artifact_dir)
+    if has_topic_model(path):
+        return load_topic_model(path)
+
+    topic_model = create_models(len(clean_data), backend)
+    topics, _ = fit_transform_topics(
+        topic_model, clean_data, embedding_cache, embeddings_path
+    )
+    save_topic_model(topic_model, topics, path)
+    return topic_model, topics
+
+
+def assign_topics_to_dataframe(df, topics, groups=None):
+    """
+    Add a "topic" column to the posts, given as a DataFrame or an Arrow table.
+
+    If only one post per group of near-duplicates was modeled (see
+    ``data_prep.dedup.collapse_near_duplicates``), pass its ``groups`` to
+    give every post the topic of its group's representative.
+    """
+    if groups is not None:
+        topics = np.asarray(topics)[groups]
+    if isinstance(df, pa.Table):
+        column = pa.array(np.asarray(topics, dtype=np.int64))
+        if "topic" in df.column_names:
+            return df.set_column(df.column_names.index("topic"), "topic", column)
+        return df.append_column("topic", column)
     df["topic"] = topics
     return df
 
@@ -0,0 +1,203 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+DEFAULT_CACHE_PATH = os.getenv(
+    "EMBEDDING_CACHE_PATH", os.path.join("cache", "embeddings")
+)
+DEFAULT_CAPACITY = 100_000
+# Rows the vector file starts with; it doubles when full, up to the capacity
+INITIAL_ROWS = 1024
+
+
+def text_key(text, model_name):
+    """Content hash identifying the embedding of ``text`` under ``model_name``."""
+    digest = hashlib.sha256()
+    digest.update(model_name.encode())
+    digest.update(b"\0")
+    digest.update(text.encode())
+    return digest.hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Content-addressed store of float32 document embeddings.
+
+    Vectors live in a single memory-mapped ``<path>.f32`` file of raw rows
+    that grows as needed, up to ``capacity`` rows; ``<path>.index.json`` holds
+    the vector size and maps each text hash to its row. When every row is
+    taken, the least recently used entries are evicted and their rows reused.
+    Call ``save`` to persist the index after adding vectors.
+
+    The index on disk never points at a row holding another text's vector,
+    even after a crash: evicted rows are only overwritten once an index
+    without them has been written.
+
+    Args:
+        path (str): File prefix for the vector file and its index sidecar.
+        model_name (str): Name of the encoder, mixed into every key so that
+            vectors from different models never collide.
+        capacity (int): Maximum number of cached vectors.
+    """
+
+    def __init__(
+        self, path=DEFAULT_CACHE_PATH, model_name="", capacity=DEFAULT_CAPACITY
+    ):
+        self.path = path
+        self.model_name = model_name
+        self.capacity = capacity
+        self.vectors_path = f"{path}.f32"
+        self.index_path = f"{path}.index.json"
+        self._lock = threading.Lock()
+        self._slots = OrderedDict()
+        self._free = []
+        self._dim = None
+        self._vectors = None
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._load()
+
+    def _load(self):
+        if not (os.path.exists(self.vectors_path) and os.path.exists(self.index_path)):
+            return
+
+        with open(self.index_path) as f:
+            index = json.load(f)
+        dim = index.get("dim")
+        size = os.path.getsize(self.vectors_path)
+        if not dim or size % (dim * 4):
+            # Not written by this version; start over
+            return
+        rows = size // (dim * 4)
+        if not 0 < rows <= self.capacity:
+            # Empty, or the capacity shrank; start over rather than compacting
+            return
+
+        self._dim = dim
+        self._vectors = np.memmap(
+            self.vectors_path, dtype=np.float32, mode="r+", shape=(rows, dim)
+        )
+        # The index is stored least recently used first
+        self._slots = OrderedDict(
+            (key, slot) for key, slot in index["entries"] if slot < rows
+        )
+        used = set(self._slots.values())
+        self._free = [slot for slot in reversed(range(rows)) if slot not in used]
+
+    def _allocate(self, dim):
+        """Start an empty cache of ``dim``-sized vectors."""
+        self._dim = dim
+        self._vectors = None
+        self._slots.clear()
+        self._free = []
+        # The old index must go before the rows it points at
+        self._write_index()
+        open(self.vectors_path, "wb").close()
+
+    def _rows(self):
+        return 0 if self._vectors is None else len(self._vectors)
+
+    def _grow(self, rows):
+        """Extend the vector file to ``rows`` rows and map it again."""
+        old_rows = self._rows()
+        if self._vectors is not None:
+            self._vectors.flush()
+            # Unmapped first: Windows cannot resize a mapped file
+            self._vectors = None
+        with open(self.vectors_path, "r+b") as f:
+            f.truncate(rows * self._dim * 4)
+        self._vectors = np.memmap(
+            self.vectors_path, dtype=np.float32, mode="r+", shape=(rows, self._dim)
+        )
+        self._free[:0] = reversed(range(old_rows, rows))
+
+    def _reserve(self, count):
+        """Free ``count`` rows, growing the file first and evicting if full."""
+        shortfall = count - len(self._free)
+        if shortfall <= 0:
+            return
+        rows = self._rows()
+        if rows < self.capacity:
+            self._grow(
+                min(self.capacity, max(rows + shortfall, 2 * rows, INITIAL_ROWS))
+            )
+            shortfall = count - len(self._free)
+        if shortfall > 0:
+            evicted = [self._slots.popitem(last=False)[1] for _ in range(shortfall)]
+            # Written before the rows are reused, so the saved index stops
+            # pointing at them first
+            self._save()
+            self._free.extend(evicted)
+
+    def __len__(self):
+        return len(self._slots)
+
+    def key(self, text):
+        return text_key(text, self.model_name)
+
+    def get_many(self, keys):
+        """
+        Look up vectors for ``keys``.
+
+        Returns:
+            list: A float32 vector per key, or None where the key is missing.
+        """
+        with self._lock:
+            results = []
+            for key in keys:
+                slot = self._slots.get(key)
+                if slot is None:
+                    results.append(None)
+                else:
+                    self._slots.move_to_end(key)
+                    results.append(np.array(self._vectors[slot]))
+            return results
+
+    def put_many(self, keys, vectors):
+        """Store ``vectors`` (one row per key), evicting LRU entries if full."""
+        keys = list(keys)
+        vectors = np.asarray(vectors, dtype=np.float32)
+        with self._lock:
+            if self._dim != vectors.shape[1]:
+                self._allocate(vectors.shape[1])
+
+            # At most ``capacity`` keys at a time, so none evicts another
+            for start in range(0, len(keys), self.capacity):
+                chunk = keys[start : start + self.capacity]
+                for key in chunk:
+                    # Cached keys being stored again are evicted last
+                    if key in self._slots:
+                        self._slots.move_to_end(key)
+                self._reserve(len({key for key in chunk if key not in self._slots}))
+                for key, vector in zip(chunk, vectors[start : start + self.capacity]):
+                    slot = self._slots.get(key)
+                    if slot is None:
+                        slot = self._free.pop()
+                    self._slots[key] = slot
+                    self._slots.move_to_end(key)
+                    self._vectors[slot] = vector
+
+    def save(self):
+        """Flush vectors to disk and atomically rewrite the index sidecar."""
+        with self._lock:
+            if self._vectors is None:
+                return
+            self._save()
+
+    def _save(self):
+        self._vectors.flush()
+        self._write_index()
+
+    def _write_index(self):
+        tmp_path = f"{self.index_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"dim": self._dim, "entries": list(self._slots.items())}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.index_path)
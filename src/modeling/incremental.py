@@ -0,0 +1,236 @@
+import argparse
+import hashlib
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+import modeling.clustering as model
+from modeling.embedding_cache import EmbeddingCache
+from modeling.registry import EMBEDDING_CACHE_NAME, get_sentence_model
+
+DEFAULT_STATE_DIR = os.path.join("models", "incremental")
+# Refit once the outlier rate of newly assigned documents rises this far above
+# the rate seen at fit time...
+DEFAULT_OUTLIER_THRESHOLD = 0.15
+# ...or their mean similarity to the closest topic drops by this much
+DEFAULT_DRIFT_THRESHOLD = 0.1
+# Minimum number of new documents before the thresholds are evaluated
+DEFAULT_MIN_DOCS = 25
+
+
+def doc_key(text):
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def topic_similarity(topic_model, embeddings):
+    """
+    Mean cosine similarity of each embedding to its closest topic embedding.
+
+    Serves as a cheap drift metric: documents that no longer resemble any of
+    the fitted topics pull the value down.
+    """
+    topic_embeddings = np.asarray(topic_model.topic_embeddings_)
+    # Row 0 holds the outlier topic when the model has one
+    topic_embeddings = topic_embeddings[topic_model._outliers :]
+    topic_embeddings = topic_embeddings / np.linalg.norm(
+        topic_embeddings, axis=1, keepdims=True
+    )
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    embeddings = embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+    return float((embeddings @ topic_embeddings.T).max(axis=1).mean())
+
+
+class IncrementalTopicModel:
+    """
+    Persisted topic model that assigns new documents without refitting.
+
+    The first ``update`` fits a model from scratch and saves it together with
+    every document's topic. Later updates only embed documents that have not
+    been seen before and assign them with ``BERTopic.transform``, which uses
+    HDBSCAN's ``approximate_predict`` (``create_models`` enables
+    ``prediction_data``). A full UMAP + HDBSCAN refit over all stored
+    documents happens only when the new documents drift away from the
+    fitted topics.
+
+    The model is stored with pickle serialization because the safetensors
+    format drops the HDBSCAN model needed for ``approximate_predict``.
+
+    Args:
+        path (str): Directory holding the model, documents and state.
+        outlier_threshold (float): Allowed rise of the outlier rate among new
+            documents over the rate at fit time.
+        drift_threshold (float): Allowed drop of the mean topic similarity
+            (see ``topic_similarity``) over its value at fit time.
+        min_docs (int): New documents to accumulate before checking thresholds.
+        embedding_cache (EmbeddingCache): Optional cache for document embeddings.
+    """
+
+    def __init__(
+        self,
+        path=DEFAULT_STATE_DIR,
+        outlier_threshold=DEFAULT_OUTLIER_THRESHOLD,
+        drift_threshold=DEFAULT_DRIFT_THRESHOLD,
+        min_docs=DEFAULT_MIN_DOCS,
+        embedding_cache=None,
+    ):
+        self.path = path
+        self.outlier_threshold = outlier_threshold
+        self.drift_threshold = drift_threshold
+        self.min_docs = min_docs
+        self.embedding_cache = embedding_cache
+        self.model_path = os.path.join(path, "topic_model.pickle")
+        self.documents_path = os.path.join(path, "documents.parquet")
+        self.state_path = os.path.join(path, "state.json")
+        self.topic_model = None
+
+    def exists(self):
+        return all(
+            os.path.exists(p)
+            for p in (self.model_path, self.documents_path, self.state_path)
+        )
+
+    def load(self):
+        """Load the persisted topic model, documents and state."""
+        from bertopic import BERTopic
+
+        self.topic_model = BERTopic.load(
+            self.model_path, embedding_model=get_sentence_model()
+        )
+        documents = pd.read_parquet(self.documents_path)
+        with open(self.state_path) as f:
+            state = json.load(f)
+        return documents, state
+
+    def _save_state(self, documents, state):
+        documents.to_parquet(self.documents_path, index=False)
+        with open(self.state_path, "w") as f:
+            json.dump(state, f, indent=2)
+
+    def fit(self, docs):
+        """Fit a new topic model on ``docs`` and persist it. Returns the topics."""
+        docs = list(docs)
+        topic_model = model.create_models(len(docs))
+        embeddings = model.embed_documents(topic_model, docs, self.embedding_cache)
+        topics, _ = topic_model.fit_transform(docs, embeddings=embeddings)
+        topics = np.asarray(topics)
+
+        os.makedirs(self.path, exist_ok=True)
+        topic_model.save(
+            self.model_path, serialization="pickle", save_embedding_model=False
+        )
+        documents = pd.DataFrame(
+            {"key": [doc_key(doc) for doc in docs], "text": docs, "topic": topics}
+        ).drop_duplicates("key")
+        state = {
+            "fitted_at": time.time(),
+            "fitted_docs": len(docs),
+            "baseline_outlier_rate": float(np.mean(topics == -1)),
+            "baseline_similarity": topic_similarity(topic_model, embeddings),
+            "new_docs": 0,
+            "new_outliers": 0,
+            "new_similarity_sum": 0.0,
+        }
+        self._save_state(documents, state)
+        self.topic_model = topic_model
+        return topics.tolist()
+
+    def drift(self, state):
+        """Return the outlier-rate rise and similarity drop since the last fit."""
+        if state["new_docs"] == 0:
+            return 0.0, 0.0
+        outlier_rise = (
+            state["new_outliers"] / state["new_docs"] - state["baseline_outlier_rate"]
+        )
+        similarity_drop = (
+            state["baseline_similarity"]
+            - state["new_similarity_sum"] / state["new_docs"]
+        )
+        return outlier_rise, similarity_drop
+
+    def update(self, docs):
+        """
+        Assign topics to ``docs``, refitting only when drift crosses a threshold.
+
+        Returns:
+            tuple: (topics for ``docs`` in order, whether a full refit ran)
+        """
+        docs = list(docs)
+        if not self.exists():
+            return self.fit(docs), True
+
+        documents, state = self.load()
+        known = dict(zip(documents["key"], documents["topic"]))
+        keys = [doc_key(doc) for doc in docs]
+        new_docs = list(
+            {key: doc for key, doc in zip(keys, docs) if key not in known}.items()
+        )
+
+        if new_docs:
+            new_keys = [key for key, _ in new_docs]
+            new_texts = [doc for _, doc in new_docs]
+            embeddings = model.embed_documents(
+                self.topic_model, new_texts, self.embedding_cache
+            )
+            new_topics, _ = self.topic_model.transform(new_texts, embeddings=embeddings)
+            new_topics = np.asarray(new_topics)
+
+            state["new_docs"] += len(new_texts)
+            state["new_outliers"] += int(np.sum(new_topics == -1))
+            state["new_similarity_sum"] += topic_similarity(
+                self.topic_model, embeddings
+            ) * len(new_texts)
+
+            outlier_rise, similarity_drop = self.drift(state)
+            if state["new_docs"] >= self.min_docs and (
+                outlier_rise > self.outlier_threshold
+                or similarity_drop > self.drift_threshold
+            ):
+                all_texts = documents["text"].tolist() + new_texts
+                refit_topics = self.fit(all_texts)
+                known = dict(zip(map(doc_key, all_texts), refit_topics))
+                return [known[key] for key in keys], True
+
+            documents = pd.concat(
+                [
+                    documents,
+                    pd.DataFrame(
+                        {"key": new_keys, "text": new_texts, "topic": new_topics}
+                    ),
+                ],
+                ignore_index=True,
+            )
+            self._save_state(documents, state)
+            known.update(zip(new_keys, new_topics))
+
+        return [int(known[key]) for key in keys], False
+
+
+if __name__ == "__main__":
+    from data_prep.streaming import stream_preprocess
+    from data_retrieval.scrape_cache import cached_iter_subreddit_posts
+
+    parser = argparse.ArgumentParser(
+        description="Assign new posts of a monitored subreddit to its persisted topics."
+    )
+    parser.add_argument("subreddit")
+    parser.add_argument("--sort", default="new")
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--state-dir", default=None)
+    args = parser.parse_args()
+
+    state_dir = args.state_dir or os.path.join("models", args.subreddit.lower())
+    incremental = IncrementalTopicModel(
+        state_dir,
+        embedding_cache=EmbeddingCache(model_name=EMBEDDING_CACHE_NAME),
+    )
+    df = stream_preprocess(
+        cached_iter_subreddit_posts(args.subreddit, args.sort, args.limit, workers=8)
+    )
+    topics, refitted = incremental.update(df["text"])
+    df = model.assign_topics_to_dataframe(df, topics)
+
+    print("Full refit" if refitted else "Incremental update")
+    model.print_topic_counts(df)
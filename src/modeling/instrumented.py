@@ -0,0 +1,42 @@
+from bertopic import BERTopic
+
+from instrumentation import span
+
+
+class InstrumentedBERTopic(BERTopic):
+    """
+    BERTopic that records its fitting stages as instrumentation spans.
+
+    Embedding, dimensionality reduction, clustering, c-TF-IDF extraction and
+    topic reduction each show up as their own span while a trace is active.
+    The hooks are private BERTopic methods, as of the version pinned in
+    requirements.txt; without an active trace they behave exactly like the
+    base class.
+    """
+
+    def _extract_embeddings(self, documents, *args, **kwargs):
+        with span("embed", items=len(documents)):
+            return super()._extract_embeddings(documents, *args, **kwargs)
+
+    def _reduce_dimensionality(self, embeddings, *args, **kwargs):
+        with span("umap", items=embeddings.shape[0]):
+            return super()._reduce_dimensionality(embeddings, *args, **kwargs)
+
+    def _cluster_embeddings(self, umap_embeddings, documents, *args, **kwargs):
+        with span("hdbscan", items=len(documents)):
+            return super()._cluster_embeddings(
+                umap_embeddings, documents, *args, **kwargs
+            )
+
+    def _extract_topics(self, documents, *args, **kwargs):
+        with span("ctfidf", items=len(documents)):
+            return super()._extract_topics(documents, *args, **kwargs)
+
+    def _reduce_topics(self, documents, *args, **kwargs):
+        with span("reduce_topics", items=len(documents)):
+            return super()._reduce_topics(documents, *args, **kwargs)
+
+    def transform(self, documents, *args, **kwargs):
+        items = 1 if isinstance(documents, str) else len(documents)
+        with span("transform", items=items):
+            return super().transform(documents, *args, **kwargs)
@@ -0,0 +1,96 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+
+EMBEDDING_MODEL_NAME = "all-MiniLM-L6-v2"
+# Embedding cache namespace: the encoder plus how long documents are pooled
+# (see modeling.chunking), so vectors from another scheme are never reused
+EMBEDDING_CACHE_NAME = f"{EMBEDDING_MODEL_NAME}/chunked-mean"
+DEFAULT_ARTIFACT_DIR = os.getenv(
+    "TOPIC_ARTIFACT_DIR", os.path.join("models", "analyses")
+)
+
+_lock = threading.Lock()
+_sentence_models = {}
+
+
+def get_sentence_model(name=EMBEDDING_MODEL_NAME):
+    """
+    Return the process-wide SentenceTransformer for ``name``.
+
+    The encoder (and the sentence_transformers/torch import behind it) is
+    loaded on first use and shared by every later caller in the process.
+    """
+    with _lock:
+        if name not in _sentence_models:
+            from sentence_transformers import SentenceTransformer
+
+            _sentence_models[name] = SentenceTransformer(name)
+        return _sentence_models[name]
+
+
+def corpus_key(texts, model_name=EMBEDDING_MODEL_NAME):
+    """Content hash identifying a topic model fitted on ``texts``."""
+    digest = hashlib.sha256(model_name.encode())
+    for text in texts:
+        digest.update(b"\0")
+        digest.update(text.encode())
+    return digest.hexdigest()
+
+
+def save_topic_model(topic_model, topics, path):
+    """
+    Save a fitted topic model and its document topics.
+
+    The model is written in BERTopic's safetensors format (topic embeddings,
+    c-TF-IDF and config, without the UMAP/HDBSCAN models), which is small and
+    fast to load. The embedding model is stored by name only.
+
+    The files are written to a temporary folder next to ``path`` that is then
+    renamed to it, so a crash or a concurrent save never leaves a partial
+    model that ``has_topic_model`` would accept.
+    """
+    parent = os.path.dirname(os.path.abspath(path))
+    os.makedirs(parent, exist_ok=True)
+    staging = tempfile.mkdtemp(prefix=".saving-", dir=parent)
+    replaced = f"{staging}.replaced"
+    try:
+        topic_model.save(
+            staging,
+            serialization="safetensors",
+            save_ctfidf=True,
+            save_embedding_model=EMBEDDING_MODEL_NAME,
+        )
+        with open(os.path.join(staging, "document_topics.json"), "w") as f:
+            json.dump([int(topic) for topic in topics], f)
+        try:
+            # Directories cannot be renamed over non-empty ones
+            os.replace(path, replaced)
+        except FileNotFoundError:
+            pass
+        try:
+            os.replace(staging, path)
+        except OSError:
+            # Another process saved a model here first; keep that one
+            if not has_topic_model(path):
+                raise
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+        shutil.rmtree(replaced, ignore_errors=True)
+
+
+def load_topic_model(path):
+    """Load a model saved with ``save_topic_model``; returns (topic_model, topics)."""
+    from bertopic import BERTopic
+
+    topic_model = BERTopic.load(path, embedding_model=get_sentence_model())
+    with open(os.path.join(path, "document_topics.json")) as f:
+        topics = json.load(f)
+    return topic_model, topics
+
+
+def has_topic_model(path):
+    return os.path.exists(os.path.join(path, "document_topics.json"))
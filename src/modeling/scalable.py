@@ -0,0 +1,138 @@
+"""
+Clustering backends for corpora too large for exact UMAP + HDBSCAN.
+
+``create_models`` picks one of three backends by corpus size:
+
+- "exact": UMAP and HDBSCAN with their default neighbor search.
+- "ann": UMAP fitted on a kNN graph precomputed once with pynndescent,
+  followed by HDBSCAN using Borůvka's algorithm on a KD-tree over the
+  low-dimensional projection.
+- "kmeans": PCA followed by MiniBatchKMeans. Much cheaper, but every
+  document is assigned to a topic (there are no outliers).
+
+The thresholds come from ``python -m benchmarks.clustering``.
+"""
+
+# Corpus sizes (documents) from which each backend takes over
+ANN_MIN_DOCS = 20_000
+KMEANS_MIN_DOCS = 200_000
+BACKENDS = ["auto", "exact", "ann", "kmeans"]
+
+PCA_COMPONENTS = 20
+KMEANS_CLUSTERS = 50
+
+
+def select_backend(num_docs):
+    """Return the backend suited to a corpus of ``num_docs`` documents."""
+    if num_docs is None or num_docs < ANN_MIN_DOCS:
+        return "exact"
+    if num_docs < KMEANS_MIN_DOCS:
+        return "ann"
+    return "kmeans"
+
+
+def build_knn_graph(embeddings, n_neighbors, metric="cosine", random_state=None):
+    """
+    Build an approximate kNN graph with pynndescent.
+
+    Returns:
+        tuple: (indices, distances, index), the form UMAP accepts as
+        ``precomputed_knn``. The index answers queries for new points.
+    """
+    from pynndescent import NNDescent
+
+    index = NNDescent(
+        embeddings,
+        n_neighbors=n_neighbors,
+        metric=metric,
+        random_state=random_state,
+        low_memory=True,
+        n_jobs=-1,
+    )
+    indices, distances = index.neighbor_graph
+    return indices, distances, index
+
+
+class PrecomputedKNNUMAP:
+    """
+    UMAP whose neighbor graph is built once with pynndescent.
+
+    The graph and its search index are kept after fitting, so ``transform``
+    of new documents queries the same index instead of rebuilding one, and
+    callers that refit UMAP with other settings on the same embeddings can
+    pass ``knn_graph`` to skip the neighbor search altogether.
+
+    Args:
+        n_neighbors (int): Neighbors per point, for the graph and for UMAP.
+        knn_graph (tuple): Optional (indices, distances, index) from
+            ``build_knn_graph`` for the embeddings that will be fitted.
+        **umap_kwargs: Forwarded to ``umap.UMAP``.
+    """
+
+    def __init__(self, n_neighbors=5, metric="cosine", knn_graph=None, **umap_kwargs):
+        self.n_neighbors = n_neighbors
+        self.metric = metric
+        self.knn_graph = knn_graph
+        self.umap_kwargs = umap_kwargs
+        self.umap_model = None
+
+    def fit(self, X, y=None):
+        from umap import UMAP
+
+        if self.knn_graph is None or len(self.knn_graph[0]) != X.shape[0]:
+            self.knn_graph = build_knn_graph(
+                X,
+                self.n_neighbors,
+                self.metric,
+                random_state=self.umap_kwargs.get("random_state"),
+            )
+        self.umap_model = UMAP(
+            n_neighbors=self.n_neighbors,
+            metric=self.metric,
+            precomputed_knn=self.knn_graph,
+            low_memory=True,
+            **self.umap_kwargs,
+        )
+        self.umap_model.fit(X, y=y)
+        self.embedding_ = self.umap_model.embedding_
+        return self
+
+    def transform(self, X):
+        return self.umap_model.transform(X)
+
+    def fit_transform(self, X, y=None):
+        return self.fit(X, y=y).embedding_
+
+
+def ann_models(num_docs=None):
+    """Return the (reducer, clusterer) pair of the "ann" backend."""
+    from hdbscan import HDBSCAN
+
+    reducer = PrecomputedKNNUMAP(
+        n_neighbors=5, n_components=5, min_dist=0.05, metric="cosine"
+    )
+    # Keep the number of clusters (and the condensed tree) manageable as the
+    # corpus grows; nr_topics merges them down afterwards anyway
+    clusterer = HDBSCAN(
+        min_cluster_size=max(10, (num_docs or 0) // 1000),
+        min_samples=3,
+        metric="euclidean",
+        algorithm="boruvka_kdtree",
+        approx_min_span_tree=True,
+        core_dist_n_jobs=-1,
+        cluster_selection_method="eom",
+        prediction_data=True,
+    )
+    return reducer, clusterer
+
+
+def kmeans_models(n_components=PCA_COMPONENTS, n_clusters=KMEANS_CLUSTERS):
+    """Return the (reducer, clusterer) pair of the "kmeans" backend."""
+    from sklearn.cluster import MiniBatchKMeans
+    from sklearn.decomposition import PCA
+
+    reducer = PCA(n_components=n_components, svd_solver="randomized", random_state=0)
+    clusterer = MiniBatchKMeans(
+        n_clusters=n_clusters, batch_size=4096, n_init=3, random_state=0
+    )
+    return reducer, clusterer
@@ -0,0 +1,303 @@
+"""
+Hyperparameter sweep for the topic model.
+
+``sweep_topics`` fits the topic model once per combination of a parameter
+grid without repeating shared work:
+
+- The documents are embedded once (through the embedding cache).
+- UMAP runs once per distinct ``n_neighbors``, all from a single
+  pynndescent kNN graph built for the largest value (UMAP prunes it).
+- Every HDBSCAN + c-TF-IDF configuration then runs on a process pool,
+  reading the embeddings and its projection from memory-mapped files.
+
+Each configuration is scored with cheap metrics: the fraction of outlier
+documents, the NPMI coherence of each topic's top words over the corpus,
+and HDBSCAN's relative validity (a fast approximation of DBCV). The best
+configuration is refitted as a complete model on its cached projection.
+
+``min_topic_size`` is not swept: it only configures BERTopic's default
+HDBSCAN, which ``create_models`` replaces; ``min_cluster_size`` plays its
+role.
+"""
+
+import itertools
+import multiprocessing
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from instrumentation import span
+from modeling.clustering import create_models, create_vectorizer, embed_documents
+from modeling.scalable import PrecomputedKNNUMAP, build_knn_graph
+
+# Values tried for each parameter; create_models uses n_neighbors=5,
+# min_cluster_size=10, min_samples=3 and nr_topics=10. nr_topics=None keeps
+# every HDBSCAN cluster as a topic
+DEFAULT_GRID = {
+    "n_neighbors": [5, 15],
+    "min_cluster_size": [5, 10, 20],
+    "min_samples": [1, 3],
+    "nr_topics": [10, None],
+}
+# Fixed UMAP settings, as in create_clustering_models
+UMAP_COMPONENTS = 5
+UMAP_MIN_DIST = 0.05
+
+# Corpus shared by the worker processes, set once by init_worker
+_worker_state = {}
+
+
+def expand_grid(grid):
+    """Every combination of the values in ``grid``, as parameter dicts."""
+    names = list(grid)
+    return [
+        dict(zip(names, values))
+        for values in itertools.product(*(grid[name] for name in names))
+    ]
+
+
+def npmi_coherence(topic_words, doc_terms, vocabulary):
+    """
+    Mean normalized PMI between the top words of each topic.
+
+    Word probabilities are document frequencies in the corpus, so this
+    needs no reference corpus. Word pairs that never occur together score
+    -1 and pairs that always do score 1.
+
+    Args:
+        topic_words (list[list[str]]): Top words of every topic.
+        doc_terms (scipy.sparse.csc_matrix): Binary document-term matrix.
+        vocabulary (dict): Word -> column of ``doc_terms``.
+
+    Returns:
+        float: Mean over the topics, or nan if no topic has two known words.
+    """
+    num_docs = doc_terms.shape[0]
+    scores = []
+    for words in topic_words:
+        columns = [vocabulary[word] for word in words if word in vocabulary]
+        if len(columns) < 2:
+            continue
+        terms = doc_terms[:, columns]
+        joint = (terms.T @ terms).toarray() / num_docs
+        marginal = np.diag(joint)
+        i, j = np.triu_indices(len(columns), k=1)
+        p_ij = joint[i, j]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            npmi = np.log(p_ij / (marginal[i] * marginal[j])) / -np.log(p_ij)
+        npmi = np.where(p_ij >= 1, 1.0, np.where(p_ij > 0, npmi, -1.0))
+        scores.append(npmi.mean())
+    return float(np.mean(scores)) if scores else float("nan")
+
+
+def sweep_score(result):
+    """
+    Rank configurations: coherence + DBCV - outlier fraction, higher is better.
+
+    Configurations with fewer than two topics rank last.
+    """
+    if result["topics"] < 2:
+        return float("-inf")
+    coherence = np.nan_to_num(result["coherence"], nan=-1.0)
+    dbcv = np.nan_to_num(result["dbcv"], nan=-1.0)
+    return float(coherence + dbcv - result["outlier_fraction"])
+
+
+class FittedReducer:
+    """
+    A fitted reducer together with its projection of the training embeddings.
+
+    ``fit`` does nothing and ``transform`` of the training embeddings returns
+    the stored projection, so BERTopic reuses the sweep's UMAP result instead
+    of fitting UMAP again. New documents go through the reducer.
+    """
+
+    def __init__(self, reducer, embeddings, projection):
+        self.reducer = reducer
+        self.embeddings = embeddings
+        self.projection = projection
+
+    def fit(self, X, y=None):
+        return self
+
+    def transform(self, X):
+        if X is self.embeddings or (
+            X.shape == self.embeddings.shape and np.array_equal(X, self.embeddings)
+        ):
+            return self.projection
+        return self.reducer.transform(X)
+
+
+def create_hdbscan(min_cluster_size, min_samples, **kwargs):
+    from hdbscan import HDBSCAN
+
+    return HDBSCAN(
+        min_cluster_size=min_cluster_size,
+        min_samples=min_samples,
+        metric="euclidean",
+        cluster_selection_method="eom",
+        **kwargs,
+    )
+
+
+def umap_projections(embeddings, n_neighbors_values, random_state=None):
+    """
+    Fit UMAP once per distinct ``n_neighbors`` on a shared kNN graph.
+
+    Returns:
+        dict: n_neighbors -> (fitted reducer, projection of ``embeddings``)
+    """
+    knn_graph = build_knn_graph(
+        embeddings, max(n_neighbors_values), random_state=random_state
+    )
+    projections = {}
+    for n_neighbors in sorted(set(n_neighbors_values)):
+        with span("sweep.umap", items=len(embeddings), n_neighbors=n_neighbors):
+            reducer = PrecomputedKNNUMAP(
+                n_neighbors=n_neighbors,
+                knn_graph=knn_graph,
+                n_components=UMAP_COMPONENTS,
+                min_dist=UMAP_MIN_DIST,
+                random_state=random_state,
+            )
+            projections[n_neighbors] = (reducer, reducer.fit_transform(embeddings))
+    return projections
+
+
+def init_worker(docs, embeddings_path):
+    """Load the corpus, its embeddings and its document-term matrix once per worker."""
+    vectorizer = create_vectorizer()
+    doc_terms = vectorizer.fit_transform(docs)
+    doc_terms.data[:] = 1
+    _worker_state.update(
+        docs=docs,
+        embeddings=np.load(embeddings_path, mmap_mode="r"),
+        doc_terms=doc_terms.astype(np.float32).tocsc(),
+        vocabulary=vectorizer.vocabulary_,
+    )
+
+
+def evaluate_config(params, projection_path):
+    """Cluster one UMAP projection with ``params``, fit c-TF-IDF and score it."""
+    from bertopic import BERTopic
+    from bertopic.cluster import BaseCluster
+    from bertopic.dimensionality import BaseDimensionalityReduction
+
+    started = time.perf_counter()
+    projection = np.load(projection_path)
+    clusterer = create_hdbscan(
+        params["min_cluster_size"], params["min_samples"], gen_min_span_tree=True
+    ).fit(projection)
+    try:
+        dbcv = float(clusterer.relative_validity_)
+    except (ValueError, ZeroDivisionError):
+        dbcv = float("nan")
+
+    # The clusters are given as labels, so BERTopic only builds the topic
+    # representations (and merges topics down to nr_topics)
+    topic_model = BERTopic(
+        umap_model=BaseDimensionalityReduction(),
+        hdbscan_model=BaseCluster(),
+        vectorizer_model=create_vectorizer(),
+        nr_topics=params["nr_topics"],
+        top_n_words=6,
+        verbose=False,
+    )
+    topic_model.fit(
+        _worker_state["docs"],
+        embeddings=np.asarray(_worker_state["embeddings"]),
+        y=clusterer.labels_,
+    )
+    topics = np.asarray(topic_model.topics_)
+    topic_words = [
+        [word for word, _ in topic_model.get_topic(topic_id)]
+        for topic_id in sorted(set(topics.tolist()) - {-1})
+    ]
+    return {
+        **params,
+        "topics": len(topic_words),
+        "outlier_fraction": float(np.mean(topics == -1)),
+        "coherence": npmi_coherence(
+            topic_words, _worker_state["doc_terms"], _worker_state["vocabulary"]
+        ),
+        "dbcv": dbcv,
+        "seconds": time.perf_counter() - started,
+    }
+
+
+def sweep_topics(
+    clean_data, grid=None, embedding_cache=None, processes=None, random_state=42
+):
+    """
+    Fit the topic model for every combination of ``grid`` and keep the best.
+
+    Args:
+        clean_data (Iterable[str]): Preprocessed documents.
+        grid (dict): Values to try per parameter, overriding ``DEFAULT_GRID``
+            for the parameters it names.
+        embedding_cache (EmbeddingCache): Optional cache for the embeddings.
+        processes (int): Worker processes, defaults to the core count.
+        random_state (int): Seed for the kNN graph and UMAP.
+
+    Returns:
+        tuple: (best topic model fitted on ``clean_data``, its topics, and a
+        DataFrame with the parameters and metrics of every configuration,
+        best first)
+    """
+    import pandas as pd
+
+    docs = list(clean_data)
+    grid = {**DEFAULT_GRID, **(grid or {})}
+    configs = expand_grid(grid)
+
+    topic_model = create_models(len(docs), backend="exact")
+    embeddings = embed_documents(topic_model, docs, embedding_cache)
+    projections = umap_projections(embeddings, grid["n_neighbors"], random_state)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        embeddings_path = os.path.join(workdir, "embeddings.npy")
+        np.save(embeddings_path, embeddings)
+        projection_paths = {}
+        for n_neighbors, (_, projection) in projections.items():
+            projection_paths[n_neighbors] = os.path.join(
+                workdir, f"umap-{n_neighbors}.npy"
+            )
+            np.save(projection_paths[n_neighbors], projection)
+
+        with span("sweep.fit", items=len(configs)), ProcessPoolExecutor(
+            max_workers=min(processes or os.cpu_count(), len(configs)),
+            # Forking after UMAP has started numba's worker threads can
+            # deadlock the children
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=init_worker,
+            initargs=(docs, embeddings_path),
+        ) as pool:
+            results = list(
+                pool.map(
+                    evaluate_config,
+                    configs,
+                    [projection_paths[config["n_neighbors"]] for config in configs],
+                )
+            )
+
+    for result in results:
+        result["score"] = sweep_score(result)
+    results.sort(key=lambda result: result["score"], reverse=True)
+    best = results[0]
+
+    # Refit the winner in full (with prediction data, so new documents can
+    # be assigned) on its cached projection
+    reducer, projection = projections[best["n_neighbors"]]
+    topic_model = create_models(
+        len(docs),
+        umap_model=FittedReducer(reducer, embeddings, projection),
+        hdbscan_model=create_hdbscan(
+            best["min_cluster_size"], best["min_samples"], prediction_data=True
+        ),
+        nr_topics=best["nr_topics"],
+    )
+    topics, _ = topic_model.fit_transform(docs, embeddings=embeddings)
+    return topic_model, topics, pd.DataFrame(results)
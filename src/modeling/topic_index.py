@@ -0,0 +1,191 @@
+import numpy as np
+
+OUTLIER_NAME = "Outlier"
+# Candidates considered per example document, so near-duplicates can be skipped
+CANDIDATES_PER_DOC = 4
+# Word-set Jaccard similarity above which two texts count as the same
+DUPLICATE_THRESHOLD = 0.8
+
+
+def is_near_duplicate(words, other_words, threshold=DUPLICATE_THRESHOLD):
+    """Whether two word sets overlap by at least ``threshold`` (Jaccard)."""
+    union = len(words | other_words)
+    return union == 0 or len(words & other_words) / union >= threshold
+
+
+def select_rows(frame, positions):
+    """
+    Rows of a DataFrame or Series at sorted, distinct ``positions``.
+
+    A contiguous run of rows is sliced, which shares the buffers of
+    Arrow-backed columns; other selections go through ``iloc``, which gathers
+    only the selected rows (with Arrow's ``take`` for Arrow-backed columns).
+    """
+    if len(positions) and positions[-1] - positions[0] == len(positions) - 1:
+        return frame.iloc[positions[0] : positions[-1] + 1]
+    return frame.iloc[positions]
+
+
+def unique_texts(texts, k, threshold=DUPLICATE_THRESHOLD):
+    """The first ``k`` texts, skipping any that nearly repeat an earlier one."""
+    kept, kept_words = [], []
+    for text in texts:
+        words = set(text.split())
+        if any(is_near_duplicate(words, other, threshold) for other in kept_words):
+            continue
+        kept.append(text)
+        kept_words.append(words)
+        if len(kept) == k:
+            break
+    return kept
+
+
+class TopicIndex:
+    """
+    Per-topic lookups for one topic assignment, built in a single pass.
+
+    Holds the row positions of every topic, topic id <-> name maps, and a
+    cache of each topic's top terms and example documents. Code that visits
+    every topic (the app's tabs, the summarizer) then does O(N) work overall
+    instead of filtering the whole DataFrame once per topic.
+
+    Row positions refer to the DataFrame the index was built from and stay
+    valid as long as its rows are not reordered.
+
+    Args:
+        topics (array-like): Topic id of every row, e.g. ``df["topic"]``.
+        topic_model: Fitted topic model providing ``get_topic``.
+        embeddings (np.ndarray): Optional document embeddings, one row per
+            row of the DataFrame, used to pick representative documents.
+        terms (dict): Optional top (term, weight) pairs per topic id, for
+            topics whose model is not at hand (e.g. analysis service results).
+    """
+
+    def __init__(self, topics, topic_model=None, embeddings=None, terms=None):
+        topics = np.asarray(topics)
+        order = np.argsort(topics, kind="stable")
+        ids, starts, counts = np.unique(
+            topics[order], return_index=True, return_counts=True
+        )
+        self._positions = {
+            int(topic_id): order[start : start + count]
+            for topic_id, start, count in zip(ids, starts, counts)
+        }
+        self.counts = {
+            int(topic_id): int(count) for topic_id, count in zip(ids, counts)
+        }
+        # Topic ids in order of first appearance, like df["topic"].unique()
+        self.topic_ids = sorted(self._positions, key=lambda t: self._positions[t][0])
+        self.topic_model = topic_model
+        self.embeddings = embeddings
+        self._terms = dict(terms or {})
+        self._docs = {}
+        self.set_names({})
+
+    @classmethod
+    def from_dataframe(cls, df, topic_model=None, embeddings=None):
+        """Index the "topic" column of ``df`` (after ``assign_topics_to_dataframe``)."""
+        return cls(df["topic"].to_numpy(), topic_model, embeddings)
+
+    def __len__(self):
+        return len(self.topic_ids)
+
+    def __contains__(self, topic_id):
+        return topic_id in self._positions
+
+    def positions(self, topic_ids):
+        """Row positions of one topic id, or of a list of them, in row order."""
+        if np.isscalar(topic_ids):
+            return self._positions.get(int(topic_ids), np.empty(0, dtype=np.intp))
+        parts = [self.positions(topic_id) for topic_id in topic_ids]
+        return np.sort(np.concatenate(parts)) if parts else np.empty(0, dtype=np.intp)
+
+    def rows(self, df, topic_ids, limit=None):
+        """Rows of ``df`` in the given topic(s), optionally only the first ``limit``."""
+        return select_rows(df, self.positions(topic_ids)[:limit])
+
+    def docs(self, df, topic_id, column="text", limit=None):
+        """Values of ``column`` for the rows of one topic, in row order."""
+        return select_rows(df[column], self.positions(topic_id)[:limit]).tolist()
+
+    def terms(self, topic_id):
+        """Top (term, weight) pairs of a topic, fetched from the model once."""
+        if topic_id not in self._terms:
+            self._terms[topic_id] = self.topic_model.get_topic(topic_id) or []
+        return self._terms[topic_id]
+
+    def nearest_positions(self, topic_id, limit=None):
+        """
+        Row positions of a topic, closest to the topic's centroid first.
+
+        Documents are ranked by cosine similarity to the mean of the topic's
+        normalized embeddings. Requires ``embeddings``.
+        """
+        positions = self.positions(topic_id)
+        vectors = np.asarray(self.embeddings[positions], dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = vectors / np.maximum(norms, 1e-12)
+        similarity = vectors @ vectors.mean(axis=0)
+        return positions[np.argsort(-similarity, kind="stable")[:limit]]
+
+    def representative_docs(self, df, topic_id, k=5, column="text"):
+        """
+        Up to ``k`` distinct example documents for a topic, cached per topic.
+
+        With ``embeddings`` these are the documents nearest the topic's
+        centroid. Otherwise the topic model's own representative documents
+        are used (BERTopic keeps a few per topic after fitting, but not in
+        saved models), topped up with the topic's first rows. Near-identical
+        texts, such as reposts, are only included once.
+        """
+        key = (topic_id, k, column)
+        if key not in self._docs:
+            limit = k * CANDIDATES_PER_DOC
+            if self.embeddings is not None:
+                positions = self.nearest_positions(topic_id, limit)
+                candidates = df[column].iloc[positions].tolist()
+            else:
+                get_representative_docs = getattr(
+                    self.topic_model, "get_representative_docs", None
+                )
+                candidates = []
+                if get_representative_docs is not None and topic_id != -1:
+                    candidates = list(get_representative_docs(int(topic_id)) or [])
+                candidates += self.docs(df, topic_id, column, limit=limit)
+            self._docs[key] = unique_texts(candidates, k)
+        return self._docs[key]
+
+    def keyword_label(self, topic_id, num_terms=3):
+        """A provisional name made of the topic's top terms, e.g. "game, season, show"."""
+        if topic_id == -1:
+            return OUTLIER_NAME
+        known = self.topic_model is not None or topic_id in self._terms
+        terms = self.terms(topic_id)[:num_terms] if known else []
+        return ", ".join(term for term, _ in terms) or f"Topic {topic_id}"
+
+    def set_names(self, topic_summaries):
+        """
+        Name the topics from ``generate_topic_summaries`` output.
+
+        Topics without a summary (yet), or whose summary failed, get their
+        ``keyword_label``; -1 is "Outlier".
+        """
+        self.names = {
+            topic_id: (
+                topic_summaries[topic_id]["name"]
+                if topic_id in topic_summaries
+                and not topic_summaries[topic_id].get("failed")
+                else self.keyword_label(topic_id)
+            )
+            for topic_id in self.topic_ids
+        }
+        self._ids_by_name = {}
+        for topic_id, name in self.names.items():
+            self._ids_by_name.setdefault(name, []).append(topic_id)
+
+    def name(self, topic_id):
+        return self.names.get(topic_id, OUTLIER_NAME)
+
+    def ids_for_name(self, name):
+        """Topic ids carrying ``name``; LLM-generated names are not always unique."""
+        return self._ids_by_name.get(name, [])
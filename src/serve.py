@@ -0,0 +1,44 @@
+"""
+Run the local analysis service.
+
+The service queues analysis jobs and runs them on worker processes that keep
+the sentence encoder loaded (see ``analysis_service``). Identical jobs that
+arrive while one is running share its result. Point the Streamlit app at it
+with the ``ANALYSIS_SERVICE_URL`` environment variable.
+
+Usage (from the ``src`` directory):
+
+    python serve.py --port 8000 --processes 2
+    curl -X POST localhost:8000/jobs -H "Content-Type: application/json" \\
+        -d '{"subreddit": "politics", "limit": 200}'
+    curl localhost:8000/jobs/<id>
+    curl localhost:8000/jobs/<id>/result
+"""
+
+import argparse
+
+import uvicorn
+
+from analysis_service.api import create_app
+from analysis_service.jobs import DEFAULT_OUTPUT_DIR, JobQueue
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the local analysis service.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--processes", type=int, default=2)
+    parser.add_argument("--scrape-threads", type=int, default=4)
+    parser.add_argument("--output-dir", default=DEFAULT_OUTPUT_DIR)
+    args = parser.parse_args()
+
+    job_queue = JobQueue(
+        output_dir=args.output_dir,
+        processes=args.processes,
+        scrape_threads=args.scrape_threads,
+    )
+    uvicorn.run(create_app(job_queue), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from contextlib import closing
+
+DEFAULT_CACHE_PATH = os.getenv(
+    "SUMMARY_CACHE_PATH", os.path.join("cache", "summaries.sqlite")
+)
+DEFAULT_MAX_ENTRIES = 10_000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS summaries (
+    llm_model TEXT NOT NULL,
+    prompt_hash TEXT NOT NULL,
+    name TEXT NOT NULL,
+    description TEXT NOT NULL,
+    last_used REAL NOT NULL,
+    PRIMARY KEY (llm_model, prompt_hash)
+);
+CREATE INDEX IF NOT EXISTS summaries_last_used ON summaries (last_used);
+"""
+
+
+def prompt_hash(prompt):
+    return hashlib.sha256(prompt.encode()).hexdigest()
+
+
+class SummaryCache:
+    """
+    Persistent cache of parsed LLM topic summaries.
+
+    Entries are keyed on (llm_model, sha256 of the exact prompt), so a topic
+    whose terms and example documents are unchanged is answered without
+    calling Ollama. Once more than ``max_entries`` summaries are stored, the
+    least recently used ones are evicted. ``hits`` and ``misses`` count
+    lookups made through this instance.
+
+    Args:
+        path (str): Location of the SQLite database file.
+        max_entries (int): Maximum number of cached summaries.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_entries=DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with closing(self._connect()) as conn, conn:
+            conn.executescript(SCHEMA)
+
+    def _connect(self):
+        return sqlite3.connect(self.path)
+
+    def get(self, llm_model, prompt):
+        """Return the cached {'name', 'description'} for a prompt, or None."""
+        key = (llm_model, prompt_hash(prompt))
+        with closing(self._connect()) as conn, conn:
+            row = conn.execute(
+                "SELECT name, description FROM summaries "
+                "WHERE llm_model = ? AND prompt_hash = ?",
+                key,
+            ).fetchone()
+            if row is not None:
+                conn.execute(
+                    "UPDATE summaries SET last_used = ? "
+                    "WHERE llm_model = ? AND prompt_hash = ?",
+                    (time.time(), *key),
+                )
+
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return {"name": row[0], "description": row[1]}
+
+    def put(self, llm_model, prompt, summary):
+        """Store a parsed summary, evicting the oldest entries beyond the cap."""
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO summaries "
+                "(llm_model, prompt_hash, name, description, last_used) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (
+                    llm_model,
+                    prompt_hash(prompt),
+                    summary["name"],
+                    summary["description"],
+                    time.time(),
+                ),
+            )
+            conn.execute(
+                "DELETE FROM summaries WHERE rowid IN ("
+                "SELECT rowid FROM summaries ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+    def stats(self):
+        """Return the hit/miss counters and the number of stored summaries."""
+        with closing(self._connect()) as conn:
+            (size,) = conn.execute("SELECT COUNT(*) FROM summaries").fetchone()
+        return {"hits": self.hits, "misses": self.misses, "size": size}
@@ -1,83 +1,593 @@
-import ollama
-
+import functools
+import json
+import queue
+import time
+from concurrent.futures import ThreadPoolExecutor
 
-def generate_topic_summaries(topic_model, df, llm_model="llama3.2:latest"):
-    """
-    Use an LLM to generate descriptive names and summaries for each topic cluster.
+import ollama
 
-    Parameters:
-    - topic_model: The fitted BERTopic model
-    - df: DataFrame containing the texts and their assigned topics
-    - llm_model: The Ollama model to use
+from instrumentation import in_context, span
+from modeling.topic_index import TopicIndex
 
-    Returns:
-    - Dictionary mapping topic_ids to {'name': '...', 'description': '...'}
-    """
-    topic_summaries = {}
+# Approximate LLM tokens in the example documents of one prompt
+DOC_TOKEN_BUDGET = 600
+# Rough tokens per whitespace-separated word for Llama-style tokenizers
+TOKENS_PER_WORD = 1.3
+# Context window requested for batched prompts. It is fixed because Ollama
+# reloads the model whenever num_ctx changes between requests
+BATCH_CONTEXT_TOKENS = 8192
+# Tokens per topic in a batched request beyond its example documents: the
+# key terms, headings and the JSON reply
+BATCH_TOKENS_PER_TOPIC = 150
 
-    # Get unique topics (excluding -1 which is the outlier topic)
-    unique_topics = [topic for topic in df["topic"].unique() if topic != -1]
+TOPIC_PROMPT = """
+        I have a cluster of documents from a subreddit on a related topic.
 
-    for topic_id in unique_topics:
-        # Get the top terms for this topic
-        topic_terms = topic_model.get_topic(topic_id)
-        terms_str = ", ".join([term for term, _ in topic_terms])
-
-        # Get representative documents for this topic
-        topic_docs = df[df["topic"] == topic_id]["text"].tolist()
-        # Limit to a few examples to avoid context length issues
-        example_docs = topic_docs[:5]
-        docs_str = "\n- " + "\n- ".join(example_docs)
-
-        # Create prompt for the LLM
-        prompt = f"""
-        I have a cluster of documents from a subreddit on a related topic. 
-        
         The key terms for this topic are: {terms_str}
-        
+
         Here are some example documents in this cluster:
         {docs_str}
-        
+
         Based on these terms and examples, please provide:
         1. A concise, descriptive name for this topic (max 5 words)
         2. A brief one-sentence description of what this topic represents
-        
+
         Format your response as:
         Name: [topic name]
         Description: [brief description]
         """
 
-        # Send to Ollama LLM
-        response = ollama.chat(
-            model=llm_model, messages=[{"role": "user", "content": prompt}]
+# Structured output format (Ollama's ``format``) for batched requests
+BATCH_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "topics": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "topic_id": {"type": "integer"},
+                    "name": {"type": "string"},
+                    "description": {"type": "string"},
+                },
+                "required": ["topic_id", "name", "description"],
+            },
+        }
+    },
+    "required": ["topics"],
+}
+
+
+def trim_to_budget(docs, max_tokens=DOC_TOKEN_BUDGET):
+    """
+    Shorten documents so that together they fit in about ``max_tokens`` tokens.
+
+    The budget is shared evenly; documents shorter than their share are kept
+    whole and leave the rest to the longer ones, which are cut at a word
+    boundary. Documents trimmed to nothing are dropped.
+    """
+    words = [doc.split() for doc in docs]
+    remaining = int(max_tokens / TOKENS_PER_WORD)
+    limits = [0] * len(docs)
+    by_length = sorted(range(len(docs)), key=lambda i: len(words[i]))
+    for rank, i in enumerate(by_length):
+        limits[i] = min(len(words[i]), remaining // (len(docs) - rank))
+        remaining -= limits[i]
+    return [" ".join(w[:limit]) for w, limit in zip(words, limits) if limit]
+
+
+def topic_context(
+    topic_model,
+    df,
+    topic_id,
+    topic_index=None,
+    num_docs=5,
+    token_budget=DOC_TOKEN_BUDGET,
+):
+    """
+    Format one topic's key terms and example documents for a prompt.
+
+    The examples are the topic's most representative distinct documents
+    (see ``TopicIndex.representative_docs``), trimmed to ``token_budget``
+    tokens in total so prompt length does not grow with post length.
+
+    Pass the ``TopicIndex`` of ``df`` when building prompts for many topics;
+    without one, ``df`` is indexed on every call.
+
+    Returns:
+        tuple: (comma-separated terms, bulleted example documents)
+    """
+    if topic_index is None:
+        topic_index = TopicIndex.from_dataframe(df, topic_model)
+
+    # Get the top terms for this topic
+    topic_terms = topic_index.terms(topic_id)
+    terms_str = ", ".join([term for term, _ in topic_terms])
+
+    # Get representative documents for this topic, trimmed to avoid context
+    # length issues
+    example_docs = trim_to_budget(
+        topic_index.representative_docs(df, topic_id, k=num_docs), token_budget
+    )
+    docs_str = "\n- " + "\n- ".join(example_docs)
+    return terms_str, docs_str
+
+
+def build_topic_prompt(topic_model, df, topic_id, topic_index=None, **kwargs):
+    """
+    Build the LLM prompt describing one topic's key terms and example documents.
+
+    Keyword arguments are passed on to ``topic_context``.
+    """
+    terms_str, docs_str = topic_context(
+        topic_model, df, topic_id, topic_index, **kwargs
+    )
+    return TOPIC_PROMPT.format(terms_str=terms_str, docs_str=docs_str)
+
+
+def build_batch_prompt(contexts):
+    """
+    Build one prompt asking for the names and descriptions of several topics.
+
+    Args:
+        contexts (dict): Topic id -> (terms, documents) from ``topic_context``.
+    """
+    lines = [
+        f"I have {len(contexts)} clusters of documents from a subreddit, "
+        "each on a related topic.",
+    ]
+    for topic_id, (terms_str, docs_str) in contexts.items():
+        lines += [
+            "",
+            f"Topic {topic_id}:",
+            f"The key terms for this topic are: {terms_str}",
+            f"Here are some example documents in this cluster:{docs_str}",
+        ]
+    lines += [
+        "",
+        "For every topic above, based on its terms and examples, provide:",
+        "1. A concise, descriptive name for the topic (max 5 words)",
+        "2. A brief one-sentence description of what the topic represents",
+        "",
+        'Respond in JSON with one entry per topic in "topics", using the topic '
+        'numbers above as "topic_id".',
+    ]
+    return "\n".join(lines)
+
+
+def fallback_summary(topic_id, description):
+    """
+    Summary of a topic the LLM could not name, marked ``"failed": True``.
+
+    Failed summaries are not cached, so the topic is requested again next time.
+    """
+    return {"name": f"Topic {topic_id}", "description": description, "failed": True}
+
+
+def parse_topic_summary(topic_id, response_text):
+    """Extract the name and description from an LLM response."""
+    try:
+        name_line = [
+            line for line in response_text.split("\n") if line.startswith("Name:")
+        ][0]
+        desc_line = [
+            line
+            for line in response_text.split("\n")
+            if line.startswith("Description:")
+        ][0]
+
+        name = name_line.replace("Name:", "").strip()
+        description = desc_line.replace("Description:", "").strip()
+
+        return {"name": name, "description": description}
+    except IndexError:
+        # Fallback if parsing fails
+        return fallback_summary(topic_id, response_text.strip())
+
+
+def valid_batch_entries(topic_ids, entries):
+    """
+    Keep the batched entries that answer one of ``topic_ids``.
+
+    An entry is kept if its ``topic_id`` was asked for and it has a non-empty
+    name and description; only the first entry per topic counts.
+
+    Returns:
+        dict: Topic id -> {'name': '...', 'description': '...'}
+    """
+    wanted = set(topic_ids)
+    summaries = {}
+    for entry in entries:
+        if not isinstance(entry, dict):
+            continue
+        topic_id = entry.get("topic_id")
+        name = entry.get("name")
+        description = entry.get("description")
+        if (
+            topic_id in wanted
+            and topic_id not in summaries
+            and isinstance(name, str)
+            and name.strip()
+            and isinstance(description, str)
+            and description.strip()
+        ):
+            summaries[topic_id] = {
+                "name": name.strip(),
+                "description": description.strip(),
+            }
+    return summaries
+
+
+def parse_batch_summaries(topic_ids, response_text):
+    """
+    Extract the valid per-topic entries of a batched JSON response.
+
+    Topics without a valid entry (see ``valid_batch_entries``) are missing
+    from the result.
+    """
+    try:
+        entries = json.loads(response_text)["topics"]
+    except (ValueError, KeyError, TypeError):
+        return {}
+    if not isinstance(entries, list):
+        return {}
+    return valid_batch_entries(topic_ids, entries)
+
+
+def complete_batch_entries(partial_text):
+    """Entries of a partially received batched JSON response that are complete."""
+    position = partial_text.find("[")
+    if position == -1:
+        return []
+    decoder = json.JSONDecoder()
+    entries = []
+    position += 1
+    while True:
+        while position < len(partial_text) and partial_text[position] in " \t\r\n,":
+            position += 1
+        try:
+            entry, position = decoder.raw_decode(partial_text, position)
+        except ValueError:
+            return entries
+        entries.append(entry)
+
+
+def chat_text(client, llm_model, prompt, on_text=None, **kwargs):
+    """
+    Send one prompt to Ollama.
+
+    With ``on_text`` the response is streamed (``stream=True``) and
+    ``on_text`` is called with the text received so far after every chunk.
+    Other keyword arguments are passed on to ``client.chat``.
+
+    Returns:
+        tuple: (response text, prompt tokens evaluated)
+    """
+    messages = [{"role": "user", "content": prompt}]
+    if on_text is None:
+        response = client.chat(model=llm_model, messages=messages, **kwargs)
+        return response["message"]["content"], response.get("prompt_eval_count")
+
+    content = ""
+    prompt_tokens = None
+    for chunk in client.chat(model=llm_model, messages=messages, stream=True, **kwargs):
+        content += chunk["message"]["content"]
+        on_text(content)
+        if chunk.get("done"):
+            prompt_tokens = chunk.get("prompt_eval_count")
+    return content, prompt_tokens
+
+
+def report_partial_summary(on_update, topic_id, text):
+    """Pass the summary parsed from a partly streamed response to ``on_update``."""
+    on_update(topic_id, parse_topic_summary(topic_id, text), False)
+
+
+def report_batch_entries(on_update, summaries, topic_ids, text):
+    """
+    Pass the entries of a partly streamed batched response to ``on_update``.
+
+    Each of ``topic_ids`` is passed once, as soon as its entry is complete,
+    and added to ``summaries``.
+    """
+    entries = valid_batch_entries(topic_ids, complete_batch_entries(text))
+    for topic_id, summary in entries.items():
+        if topic_id not in summaries:
+            summaries[topic_id] = summary
+            on_update(topic_id, summary, True)
+
+
+def summarize_topic(
+    client, llm_model, topic_id, prompt, retries=0, backoff=1.0, on_update=None
+):
+    """
+    Send one topic prompt to Ollama and parse the response.
+
+    Failed requests (including timeouts) are retried up to ``retries`` times
+    with exponential backoff. If every attempt fails, the ``Topic {id}``
+    fallback is returned and the error is kept in the description.
+
+    With ``on_update`` the response is streamed, and after every chunk
+    ``on_update(topic_id, summary, False)`` receives the summary parsed from
+    the text so far (the raw text as description until both lines are in).
+    """
+    on_text = None
+    if on_update is not None:
+        on_text = functools.partial(report_partial_summary, on_update, topic_id)
+
+    with span("llm.chat", items=1, topic_id=int(topic_id), model=llm_model) as current:
+        for attempt in range(retries + 1):
+            current.attributes["attempts"] = attempt + 1
+            try:
+                content, prompt_tokens = chat_text(client, llm_model, prompt, on_text)
+                current.attributes["prompt_tokens"] = prompt_tokens
+                return parse_topic_summary(topic_id, content)
+            except Exception as e:
+                error = e
+                if attempt < retries:
+                    time.sleep(backoff * 2**attempt)
+        current.attributes["failed"] = True
+
+    return fallback_summary(topic_id, f"Summary unavailable: {error}")
+
+
+def summarize_batch(
+    client, llm_model, contexts, retries=0, backoff=1.0, on_update=None
+):
+    """
+    Summarize several topics with one structured-output request.
+
+    The instructions are sent (and prefilled) once for the whole batch, and
+    Ollama constrains the reply to ``BATCH_SCHEMA``. Each topic's entry is
+    validated separately; only the topics whose entries are missing or
+    malformed are requested again, up to ``retries`` times, with failed
+    requests backing off exponentially. Topics that never get a valid entry
+    get the ``Topic {id}`` fallback.
+
+    With ``on_update`` the response is streamed, and
+    ``on_update(topic_id, summary, True)`` is called as soon as a topic's
+    entry has been received in full, before the rest of the batch.
+
+    Args:
+        contexts (dict): Topic id -> (terms, documents) from ``topic_context``.
+
+    Returns:
+        dict: Topic id -> {'name': '...', 'description': '...'}
+    """
+    summaries = {}
+    pending = list(contexts)
+    error = None
+    with span("llm.batch", items=len(pending), model=llm_model) as current:
+        current.attributes["prompt_tokens"] = 0
+        for attempt in range(retries + 1):
+            current.attributes["attempts"] = attempt + 1
+            prompt = build_batch_prompt(
+                {topic_id: contexts[topic_id] for topic_id in pending}
+            )
+            on_text = None
+            if on_update is not None:
+                on_text = functools.partial(
+                    report_batch_entries, on_update, summaries, pending
+                )
+            try:
+                content, prompt_tokens = chat_text(
+                    client,
+                    llm_model,
+                    prompt,
+                    on_text,
+                    format=BATCH_SCHEMA,
+                    options={"num_ctx": BATCH_CONTEXT_TOKENS},
+                )
+            except Exception as e:
+                error = e
+                if attempt < retries:
+                    time.sleep(backoff * 2**attempt)
+                continue
+
+            current.attributes["prompt_tokens"] += prompt_tokens or 0
+            for topic_id, summary in parse_batch_summaries(pending, content).items():
+                summaries.setdefault(topic_id, summary)
+            pending = [topic_id for topic_id in pending if topic_id not in summaries]
+            if not pending:
+                break
+            error = "no valid entry in the batched response"
+        current.attributes["failed"] = len(pending)
+
+    for topic_id in pending:
+        summaries[topic_id] = fallback_summary(
+            topic_id, f"Summary unavailable: {error}"
+        )
+    return summaries
+
+
+def iter_topic_summaries(
+    topic_model,
+    df,
+    llm_model="llama3.2:latest",
+    max_concurrency=1,
+    timeout=None,
+    retries=0,
+    host=None,
+    response_cache=None,
+    topic_index=None,
+    num_docs=5,
+    token_budget=DOC_TOKEN_BUDGET,
+    batch_size=1,
+    stream=False,
+):
+    """
+    Summarize topics like ``generate_topic_summaries``, yielding each one as it completes.
+
+    Yields ``(topic_id, summary, done)`` tuples. Cached topics come first,
+    then every other topic as soon as its request finishes, in completion
+    order; each topic is yielded once with ``done`` True. With ``stream=True``
+    responses are streamed token by token: per-topic requests also yield
+    in-progress summaries (``done`` False) as text arrives, and topics in a
+    batched request are yielded as soon as their own entry is complete.
+
+    Requests run on worker threads, but everything is yielded on the calling
+    thread, so the consumer can update a UI directly. Parameters are those
+    of ``generate_topic_summaries`` plus ``stream``.
+    """
+    client = ollama.Client(host=host, timeout=timeout)
+
+    if topic_index is None:
+        topic_index = TopicIndex.from_dataframe(df, topic_model)
+
+    # Get unique topics (excluding -1 which is the outlier topic)
+    unique_topics = [topic for topic in topic_index.topic_ids if topic != -1]
+    contexts = {
+        topic_id: topic_context(
+            topic_model, df, topic_id, topic_index, num_docs, token_budget
         )
+        for topic_id in unique_topics
+    }
+    # The single-topic prompt identifies a topic in the cache in either mode
+    prompts = {
+        topic_id: TOPIC_PROMPT.format(terms_str=terms_str, docs_str=docs_str)
+        for topic_id, (terms_str, docs_str) in contexts.items()
+    }
+
+    pending = []
+    for topic_id in unique_topics:
+        cached = None
+        if response_cache is not None:
+            cached = response_cache.get(llm_model, prompts[topic_id])
+        if cached is None:
+            pending.append(topic_id)
+        else:
+            yield topic_id, cached, True
 
-        # Parse the response
-        response_text = response["message"]["content"]
+    # Batches must fit in the batch context. A topic too large for it alone
+    # is still summarized, in a request of its own with the default context
+    batch_fit = BATCH_CONTEXT_TOKENS // (token_budget + BATCH_TOKENS_PER_TOPIC)
+    batch_size = max(min(batch_size, batch_fit), 1)
+    # Workers report progress here; None marks a finished job
+    events = queue.Queue()
+    on_update = (lambda *event: events.put(event)) if stream else None
 
-        # Extract name and description
+    def summarize(topic_ids):
         try:
-            name_line = [
-                line for line in response_text.split("\n") if line.startswith("Name:")
-            ][0]
-            desc_line = [
-                line
-                for line in response_text.split("\n")
-                if line.startswith("Description:")
-            ][0]
-
-            name = name_line.replace("Name:", "").strip()
-            description = desc_line.replace("Description:", "").strip()
-
-            topic_summaries[topic_id] = {"name": name, "description": description}
-        except IndexError:
-            # Fallback if parsing fails
-            topic_summaries[topic_id] = {
-                "name": f"Topic {topic_id}",
-                "description": response_text.strip(),
-            }
+            if batch_size == 1:
+                (topic_id,) = topic_ids
+                summaries = {
+                    topic_id: summarize_topic(
+                        client,
+                        llm_model,
+                        topic_id,
+                        prompts[topic_id],
+                        retries=retries,
+                        on_update=on_update,
+                    )
+                }
+            else:
+                summaries = summarize_batch(
+                    client,
+                    llm_model,
+                    {topic_id: contexts[topic_id] for topic_id in topic_ids},
+                    retries=retries,
+                    on_update=on_update,
+                )
+            for topic_id, summary in summaries.items():
+                events.put((topic_id, summary, True))
+        finally:
+            events.put(None)
+
+    with ThreadPoolExecutor(max_workers=max(max_concurrency, 1)) as executor:
+        futures = [
+            executor.submit(in_context(summarize), pending[start : start + batch_size])
+            for start in range(0, len(pending), batch_size)
+        ]
+        finished_jobs = 0
+        finished_topics = set()
+        while finished_jobs < len(futures):
+            event = events.get()
+            if event is None:
+                finished_jobs += 1
+                continue
+            topic_id, summary, done = event
+            if topic_id in finished_topics:
+                continue
+            if done:
+                finished_topics.add(topic_id)
+                # Only cache responses that parsed; fallbacks should be
+                # retried next run
+                if response_cache is not None and not summary.get("failed"):
+                    response_cache.put(llm_model, prompts[topic_id], summary)
+            yield topic_id, summary, done
+        # Surface errors raised outside the per-request error handling
+        for future in futures:
+            future.result()
+
+
+def generate_topic_summaries(
+    topic_model,
+    df,
+    llm_model="llama3.2:latest",
+    max_concurrency=1,
+    timeout=None,
+    retries=0,
+    host=None,
+    response_cache=None,
+    topic_index=None,
+    num_docs=5,
+    token_budget=DOC_TOKEN_BUDGET,
+    batch_size=1,
+):
+    """
+    Use an LLM to generate descriptive names and summaries for each topic cluster.
+
+    Parameters:
+    - topic_model: The fitted BERTopic model
+    - df: DataFrame containing the texts and their assigned topics
+    - llm_model: The Ollama model to use
+    - max_concurrency: Number of topics summarized in parallel
+    - timeout: Per-request timeout in seconds (None waits indefinitely)
+    - retries: Extra attempts per topic after a failed request
+    - host: Ollama server URL, defaults to OLLAMA_HOST or the local server
+    - response_cache: Optional SummaryCache; cached prompts skip the LLM
+    - topic_index: TopicIndex of df, built here if not given. Build it with
+      the document embeddings to use the documents nearest each topic's
+      centroid as examples
+    - num_docs: Example documents per prompt
+    - token_budget: Approximate tokens of example text per topic
+    - batch_size: Topics packed into one structured-output request (see
+      summarize_batch); 1 sends a request per topic. Capped so a batch fits
+      in BATCH_CONTEXT_TOKENS; with a token_budget too large for even one
+      topic, a request is sent per topic
+
+    Use iter_topic_summaries to receive summaries as they complete.
 
-    return topic_summaries
+    Returns:
+    - Dictionary mapping topic_ids to {'name': '...', 'description': '...'},
+      ordered as the topics first appear in df. Topics that could not be
+      summarized get fallback_summary, with 'failed': True
+    """
+    if topic_index is None:
+        topic_index = TopicIndex.from_dataframe(df, topic_model)
+
+    summaries = {
+        topic_id: summary
+        for topic_id, summary, done in iter_topic_summaries(
+            topic_model,
+            df,
+            llm_model=llm_model,
+            max_concurrency=max_concurrency,
+            timeout=timeout,
+            retries=retries,
+            host=host,
+            response_cache=response_cache,
+            topic_index=topic_index,
+            num_docs=num_docs,
+            token_budget=token_budget,
+            batch_size=batch_size,
+        )
+    }
+    return {
+        topic_id: summaries[topic_id]
+        for topic_id in topic_index.topic_ids
+        if topic_id != -1
+    }
 
 
 def print_topic_summaries(topic_summaries):
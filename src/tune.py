@@ -0,0 +1,87 @@
+"""
+Tune the topic model for one subreddit.
+
+Fits every combination of the given hyperparameters (see
+``modeling.sweep``), prints the configurations ranked by score and saves the
+best model where ``fit_or_load_topics`` looks for it, so the app and
+``main.py`` load the tuned model for the same posts.
+
+Usage (from the ``src`` directory):
+
+    python tune.py politics --sort month --limit 200
+    python tune.py askscience --min-cluster-size 5 10 15 --nr-topics 10 20 none
+"""
+
+import argparse
+
+import modeling.clustering as model
+from data_prep.dedup import collapse_near_duplicates
+from data_prep.transform import build_corpus, preprocess_many
+from data_retrieval.scrape_cache import cached_scrape_subreddit_posts
+from instrumentation import print_breakdown, trace
+from modeling.embedding_cache import EmbeddingCache
+from modeling.registry import EMBEDDING_CACHE_NAME, save_topic_model
+from modeling.sweep import DEFAULT_GRID, sweep_topics
+
+
+def parse_nr_topics(value):
+    """An int, or "none" to keep every cluster."""
+    return None if value.lower() == "none" else int(value)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tune the topic model.")
+    parser.add_argument("subreddit")
+    parser.add_argument("--sort", default="month")
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument(
+        "--n-neighbors", type=int, nargs="+", default=DEFAULT_GRID["n_neighbors"]
+    )
+    parser.add_argument(
+        "--min-cluster-size",
+        type=int,
+        nargs="+",
+        default=DEFAULT_GRID["min_cluster_size"],
+    )
+    parser.add_argument(
+        "--min-samples", type=int, nargs="+", default=DEFAULT_GRID["min_samples"]
+    )
+    parser.add_argument(
+        "--nr-topics",
+        type=parse_nr_topics,
+        nargs="+",
+        default=DEFAULT_GRID["nr_topics"],
+        help='Topic counts to merge down to, or "none"',
+    )
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--output", help="Write the results table to this CSV file")
+    args = parser.parse_args()
+
+    with trace() as tracer:
+        df = cached_scrape_subreddit_posts(args.subreddit, args.sort, args.limit)
+        # The same near-duplicate-free corpus the app and main.py model
+        docs, _ = collapse_near_duplicates(preprocess_many(build_corpus(df)))
+        best_model, topics, results = sweep_topics(
+            docs,
+            grid={
+                "n_neighbors": args.n_neighbors,
+                "min_cluster_size": args.min_cluster_size,
+                "min_samples": args.min_samples,
+                "nr_topics": args.nr_topics,
+            },
+            embedding_cache=EmbeddingCache(model_name=EMBEDDING_CACHE_NAME),
+            processes=args.processes,
+        )
+
+    print(results.to_string(index=False, float_format="{:.3f}".format))
+    if args.output:
+        results.to_csv(args.output, index=False)
+
+    path = model.topic_model_path(docs)
+    save_topic_model(best_model, topics, path)
+    print(f"\nSaved the best model ({results.iloc[0]['topics']} topics) to {path}")
+    print_breakdown(tracer)
+
+
+if __name__ == "__main__":
+    main()
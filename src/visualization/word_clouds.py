@@ -0,0 +1,200 @@
+"""
+Word-cloud images for the topic views.
+
+Word clouds are rendered straight to PNG bytes with Pillow, without a
+matplotlib figure that would have to be closed again. ``WordCloudRenderer``
+renders them on a process pool, so the clouds of every topic can be
+prefetched while the page is drawn, and keeps the results in an LRU cache
+keyed by the topic's terms and the style. Topics that keep their terms
+across analyses or reruns are never rendered twice.
+"""
+
+import io
+import multiprocessing
+import os
+import sys
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import process, spawn
+
+# Settings passed to wordcloud.WordCloud
+WORD_CLOUD_STYLE = {
+    "width": 800,
+    "height": 480,
+    "background_color": "white",
+    "colormap": "viridis",
+    "max_words": 100,
+    "contour_width": 1,
+    "contour_color": "steelblue",
+    "prefer_horizontal": 1,
+}
+# Rendered images kept by a renderer
+CACHE_SIZE = 256
+# Environment variable telling the fork server which main script to import
+MAIN_PATH_VARIABLE = "WORD_CLOUD_MAIN_PATH"
+
+
+def start_worker_pool(processes):
+    """
+    Process pool for rendering, safe to start from the threaded app server.
+
+    Workers are forked from a fork server, a single-threaded process started
+    once. Every worker needs the parent's ``__main__`` script, which under
+    Streamlit is the whole app, so the fork server imports it, along with
+    this module, before forking any worker; the workers inherit it instead
+    of each running it again. Where there is no fork server (Windows),
+    workers are spawned and each runs the script.
+    """
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("forkserver")
+        context.set_forkserver_preload(["__main__", __name__])
+        # Preloading "__main__" alone is a no-op: the fork server is never
+        # given the script's path, so this module imports it there instead
+        main_path = spawn.get_preparation_data("ignore").get("init_main_from_path")
+        if main_path is not None:
+            os.environ[MAIN_PATH_VARIABLE] = main_path
+    else:
+        context = multiprocessing.get_context("spawn")
+    return ProcessPoolExecutor(max_workers=processes, mp_context=context)
+
+
+def render_word_cloud(terms, style=None):
+    """
+    Render a word cloud of (term, weight) pairs as PNG bytes.
+
+    Args:
+        terms (list[tuple[str, float]]): Terms and their weights, e.g. the
+            c-TF-IDF terms of a topic.
+        style (dict): ``WordCloud`` settings, defaulting to
+            ``WORD_CLOUD_STYLE``.
+    """
+    from wordcloud import WordCloud
+
+    wordcloud = WordCloud(**(style or WORD_CLOUD_STYLE))
+    image = wordcloud.generate_from_frequencies(dict(terms)).to_image()
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+class WordCloudRenderer:
+    """
+    Renders word clouds on a process pool and caches them by (terms, style).
+
+    ``submit`` returns a future for the PNG bytes; asking again for the same
+    terms and style returns the same future, whether it is still rendering
+    or done. The pool is started on first use. One renderer is meant to be
+    shared by every session of the app.
+
+    Args:
+        processes (int): Rendering processes.
+        cache_size (int): Images kept, least recently used dropped first.
+    """
+
+    def __init__(self, processes=2, cache_size=CACHE_SIZE):
+        self.processes = processes
+        self.cache_size = cache_size
+        self._futures = OrderedDict()
+        self._executor = None
+        # Reentrant: cancelling futures runs their callbacks, which take it too
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def key(terms, style):
+        return (
+            tuple((term, round(float(weight), 6)) for term, weight in terms),
+            tuple(sorted(style.items())),
+        )
+
+    def submit(self, terms, style=None):
+        """Future for the PNG of ``terms``, from the cache or a new render."""
+        style = style or WORD_CLOUD_STYLE
+        key = self.key(terms, style)
+        with self._lock:
+            future = self._futures.get(key)
+            if future is not None:
+                self._futures.move_to_end(key)
+                return future
+            if self._executor is None:
+                self._executor = start_worker_pool(self.processes)
+            try:
+                future = self._executor.submit(render_word_cloud, list(terms), style)
+            except BrokenProcessPool:
+                # A worker died (e.g. killed for memory), so the pool is unusable
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = start_worker_pool(self.processes)
+                future = self._executor.submit(render_word_cloud, list(terms), style)
+            self._futures[key] = future
+            while len(self._futures) > self.cache_size:
+                self._futures.popitem(last=False)
+
+        def forget_failure(done):
+            # A failed render is not cached, so it is retried next time
+            if done.cancelled() or done.exception() is not None:
+                self._forget(key, done)
+
+        future.add_done_callback(forget_failure)
+        return future
+
+    def prefetch(self, terms_list, style=None):
+        """Start rendering several word clouds without waiting for them."""
+        for terms in terms_list:
+            self.submit(terms, style)
+
+    def render(self, terms, style=None, timeout=None):
+        """
+        PNG bytes of the word cloud of ``terms``, waiting for it if needed.
+
+        If a worker died (e.g. killed for memory), the pool is replaced and
+        the render tried once more.
+        """
+        style = style or WORD_CLOUD_STYLE
+        future = self.submit(terms, style)
+        try:
+            return future.result(timeout)
+        except BrokenProcessPool:
+            self._forget(self.key(terms, style), future)
+            return self.submit(terms, style).result(timeout)
+
+    def _forget(self, key, future):
+        """Drop ``future`` from the cache unless ``key`` already has a newer one."""
+        with self._lock:
+            if self._futures.get(key) is future:
+                del self._futures[key]
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+            self._futures.clear()
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+
+
+def _import_main_script():
+    """
+    Import the main script of ``start_worker_pool``'s caller in the fork server.
+
+    Does nothing elsewhere: in the parent the variable is not set yet, and
+    in workers the script is already ``__main__``.
+    """
+    main_path = os.environ.get(MAIN_PATH_VARIABLE)
+    if (
+        main_path is None
+        or getattr(sys.modules["__main__"], "__file__", None) == main_path
+    ):
+        return
+    # Starting processes from the script must fail, as in spawned workers
+    process.current_process()._inheriting = True
+    try:
+        spawn.import_main_path(main_path)
+    except (Exception, SystemExit):
+        # The fork server must survive; the workers then run the script
+        # themselves, as if spawned
+        pass
+    finally:
+        del process.current_process()._inheriting
+
+
+_import_main_script()
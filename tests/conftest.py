@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The modules import each other from the src directory, as when run from it
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "src"))
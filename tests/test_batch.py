@@ -0,0 +1,132 @@
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+import batch
+from batch import parse_job, run_batch
+
+
+class FakePipeline:
+    """Scrapes and analyses that fail as the test asks."""
+
+    def __init__(self):
+        self.scrapes = []
+        self.analyze_errors = []  # raised by the next analyses, in order
+        self.broken_submits = 0  # next submits that find the pool broken
+        self.pools = 0
+
+    def scrape_job(self, job, output_dir, scrape_workers, deep_comments=False):
+        self.scrapes.append(job["subreddit"])
+        if job["subreddit"] == "missing":
+            raise ValueError("no such subreddit")
+        return os.path.join(output_dir, batch.job_name(job), "posts.arrow")
+
+    def analyze_job(self, job, posts_path, output_dir, llm_model):
+        if self.analyze_errors:
+            raise self.analyze_errors.pop(0)
+        return {"posts": job["limit"], "topics": 2}
+
+    def start_analyzers(self, processes=None):
+        self.pools += 1
+        pipeline = self
+
+        class Analyzers(ThreadPoolExecutor):
+            def submit(self, *args, **kwargs):
+                if pipeline.broken_submits:
+                    pipeline.broken_submits -= 1
+                    raise BrokenProcessPool("worker died")
+                return super().submit(*args, **kwargs)
+
+        return Analyzers(max_workers=1)
+
+
+@pytest.fixture
+def pipeline(monkeypatch):
+    pipeline = FakePipeline()
+    monkeypatch.setattr(batch, "scrape_job", pipeline.scrape_job)
+    monkeypatch.setattr(batch, "analyze_job", pipeline.analyze_job)
+    # Threads stand in for the worker processes, which would not see the fakes
+    monkeypatch.setattr(batch, "start_analyzers", pipeline.start_analyzers)
+    return pipeline
+
+
+def read_manifest(output_dir):
+    with open(os.path.join(output_dir, "manifest.json")) as f:
+        return json.load(f)
+
+
+def test_parse_job_defaults_sort_and_limit():
+    assert parse_job(" politics ") == {
+        "subreddit": "politics",
+        "sort": "month",
+        "limit": 100,
+    }
+    assert parse_job("askscience::20") == {
+        "subreddit": "askscience",
+        "sort": "month",
+        "limit": 20,
+    }
+    assert parse_job("television:week:5")["sort"] == "week"
+
+
+@pytest.mark.parametrize("spec", ["", ":week", "a:b:c:d", "a:week:x", "a:week:0"])
+def test_parse_job_rejects_invalid_specs(spec):
+    with pytest.raises(ValueError):
+        parse_job(spec)
+
+
+def test_manifest_keeps_input_order_and_runs_duplicates_once(tmp_path, pipeline):
+    manifest = run_batch(
+        ["politics:week:5", "bad:spec:x", "askscience", "politics:week:5"],
+        str(tmp_path),
+    )
+
+    assert [entry.get("subreddit", entry.get("spec")) for entry in manifest] == [
+        "politics",
+        "bad:spec:x",
+        "askscience",
+    ]
+    assert [entry["status"] for entry in manifest] == ["ok", "failed", "ok"]
+    assert manifest[1]["stage"] == "parse"
+    assert manifest[0]["posts"] == 5
+    assert sorted(pipeline.scrapes) == ["askscience", "politics"]
+    assert read_manifest(tmp_path) == manifest
+
+
+def test_failed_subreddit_does_not_stop_the_batch(tmp_path, pipeline):
+    pipeline.analyze_errors.append(ValueError("out of topics"))
+    manifest = run_batch(["missing", "politics"], str(tmp_path), processes=1)
+
+    assert manifest[0]["status"] == "failed"
+    assert manifest[0]["stage"] == "scrape"
+    assert manifest[0]["error"] == "ValueError: no such subreddit"
+    assert (manifest[1]["status"], manifest[1]["stage"]) == ("failed", "analyze")
+
+
+def test_dead_worker_pool_is_replaced_and_the_analysis_retried(tmp_path, pipeline):
+    pipeline.analyze_errors.append(BrokenProcessPool("worker died"))
+    manifest = run_batch(["politics"], str(tmp_path))
+
+    assert manifest[0]["status"] == "ok"
+    assert pipeline.pools == 2
+
+
+def test_broken_pool_on_submit_is_replaced(tmp_path, pipeline):
+    pipeline.broken_submits = 1
+    manifest = run_batch(["politics", "askscience"], str(tmp_path))
+
+    assert [entry["status"] for entry in manifest] == ["ok", "ok"]
+    assert pipeline.pools == 2
+    assert read_manifest(tmp_path) == manifest
+
+
+def test_analysis_is_retried_on_a_new_pool_only_once(tmp_path, pipeline):
+    pipeline.analyze_errors += [BrokenProcessPool("died"), BrokenProcessPool("again")]
+    manifest = run_batch(["politics"], str(tmp_path))
+
+    assert (manifest[0]["status"], manifest[0]["stage"]) == ("failed", "analyze")
+    assert pipeline.pools == 3
+    assert read_manifest(tmp_path) == manifest
@@ -0,0 +1,99 @@
+from types import SimpleNamespace
+
+import pytest
+import requests
+from praw.exceptions import APIException, ClientException
+from praw.models import MoreComments
+from prawcore.exceptions import PrawcoreException
+
+from data_retrieval.comment_crawl import CommentCrawler, CrawlBudget
+
+
+class FakeRateLimiter:
+    def __init__(self):
+        self.synced = []
+
+    def acquire(self):
+        pass
+
+    def sync(self, limits):
+        self.synced.append(limits)
+
+
+class FakeMore(MoreComments):
+    """A "load more comments" placeholder that returns or raises ``result``."""
+
+    def __init__(self, result, count=1):
+        self.result = result
+        self.count = count
+
+    def comments(self):
+        if isinstance(self.result, Exception):
+            raise self.result
+        return self.result
+
+
+def comment(comment_id, score, replies=()):
+    return SimpleNamespace(
+        id=comment_id,
+        body=f"comment {comment_id}",
+        score=score,
+        stickied=False,
+        replies=list(replies),
+    )
+
+
+def reddit_conn():
+    return SimpleNamespace(auth=SimpleNamespace(limits={"remaining": 100}))
+
+
+@pytest.mark.parametrize(
+    "error",
+    [
+        PrawcoreException("server error"),
+        ClientException("no such comment"),
+        APIException("RATELIMIT", "try again later", None),
+        requests.ConnectionError("connection reset"),
+    ],
+)
+def test_failed_expansion_only_skips_its_branch(error):
+    rate_limiter = FakeRateLimiter()
+    crawler = CommentCrawler(rate_limiter=rate_limiter)
+    post = SimpleNamespace(
+        comments=[
+            comment("a", 5),
+            FakeMore(error, count=10),
+            FakeMore([comment("b", 9)]),
+        ]
+    )
+    conn = reddit_conn()
+
+    assert crawler.crawl(post, conn) == ["comment b", "comment a"]
+    assert post.comment_sort == "top"
+    # The limiter follows the connection's headers after every expansion
+    assert rate_limiter.synced == [conn.auth.limits] * 2
+
+
+def test_crawl_stops_when_the_budget_is_used_up():
+    crawler = CommentCrawler(
+        CrawlBudget(max_requests=1), rate_limiter=FakeRateLimiter()
+    )
+    post = SimpleNamespace(
+        comments=[
+            FakeMore([comment("a", 1)], count=5),
+            FakeMore([comment("b", 2)], count=1),
+        ]
+    )
+
+    # The placeholder hiding the most comments is expanded first
+    assert crawler.crawl(post, reddit_conn()) == ["comment a"]
+    assert crawler.budget.requests == 1
+
+
+def test_crawl_keeps_the_best_comments_that_fit():
+    crawler = CommentCrawler(max_chars=20, rate_limiter=FakeRateLimiter())
+    post = SimpleNamespace(
+        comments=[comment("a", 1, replies=[comment("b", 3)]), comment("c", 2)]
+    )
+
+    assert crawler.crawl(post, reddit_conn()) == ["comment b", "comment c"]
@@ -0,0 +1,74 @@
+import numpy as np
+
+from data_prep.dedup import (
+    collapse_near_duplicates,
+    minhash_signatures,
+    shingle_hashes,
+)
+
+WORDS = (
+    "senate vote ballot governor campaign poll district turnout candidate "
+    "debate policy budget reform election county primary caucus delegate "
+    "recount swing state majority minority filibuster"
+).split()
+
+
+def sentence(seed, length=40):
+    rng = np.random.default_rng(seed)
+    return " ".join(rng.choice(WORDS, size=length))
+
+
+def test_identical_and_near_identical_documents_are_collapsed():
+    base = sentence(0)
+    edited = base + " today"
+    other = sentence(1)
+    docs = [base, other, edited, base]
+
+    representatives, groups = collapse_near_duplicates(docs)
+
+    assert representatives == [base, other]
+    assert groups.tolist() == [0, 1, 0, 0]
+
+
+def test_groups_map_representative_results_back_to_every_document():
+    docs = [sentence(0), sentence(0), sentence(2)]
+    representatives, groups = collapse_near_duplicates(docs)
+    topics = np.array([7, 3])[: len(representatives)]
+    assert topics[groups].tolist() == [7, 7, 3]
+
+
+def test_distinct_documents_are_kept():
+    docs = [sentence(seed) for seed in range(20)]
+    representatives, groups = collapse_near_duplicates(docs)
+    assert representatives == docs
+    assert groups.tolist() == list(range(20))
+
+
+def test_threshold_controls_how_similar_duplicates_are():
+    words = sentence(0).split()
+    # One word replaced in the middle changes 3 of its 38 word 3-grams
+    edited = " ".join(words[:20] + ["zebra"] + words[21:])
+    assert len(collapse_near_duplicates([" ".join(words), edited])[0]) == 1
+    assert len(collapse_near_duplicates([" ".join(words), edited], 0.99)[0]) == 2
+
+
+def test_short_and_empty_inputs():
+    representatives, groups = collapse_near_duplicates([])
+    assert representatives == [] and len(groups) == 0
+    representatives, groups = collapse_near_duplicates(["hi", "hi", "bye now"])
+    assert representatives == ["hi", "bye now"]
+    assert groups.tolist() == [0, 0, 1]
+
+
+def test_shingles_do_not_span_documents():
+    hashes, offsets = shingle_hashes(["a b c d", "e f g"])
+    # 2 three-word shingles in the first document, 1 in the second
+    assert len(hashes) == 3
+    assert offsets.tolist() == [0, 2]
+
+
+def test_signatures_are_deterministic_and_order_sensitive():
+    docs = ["one two three four", "four three two one"]
+    first = minhash_signatures(docs)
+    assert np.array_equal(first, minhash_signatures(docs))
+    assert not np.array_equal(first[0], first[1])
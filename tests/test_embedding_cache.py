@@ -0,0 +1,107 @@
+import os
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from modeling.clustering import embed_documents
+from modeling.embedding_cache import EmbeddingCache
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "cache" / "embeddings")
+
+
+def vectors(num, dim=8, seed=0):
+    return np.random.default_rng(seed).random((num, dim), dtype=np.float32)
+
+
+def test_round_trip_across_instances(path):
+    cache = EmbeddingCache(path, "model", capacity=100)
+    keys = [cache.key(f"doc {i}") for i in range(10)]
+    cache.put_many(keys, vectors(10))
+    cache.save()
+
+    reloaded = EmbeddingCache(path, "model", capacity=100)
+    assert len(reloaded) == 10
+    np.testing.assert_array_equal(np.vstack(reloaded.get_many(keys)), vectors(10))
+    assert reloaded.get_many([reloaded.key("unknown")]) == [None]
+
+
+def test_keys_depend_on_the_model(path):
+    assert EmbeddingCache(path, "a").key("doc") != EmbeddingCache(path, "b").key("doc")
+
+
+def test_file_grows_with_the_entries(path):
+    cache = EmbeddingCache(path, "model", capacity=100_000)
+    cache.put_many([cache.key(f"doc {i}") for i in range(10)], vectors(10))
+    # The initial 1024 rows, not the whole capacity
+    assert os.path.getsize(cache.vectors_path) == 1024 * 8 * 4
+
+
+def test_least_recently_used_entries_are_evicted(path):
+    cache = EmbeddingCache(path, "model", capacity=4)
+    keys = [cache.key(f"doc {i}") for i in range(6)]
+    cache.put_many(keys[:4], vectors(4))
+    cache.get_many(keys[:1])
+    cache.put_many(keys[4:], vectors(2, seed=1))
+
+    found = [vector is not None for vector in cache.get_many(keys)]
+    assert found == [True, False, False, True, True, True]
+
+
+def test_saved_index_matches_the_vectors_after_a_crash(path):
+    cache = EmbeddingCache(path, "model", capacity=4)
+    keys = [cache.key(f"doc {i}") for i in range(8)]
+    data = vectors(8)
+    cache.put_many(keys[:4], data[:4])
+    cache.save()
+    # Evicts and overwrites rows, then "crashes" without saving
+    cache.put_many(keys[4:], data[4:])
+
+    reloaded = EmbeddingCache(path, "model", capacity=4)
+    expected = dict(zip(keys, data))
+    for key, vector in zip(keys, reloaded.get_many(keys)):
+        if vector is not None:
+            np.testing.assert_array_equal(vector, expected[key])
+
+
+def test_a_new_vector_size_starts_over(path):
+    cache = EmbeddingCache(path, "model", capacity=10)
+    cache.put_many([cache.key("old")], vectors(1, dim=8))
+    cache.put_many([cache.key("new")], vectors(1, dim=4))
+    cache.save()
+
+    reloaded = EmbeddingCache(path, "model", capacity=10)
+    assert len(reloaded) == 1
+    assert reloaded.get_many([reloaded.key("new")])[0].shape == (4,)
+
+
+class FakeEncoder:
+    """Sentence encoder that counts the texts it encodes."""
+
+    max_seq_length = 128
+
+    def __init__(self, dim=8):
+        self.dim = dim
+        self.encoded = 0
+
+    def get_sentence_embedding_dimension(self):
+        return self.dim
+
+    def encode(self, texts, **kwargs):
+        self.encoded += len(texts)
+        return vectors(len(texts), self.dim)
+
+
+def test_no_documents_embed_to_an_empty_matrix(path):
+    topic_model = SimpleNamespace(embedding_model=FakeEncoder())
+    cache = EmbeddingCache(path, "model")
+
+    embeddings = embed_documents(topic_model, [], cache)
+
+    assert embeddings.shape == (0, 8)
+    assert embeddings.dtype == np.float32
+    assert embed_documents(topic_model, []).shape == (0, 8)
+    assert topic_model.embedding_model.encoded == 0
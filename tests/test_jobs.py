@@ -0,0 +1,215 @@
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import pandas as pd
+import pytest
+
+from analysis_service import jobs
+from analysis_service.jobs import (
+    ANALYZING,
+    DONE,
+    FAILED,
+    QUEUED,
+    SCRAPING,
+    JobQueue,
+    analyze_to_file,
+)
+from modeling.topic_index import TopicIndex
+
+PARAMS = {
+    "subreddit": "politics",
+    "sort": "month",
+    "limit": 10,
+    "deep_comments": False,
+    "llm_model": "",
+    "use_cache": True,
+}
+
+
+class FakePipeline:
+    """Scrapes and analyses that wait for the test to release them."""
+
+    def __init__(self):
+        self.scraping = threading.Event()
+        self.analyzing = threading.Event()
+        self.scrape_released = threading.Event()
+        self.analysis_released = threading.Event()
+        self.scrape_released.set()
+        self.analysis_released.set()
+        self.scrapes = 0
+        self.analyze_errors = []  # raised by the next analyses, in order
+        self.pools = 0
+
+    def scrape_job(self, params, output_dir, scrape_workers, deep_comments, ttl):
+        self.scrapes += 1
+        self.scraping.set()
+        self.scrape_released.wait(5)
+        if params["subreddit"] == "missing":
+            raise ValueError("no such subreddit")
+        os.makedirs(output_dir, exist_ok=True)
+        return os.path.join(output_dir, "posts.arrow")
+
+    def analyze_to_file(self, params, posts_path, result_path):
+        self.analyzing.set()
+        self.analysis_released.wait(5)
+        if self.analyze_errors:
+            raise self.analyze_errors.pop(0)
+        with open(result_path, "w") as f:
+            json.dump({"subreddit": params["subreddit"], "topics": []}, f)
+        return {"posts": 10, "topics": 2}
+
+    def start_analyzers(self):
+        self.pools += 1
+        return ThreadPoolExecutor(max_workers=1)
+
+
+@pytest.fixture
+def pipeline(monkeypatch):
+    pipeline = FakePipeline()
+    monkeypatch.setattr(jobs, "scrape_job", pipeline.scrape_job)
+    monkeypatch.setattr(jobs, "analyze_to_file", pipeline.analyze_to_file)
+    # Threads stand in for the worker processes, which would not see the fakes
+    monkeypatch.setattr(
+        JobQueue, "_start_analyzers", lambda job_queue: pipeline.start_analyzers()
+    )
+    return pipeline
+
+
+@pytest.fixture
+def job_queue(tmp_path, pipeline):
+    job_queue = JobQueue(output_dir=str(tmp_path), processes=1, max_finished=2)
+    job_queue.start()
+    yield job_queue
+    job_queue.shutdown()
+
+
+def wait_until_finished(job_queue, job_id, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        status = job_queue.status(job_id)
+        if status["status"] in (DONE, FAILED):
+            return status
+        time.sleep(0.01)
+    raise AssertionError(f"job still {status['status']}")
+
+
+def test_job_moves_through_every_state(job_queue, pipeline):
+    pipeline.scrape_released.clear()
+    pipeline.analysis_released.clear()
+    job = job_queue.submit(PARAMS)
+    assert job["status"] in (QUEUED, SCRAPING)
+
+    assert pipeline.scraping.wait(5)
+    assert job_queue.status(job["id"])["status"] == SCRAPING
+    pipeline.scrape_released.set()
+    assert pipeline.analyzing.wait(5)
+    assert job_queue.status(job["id"])["status"] == ANALYZING
+    assert job_queue.read_result(job["id"]) is None
+    pipeline.analysis_released.set()
+
+    status = wait_until_finished(job_queue, job["id"])
+    assert status["status"] == DONE
+    assert (status["posts"], status["topics"]) == (10, 2)
+    assert status["submitted"] <= status["started"] <= status["finished"]
+    assert "result_path" not in status
+    assert json.loads(job_queue.read_result(job["id"]))["subreddit"] == "politics"
+
+
+def test_identical_jobs_in_flight_share_one_run(job_queue, pipeline):
+    pipeline.scrape_released.clear()
+    first = job_queue.submit(PARAMS)
+    assert job_queue.submit(dict(PARAMS))["id"] == first["id"]
+    other = job_queue.submit({**PARAMS, "limit": 20})
+    assert other["id"] != first["id"]
+    pipeline.scrape_released.set()
+
+    wait_until_finished(job_queue, first["id"])
+    wait_until_finished(job_queue, other["id"])
+    assert pipeline.scrapes == 2
+    # A finished job is not joined; the same params run again
+    assert job_queue.submit(PARAMS)["id"] != first["id"]
+
+
+def test_failed_scrape_records_the_stage_and_error(job_queue):
+    job = job_queue.submit({**PARAMS, "subreddit": "missing"})
+    status = wait_until_finished(job_queue, job["id"])
+    assert status["status"] == FAILED
+    assert status["stage"] == "scrape"
+    assert status["error"] == "ValueError: no such subreddit"
+    assert job_queue.read_result(job["id"]) is None
+
+
+def test_failed_analysis_records_the_stage(job_queue, pipeline):
+    pipeline.analyze_errors.append(RuntimeError("out of topics"))
+    status = wait_until_finished(job_queue, job_queue.submit(PARAMS)["id"])
+    assert (status["status"], status["stage"]) == (FAILED, "analyze")
+
+
+def test_dead_worker_pool_is_replaced_and_the_job_retried(job_queue, pipeline):
+    pipeline.analyze_errors.append(BrokenProcessPool("worker died"))
+    status = wait_until_finished(job_queue, job_queue.submit(PARAMS)["id"])
+    assert status["status"] == DONE
+    assert pipeline.pools == 2
+
+
+def test_job_is_retried_on_a_new_pool_only_once(job_queue, pipeline):
+    pipeline.analyze_errors += [BrokenProcessPool("died"), BrokenProcessPool("again")]
+    status = wait_until_finished(job_queue, job_queue.submit(PARAMS)["id"])
+    assert (status["status"], status["stage"]) == (FAILED, "analyze")
+    assert pipeline.pools == 3
+
+
+def test_oldest_finished_jobs_are_deleted(job_queue, tmp_path):
+    ids = []
+    for limit in range(1, 4):
+        ids.append(job_queue.submit({**PARAMS, "limit": limit})["id"])
+        wait_until_finished(job_queue, ids[-1])
+
+    assert [job["id"] for job in job_queue.jobs()] == ids[1:]
+    assert job_queue.status(ids[0]) is None
+    assert sorted(os.listdir(tmp_path)) == sorted(ids[1:])
+
+
+def test_result_marks_topics_whose_summary_failed(tmp_path, monkeypatch):
+    df = pd.DataFrame(
+        {
+            "id": ["a", "b", "c"],
+            "title": ["A", "B", "C"],
+            "post text": ["", "", ""],
+            "comments": [[], [], []],
+            "topic": [0, 1, -1],
+        }
+    )
+    topic_index = TopicIndex(
+        df["topic"].to_numpy(), terms={0: [("tax", 0.5)], 1: [("vote", 0.4)]}
+    )
+    summaries = {
+        0: {"name": "Taxes", "description": "About taxes."},
+        1: {"name": "Topic 1", "description": "Summary unavailable", "failed": True},
+    }
+    topic_index.set_names(summaries)
+    df["topic_name"] = df["topic"].map(topic_index.names)
+    monkeypatch.setattr(jobs, "load_posts", lambda path: None)
+    monkeypatch.setattr(
+        jobs,
+        "analyze_posts",
+        lambda posts, llm_model, embeddings_path: (df, None, topic_index, summaries),
+    )
+
+    result_path = tmp_path / "result.json"
+    assert analyze_to_file(PARAMS, "posts.arrow", str(result_path)) == {
+        "posts": 3,
+        "topics": 3,
+    }
+
+    topics = {
+        topic["topic"]: topic for topic in json.loads(result_path.read_text())["topics"]
+    }
+    assert (topics[0]["name"], topics[0]["failed"]) == ("Taxes", False)
+    # A failed topic keeps its keyword label, and its flag for the app
+    assert (topics[1]["name"], topics[1]["failed"]) == ("vote", True)
+    assert topics[-1]["failed"] is False
@@ -0,0 +1,89 @@
+import pytest
+
+from data_retrieval import rate_limit
+from data_retrieval.rate_limit import TokenBucket
+
+
+class FakeClock:
+    """
+    Stands in for the ``time`` module; sleeping advances the clock.
+
+    Rates in the tests are powers of two, so waits and refills are exact.
+    """
+
+    def __init__(self, now=1000.0):
+        self.now = now
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limit, "time", clock)
+    return clock
+
+
+def test_burst_up_to_capacity_without_waiting(clock):
+    bucket = TokenBucket(rate=2, capacity=3)
+    for _ in range(3):
+        bucket.acquire()
+    assert clock.sleeps == []
+
+
+def test_waits_for_the_next_token_when_empty(clock):
+    bucket = TokenBucket(rate=2, capacity=1)
+    bucket.acquire()
+    bucket.acquire()
+    assert clock.sleeps == [pytest.approx(0.5)]
+
+
+def test_refill_is_capped_at_capacity(clock):
+    bucket = TokenBucket(rate=4, capacity=2)
+    bucket.acquire()
+    bucket.acquire()
+    clock.now += 60
+    bucket.acquire()
+    bucket.acquire()
+    assert clock.sleeps == []
+    bucket.acquire()
+    assert clock.sleeps == [pytest.approx(0.25)]
+
+
+def test_sync_spreads_the_remaining_quota_over_the_window(clock):
+    bucket = TokenBucket(rate=100 / 60, capacity=10)
+    bucket.sync({"remaining": 30, "reset_timestamp": clock.now + 60})
+    assert bucket.rate == pytest.approx(0.5)
+
+
+def test_sync_caps_tokens_at_the_remaining_quota(clock):
+    bucket = TokenBucket(rate=1, capacity=10)
+    bucket.sync({"remaining": 1, "reset_timestamp": clock.now + 8})
+    bucket.acquire()
+    assert clock.sleeps == []
+    bucket.acquire()
+    assert clock.sleeps == [pytest.approx(8)]
+
+
+def test_sync_with_an_exhausted_quota_still_allows_a_request_per_window(clock):
+    bucket = TokenBucket(rate=1, capacity=10)
+    bucket.sync({"remaining": 0, "reset_timestamp": clock.now + 20})
+    assert bucket.rate == pytest.approx(1 / 20)
+
+
+@pytest.mark.parametrize(
+    "limits", [{}, {"remaining": None, "reset_timestamp": 5}, {"remaining": 5}]
+)
+def test_sync_without_limits_leaves_the_bucket_unchanged(clock, limits):
+    bucket = TokenBucket(rate=3, capacity=10)
+    bucket.sync(limits)
+    assert bucket.rate == 3
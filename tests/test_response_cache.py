@@ -0,0 +1,63 @@
+from types import SimpleNamespace
+
+import pytest
+
+from summarization import response_cache
+from summarization.response_cache import SummaryCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = SimpleNamespace(now=1000.0)
+    monkeypatch.setattr(response_cache, "time", SimpleNamespace(time=lambda: clock.now))
+    return clock
+
+
+@pytest.fixture
+def cache(tmp_path, clock):
+    return SummaryCache(str(tmp_path / "summaries.sqlite"), max_entries=2)
+
+
+def summary(name):
+    return {"name": name, "description": f"About {name}."}
+
+
+def put(cache, clock, prompt):
+    clock.now += 1
+    cache.put("llama", prompt, summary(prompt))
+
+
+def test_round_trip_and_counters(cache):
+    assert cache.get("llama", "prompt") is None
+    cache.put("llama", "prompt", summary("Elections"))
+    assert cache.get("llama", "prompt") == summary("Elections")
+    assert cache.stats() == {"hits": 1, "misses": 1, "size": 1}
+
+
+def test_entries_are_keyed_by_model(cache):
+    cache.put("llama", "prompt", summary("Elections"))
+    assert cache.get("mistral", "prompt") is None
+
+
+def test_least_recently_stored_entry_is_evicted(cache, clock):
+    for prompt in ["a", "b", "c"]:
+        put(cache, clock, prompt)
+    assert cache.get("llama", "a") is None
+    assert cache.get("llama", "b") == summary("b")
+    assert cache.get("llama", "c") == summary("c")
+
+
+def test_lookups_keep_entries_recent(cache, clock):
+    put(cache, clock, "a")
+    put(cache, clock, "b")
+    clock.now += 1
+    cache.get("llama", "a")
+    put(cache, clock, "c")
+    assert cache.get("llama", "a") == summary("a")
+    assert cache.get("llama", "b") is None
+
+
+def test_entries_survive_a_new_instance(tmp_path):
+    path = str(tmp_path / "summaries.sqlite")
+    SummaryCache(path).put("llama", "prompt", summary("Elections"))
+    assert SummaryCache(path).get("llama", "prompt") == summary("Elections")
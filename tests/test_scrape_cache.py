@@ -0,0 +1,145 @@
+import sqlite3
+from contextlib import closing
+from types import SimpleNamespace
+
+import pytest
+
+from data_retrieval import scrape_cache
+from data_retrieval.scrape_cache import ScrapeCache, cached_iter_subreddit_posts
+
+
+class FakeReddit:
+    """Serves a listing of fake posts and records whose comments are fetched."""
+
+    def __init__(self, num_comments):
+        self.num_comments = dict(num_comments)
+        self.listings = 0
+        self.fetched = []
+
+    def fetch_posts(self, reddit_conn, subreddit, sort, limit):
+        self.listings += 1
+        return [
+            SimpleNamespace(
+                id=post_id,
+                title=f"title {post_id}",
+                selftext=f"text {post_id}",
+                num_comments=count,
+            )
+            for post_id, count in list(self.num_comments.items())[:limit]
+        ]
+
+    def iter_comments(self, reddit_conn, posts, workers=1, crawler=None):
+        for post in posts:
+            self.fetched.append(post.id)
+            yield post, [f"comment {i} on {post.id}" for i in range(post.num_comments)]
+
+
+@pytest.fixture
+def reddit(monkeypatch):
+    reddit = FakeReddit({"a": 1, "b": 2, "c": 0})
+    monkeypatch.setattr(scrape_cache, "fetch_posts", reddit.fetch_posts)
+    monkeypatch.setattr(scrape_cache, "iter_comments", reddit.iter_comments)
+    return reddit
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = SimpleNamespace(now=1000.0)
+    monkeypatch.setattr(scrape_cache, "time", SimpleNamespace(time=lambda: clock.now))
+    return clock
+
+
+@pytest.fixture
+def cache(tmp_path, clock):
+    return ScrapeCache(str(tmp_path / "scrapes.sqlite"), ttl=60)
+
+
+def test_refresh_stores_the_listing_in_order(cache, reddit):
+    records = list(cache.iter_refresh("Politics", "month", 3, reddit_conn=object()))
+    assert [record["id"] for record in records] == ["a", "b", "c"]
+    assert cache.load_records("politics", "month", 3) == records
+
+
+def test_listing_expires_after_the_ttl(cache, reddit, clock):
+    list(cache.iter_refresh("politics", "month", 3, reddit_conn=object()))
+    clock.now += 60
+    assert cache.load_records("politics", "month", 3) is not None
+    clock.now += 1
+    assert cache.load_records("politics", "month", 3) is None
+
+
+def test_listing_scraped_with_a_smaller_limit_is_missing(cache, reddit):
+    list(cache.iter_refresh("politics", "month", 2, reddit_conn=object()))
+    assert len(cache.load_records("politics", "month", 1)) == 1
+    assert cache.load_records("politics", "month", 3) is None
+
+
+def test_listing_that_ran_out_of_posts_is_cached(cache, reddit):
+    # The subreddit has only three posts
+    list(cache.iter_refresh("politics", "month", 10, reddit_conn=object()))
+    assert len(cache.load_records("politics", "month", 10)) == 3
+    assert len(cache.load_records("politics", "month", 5)) == 3
+    assert cache.load_records("politics", "month", 11) is None
+
+
+def test_cache_created_without_requested_limits_is_upgraded(tmp_path, reddit):
+    path = str(tmp_path / "scrapes.sqlite")
+    with closing(sqlite3.connect(path)) as conn, conn:
+        conn.execute(
+            "CREATE TABLE listings (subreddit TEXT NOT NULL, sort TEXT NOT NULL, "
+            "time_filter TEXT NOT NULL, post_ids TEXT NOT NULL, "
+            "fetched_at REAL NOT NULL, PRIMARY KEY (subreddit, sort, time_filter))"
+        )
+    cache = ScrapeCache(path)
+    list(cache.iter_refresh("politics", "month", 10, reddit_conn=object()))
+    assert len(cache.load_records("politics", "month", 10)) == 3
+
+
+def test_refresh_only_fetches_comments_of_new_or_changed_posts(cache, reddit):
+    list(cache.iter_refresh("politics", "month", 3, reddit_conn=object()))
+    reddit.fetched.clear()
+    reddit.num_comments["b"] = 5
+    reddit.num_comments["d"] = 1
+
+    records = list(cache.iter_refresh("politics", "month", 4, reddit_conn=object()))
+
+    assert reddit.fetched == ["b", "d"]
+    assert [record["id"] for record in records] == ["a", "b", "c", "d"]
+    assert len(records[1]["comments"]) == 5
+
+
+def test_sorts_are_cached_apart_but_share_posts(cache, reddit):
+    list(cache.iter_refresh("politics", "month", 3, reddit_conn=object()))
+    assert cache.load_records("politics", "year", 3) is None
+
+    reddit.fetched.clear()
+    list(cache.iter_refresh("politics", "year", 3, reddit_conn=object()))
+    assert reddit.fetched == []
+
+
+def test_deep_crawls_are_cached_apart(cache, reddit):
+    list(cache.iter_refresh("politics", "month", 3, reddit_conn=object()))
+    assert cache.load_records("politics", "month", 3, deep=True) is None
+
+
+def test_cached_iter_only_scrapes_stale_listings(tmp_path, reddit, clock):
+    path = str(tmp_path / "scrapes.sqlite")
+
+    def scrape():
+        return list(
+            cached_iter_subreddit_posts(
+                "politics", "month", 3, ttl=60, cache_path=path, reddit_conn=object()
+            )
+        )
+
+    first = scrape()
+    assert scrape() == first
+    assert reddit.listings == 1
+    clock.now += 61
+    scrape()
+    assert reddit.listings == 2
+
+
+def test_invalid_sort_is_rejected(cache):
+    with pytest.raises(ValueError):
+        cache.load_records("politics", "best")
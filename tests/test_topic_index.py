@@ -0,0 +1,116 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from modeling.topic_index import OUTLIER_NAME, TopicIndex, unique_texts
+
+
+class FakeTopicModel:
+    def __init__(self, representative_docs=None):
+        self.representative_docs = representative_docs or {}
+        self.calls = 0
+
+    def get_topic(self, topic_id):
+        self.calls += 1
+        return [(f"term{topic_id}_{i}", 1.0 / (i + 1)) for i in range(4)]
+
+    def get_representative_docs(self, topic_id):
+        return self.representative_docs.get(topic_id)
+
+
+@pytest.fixture
+def df():
+    return pd.DataFrame(
+        {
+            "text": [f"doc {i}" for i in range(8)],
+            "topic": [2, -1, 0, 2, 2, 0, 1, 1],
+        }
+    )
+
+
+def test_topics_are_listed_in_order_of_first_appearance(df):
+    index = TopicIndex.from_dataframe(df)
+    assert index.topic_ids == [2, -1, 0, 1]
+    assert index.counts == {-1: 1, 0: 2, 1: 2, 2: 3}
+    assert len(index) == 4
+    assert 1 in index and 5 not in index
+
+
+def test_positions_are_in_row_order(df):
+    index = TopicIndex.from_dataframe(df)
+    assert index.positions(2).tolist() == [0, 3, 4]
+    assert index.positions([1, 2]).tolist() == [0, 3, 4, 6, 7]
+    assert index.positions(5).tolist() == []
+
+
+@pytest.mark.parametrize(
+    "topic_ids, limit, expected",
+    [
+        (2, None, [0, 3, 4]),
+        (2, 2, [0, 3]),
+        (1, None, [6, 7]),
+        ([0, -1], None, [1, 2, 5]),
+    ],
+)
+def test_rows_and_docs_follow_the_positions(df, topic_ids, limit, expected):
+    index = TopicIndex.from_dataframe(df)
+    assert index.rows(df, topic_ids, limit=limit).index.tolist() == expected
+    if np.isscalar(topic_ids):
+        assert index.docs(df, topic_ids, limit=limit) == [f"doc {i}" for i in expected]
+
+
+def test_terms_are_fetched_from_the_model_once(df):
+    model = FakeTopicModel()
+    index = TopicIndex.from_dataframe(df, model)
+    assert index.terms(0) == index.terms(0)
+    # Once per topic other than -1, for the keyword labels
+    assert model.calls == 3
+
+
+def test_names_fall_back_to_keyword_labels(df):
+    index = TopicIndex.from_dataframe(df, FakeTopicModel())
+    assert index.name(0) == "term0_0, term0_1, term0_2"
+    assert index.name(-1) == OUTLIER_NAME
+
+    index.set_names(
+        {
+            0: {"name": "Elections", "description": "..."},
+            1: {"name": "Topic 1", "description": "...", "failed": True},
+            2: {"name": "Elections", "description": "..."},
+        }
+    )
+    assert index.name(0) == "Elections"
+    assert index.name(1) == "term1_0, term1_1, term1_2"
+    assert index.ids_for_name("Elections") == [2, 0]
+
+
+def test_labels_from_given_terms_without_a_model(df):
+    index = TopicIndex(df["topic"], terms={2: [("vote", 0.9), ("poll", 0.5)]})
+    assert index.keyword_label(2) == "vote, poll"
+    assert index.keyword_label(0) == "Topic 0"
+
+
+def test_representatives_are_nearest_the_centroid_without_repeats():
+    df = pd.DataFrame(
+        {
+            "text": ["far away", "center post", "center post", "close by"],
+            "topic": [0, 0, 0, 0],
+        }
+    )
+    embeddings = np.array([[1.0, -1.0], [1.0, 0.0], [1.0, 0.0], [1.0, 0.2]])
+    index = TopicIndex.from_dataframe(df, FakeTopicModel(), embeddings)
+    assert index.representative_docs(df, 0, k=2) == ["center post", "close by"]
+
+
+def test_representatives_without_embeddings_start_with_the_model_picks(df):
+    model = FakeTopicModel(representative_docs={2: ["model pick"]})
+    index = TopicIndex.from_dataframe(df, model)
+    assert index.representative_docs(df, 2, k=3) == ["model pick", "doc 0", "doc 3"]
+    # Cached per topic
+    model.representative_docs[2] = ["changed"]
+    assert index.representative_docs(df, 2, k=3)[0] == "model pick"
+
+
+def test_unique_texts_skips_near_repeats():
+    texts = ["a b c d e", "a b c d e f", "x y z", "x y z w q r"]
+    assert unique_texts(texts, k=3) == ["a b c d e", "x y z", "x y z w q r"]
@@ -0,0 +1,164 @@
+import json
+import re
+
+import pandas as pd
+import pytest
+
+from summarization import topic_summarizer
+from summarization.response_cache import SummaryCache
+from summarization.topic_summarizer import generate_topic_summaries
+
+
+class FakeTopicModel:
+    def get_topic(self, topic_id):
+        return [(f"term{topic_id}_{i}", 1.0 / (i + 1)) for i in range(3)]
+
+
+class FakeClient:
+    """Answers like Ollama and records the topics asked for in each request."""
+
+    requests = []
+    valid = True
+
+    def __init__(self, host=None, timeout=None):
+        pass
+
+    def chat(self, model, messages, format=None, options=None, stream=False):
+        prompt = messages[0]["content"]
+        if format is None:
+            FakeClient.requests.append(None)
+            content = "Name: Single topic\nDescription: Asked on its own."
+        else:
+            topic_ids = [int(i) for i in re.findall(r"^Topic (-?\d+):", prompt, re.M)]
+            FakeClient.requests.append(topic_ids)
+            entries = [
+                {"topic_id": i, "name": f"Name {i}", "description": f"About {i}."}
+                for i in topic_ids
+            ]
+            content = json.dumps({"topics": entries}) if self.valid else "not json"
+        return {"message": {"content": content}, "prompt_eval_count": 1}
+
+
+@pytest.fixture(autouse=True)
+def client(monkeypatch):
+    monkeypatch.setattr(topic_summarizer.ollama, "Client", FakeClient)
+    monkeypatch.setattr(FakeClient, "requests", [])
+    monkeypatch.setattr(FakeClient, "valid", True)
+    return FakeClient
+
+
+@pytest.fixture
+def df():
+    topics = [-1] + [topic_id for topic_id in range(12) for _ in range(3)]
+    return pd.DataFrame(
+        {
+            "text": [f"post {i} about topic {t}" for i, t in enumerate(topics)],
+            "topic": topics,
+        }
+    )
+
+
+def summarize(df, **kwargs):
+    return generate_topic_summaries(FakeTopicModel(), df, **kwargs)
+
+
+def test_topics_are_packed_into_batches(df, client):
+    summaries = summarize(df, batch_size=5)
+    assert sorted(map(len, client.requests)) == [2, 5, 5]
+    assert list(summaries) == list(range(12))
+    assert summaries[7] == {"name": "Name 7", "description": "About 7."}
+
+
+def test_batch_size_one_sends_a_request_per_topic(df, client):
+    summaries = summarize(df, batch_size=1)
+    assert client.requests == [None] * 12
+    assert summaries[0]["name"] == "Single topic"
+
+
+def test_batches_are_capped_to_fit_the_context(df, client):
+    # 8192 // (3000 + 150) = 2 topics per request
+    summarize(df, batch_size=5, token_budget=3000)
+    assert max(map(len, client.requests)) == 2
+    assert len(client.requests) == 6
+
+
+def test_topics_too_large_for_a_batch_are_sent_alone(df, client):
+    summaries = summarize(df, batch_size=5, token_budget=10_000)
+    assert client.requests == [None] * 12
+    assert len(summaries) == 12
+    assert not any(summary.get("failed") for summary in summaries.values())
+
+
+def test_cached_topics_are_not_requested_again(df, client, tmp_path):
+    cache = SummaryCache(str(tmp_path / "summaries.sqlite"))
+    first = summarize(df, batch_size=5, response_cache=cache)
+    client.requests.clear()
+    assert summarize(df, batch_size=5, response_cache=cache) == first
+    assert client.requests == []
+
+
+def test_failed_topics_get_fallbacks_that_are_not_cached(df, client, tmp_path):
+    client.valid = False
+    cache = SummaryCache(str(tmp_path / "summaries.sqlite"))
+    summaries = summarize(df, batch_size=5, response_cache=cache)
+    assert summaries[3]["name"] == "Topic 3"
+    assert summaries[3]["failed"]
+    assert cache.stats()["size"] == 0
+
+
+class StreamingClient:
+    """Streams each queued response in chunks of a few characters."""
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+
+    def chat(self, model, messages, stream=False, **kwargs):
+        content = self.responses.pop(0)
+        chunks = [content[i : i + 7] for i in range(0, len(content), 7)]
+        for i, chunk in enumerate(chunks):
+            done = i == len(chunks) - 1
+            yield {"message": {"content": chunk}, "done": done, "prompt_eval_count": 1}
+
+
+def test_streamed_topic_reports_partial_summaries():
+    updates = []
+    client = StreamingClient("Name: Taxes\nDescription: About taxes.")
+    summary = topic_summarizer.summarize_topic(
+        client, "mock", 3, "prompt", on_update=lambda *update: updates.append(update)
+    )
+
+    assert summary == {"name": "Taxes", "description": "About taxes."}
+    assert all(topic_id == 3 and not done for topic_id, _, done in updates)
+    assert updates[-1][1] == summary
+
+
+def entry(topic_id):
+    return {
+        "topic_id": topic_id,
+        "name": f"Name {topic_id}",
+        "description": f"About {topic_id}.",
+    }
+
+
+def test_streamed_batch_reports_each_topic_once_across_retries():
+    updates = []
+    client = StreamingClient(
+        json.dumps({"topics": [entry(1)]}),
+        # The retry asks for topic 2 only; topic 1 again is ignored
+        json.dumps({"topics": [entry(1), entry(2)]}),
+    )
+    contexts = {1: ([("a", 1.0)], ["doc"]), 2: ([("b", 1.0)], ["doc"])}
+    summaries = topic_summarizer.summarize_batch(
+        client,
+        "mock",
+        contexts,
+        retries=1,
+        backoff=0,
+        on_update=lambda *update: updates.append(update),
+    )
+
+    assert [(topic_id, done) for topic_id, _, done in updates] == [
+        (1, True),
+        (2, True),
+    ]
+    assert summaries == {1: updates[0][1], 2: updates[1][1]}
@@ -0,0 +1,57 @@
+import os
+import subprocess
+import sys
+import textwrap
+
+import pytest
+
+from visualization.word_clouds import start_worker_pool
+
+SRC = os.path.join(os.path.dirname(__file__), os.pardir, "src")
+
+# Records every run of its top-level code, then reports the workers' pids
+SCRIPT = textwrap.dedent("""
+    import os
+    import time
+
+    with open(os.path.join(os.path.dirname(__file__), "runs.txt"), "a") as f:
+        f.write(__name__ + "\\n")
+
+    from visualization.word_clouds import start_worker_pool
+
+    def worker_pid():
+        time.sleep(0.5)
+        return os.getpid()
+
+    if __name__ == "__main__":
+        with start_worker_pool(2) as pool:
+            futures = [pool.submit(worker_pid) for _ in range(2)]
+            print(len({future.result() for future in futures}))
+    """)
+
+
+def test_worker_pool_runs_tasks():
+    with start_worker_pool(1) as pool:
+        assert pool.submit(abs, -3).result(timeout=60) == 3
+
+
+@pytest.mark.skipif(
+    sys.platform == "win32", reason="Spawned workers re-run the main script"
+)
+def test_workers_do_not_rerun_the_main_script(tmp_path):
+    script = tmp_path / "app.py"
+    script.write_text(SCRIPT)
+    runs = tmp_path / "runs.txt"
+
+    result = subprocess.run(
+        [sys.executable, str(script)],
+        env={**os.environ, "PYTHONPATH": os.path.abspath(SRC)},
+        capture_output=True,
+        text=True,
+        timeout=120,
+    )
+
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == "2"
+    # Once as the script and once in the fork server, however many workers
+    assert runs.read_text().split() == ["__main__", "__mp_main__"]